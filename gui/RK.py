@@ -1,10 +1,19 @@
 import typing 
 import os
+import sys
 import ctypes
+import contextlib
+import collections
+import functools
+import hashlib
+import json
+import inspect
+import threading
 import platform
 import subprocess
 import pandas as pd
 import numpy as np
+import build_libs
 
 class CPPDynamicLibrary:
     def __init__(self):
@@ -19,8 +28,12 @@ class CPPDynamicLibrary:
         self.libs_directory = os.path.join(libs_directory, folders[system])
         self.extension = self.extensions[system]
         os.environ['PATH'] = self.libs_directory + os.pathsep + os.environ['PATH']
-    def getPathTo(self, name: str):
-        return os.path.join(self.libs_directory, name + self.extension)
+    def getPathTo(self, name: str, wait_for_build: bool = True):
+        # Оптимизированная сборка из исходников (build_libs), если она уже есть или библиотеки в libs нет;
+        # иначе - библиотека из libs. wait_for_build=False - не ждать сборки, даже если в libs ничего нет
+        shipped = os.path.join(self.libs_directory, name + self.extension)
+        path = build_libs.libraryPath(name, shipped, wait=wait_for_build)
+        return shipped if path is None else path
 
 class CSVReaderPandas:
     """
@@ -58,10 +71,416 @@ class CSVReaderPandas:
         parent_directory = os.path.dirname(current_directory)
         return os.path.join(parent_directory, 'output')
 
+# Указатель на массив float64 (строки подряд), который заполняет решатель
+ResultBufferPointer = np.ctypeslib.ndpointer(dtype=np.float64, ndim=2, flags='C_CONTIGUOUS')
+# Указатель на массив состояний ансамбля траекторий (изменяется решателем на месте)
+StateArrayPointer = np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS')
+# Указатель на массив абсцисс плотного вывода
+EvalPointsPointer = np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS')
+
+def fixedStepCapacity(x0: float, h: float, xmax: float, maxSteps: int):
+    """
+    Количество строк, которого гарантированно хватит решателю с постоянным шагом.
+    """
+    if h <= 0 or xmax <= x0:
+        return 0
+    return max(0, min(maxSteps, int((xmax - x0) / h) + 1))
+
+def prepareEvalPoints(x_eval):
+    """
+    Абсциссы плотного вывода как непрерывный массив float64; они должны идти по возрастанию.
+    """
+    x_eval = np.ascontiguousarray(np.atleast_1d(x_eval), dtype=np.float64)
+    if np.any(np.diff(x_eval) < 0):
+        raise ValueError("Точки вывода x_eval должны идти по возрастанию")
+    return x_eval
+
+def applyOutputSampling(lib, every: int = 1, max_rows: int = 0, x_out=None):
+    """
+    Передаёт библиотеке прореживание вывода (setOutputSampling, см. OutputSampling в rk_output.h).
+    """
+    x_out = np.empty(0) if x_out is None else prepareEvalPoints(x_out)
+    lib.setOutputSampling(every, max_rows, x_out, len(x_out))
+
+@contextlib.contextmanager
+def trackSampling(lib, sampling):
+    """
+    Передаёт библиотеке прореживание вывода sampling = (every, max_rows, x_out) на время вызова решателя.
+    Как и progress, оно у библиотеки своё для каждого потока, поэтому задаётся при каждом вызове
+    из настроек объекта решателя, а не один раз в setOutputSampling.
+    """
+    every, max_rows, x_out = sampling
+    if every <= 1 and max_rows <= 0 and x_out is None:
+        yield
+        return
+    applyOutputSampling(lib, every, max_rows, x_out)
+    try:
+        yield
+    finally:
+        applyOutputSampling(lib)
+
+class RkProgress(ctypes.Structure):
+    """
+    Ход расчёта (см. RkProgress в rk_core.h): решатель обновляет x, steps и rejected раз в
+    RK_PROGRESS_INTERVAL шагов. cancel = 1 из другого потока останавливает расчёт,
+    решатель возвращает строки, посчитанные до отмены.
+    """
+    _fields_ = [('x', ctypes.c_double), ('steps', ctypes.c_longlong), ('rejected', ctypes.c_longlong), ('cancel', ctypes.c_int)]
+
+# Как часто решатель обновляет RkProgress (в шагах)
+RK_PROGRESS_INTERVAL = 256
+
+@contextlib.contextmanager
+def trackProgress(lib, progress: typing.Optional[RkProgress]):
+    """
+    Передаёт библиотеке progress на время вызова решателя. Указатель у библиотеки свой для каждого потока,
+    поэтому параллельные расчёты в разных потоках не мешают друг другу.
+    """
+    if progress is None:
+        yield
+        return
+    lib.setProgress(ctypes.byref(progress))
+    try:
+        yield
+    finally:
+        lib.setProgress(None)
+
+# Наибольшая размерность системы, состояние которой помещается в RkCheckpoint
+RK_CHECKPOINT_MAX_DIMENSION = 8
+
+class RkCheckpoint(ctypes.Structure):
+    """
+    Состояние решателя для продолжения расчёта до большего xmax (см. RkCheckpoint в rk_core.h).
+    Решатель записывает в него последнюю точку, следующий шаг и счётчики c1, c2 (saved = 1, если расчёт
+    не завершился ошибкой). Расчёт с resume = 1 начинается с этого состояния, x0, y0 и h0 вызова не используются.
+    """
+    _fields_ = [('resume', ctypes.c_int), ('saved', ctypes.c_int), ('dimension', ctypes.c_int), ('c1', ctypes.c_int), ('c2', ctypes.c_int),
+                ('x', ctypes.c_double), ('h', ctypes.c_double), ('y', ctypes.c_double * RK_CHECKPOINT_MAX_DIMENSION)]
+
+    def resumed(self):
+        """
+        Копия для продолжения расчёта с этого состояния (resume = 1); само состояние не меняется.
+        """
+        checkpoint = RkCheckpoint.from_buffer_copy(self)
+        checkpoint.resume = 1
+        return checkpoint
+    def state(self):
+        """
+        Сохранённая точка (x, y) - y массивом размерности системы.
+        """
+        return self.x, np.array(self.y[:self.dimension])
+
+@contextlib.contextmanager
+def trackCheckpoint(lib, checkpoint: typing.Optional[RkCheckpoint]):
+    """
+    Передаёт библиотеке checkpoint на время вызова решателя, как trackProgress.
+    """
+    if checkpoint is None:
+        yield
+        return
+    lib.setCheckpoint(ctypes.byref(checkpoint))
+    try:
+        yield
+    finally:
+        lib.setCheckpoint(None)
+
+# Строк в буфере RkStream по умолчанию
+RK_STREAM_CAPACITY = 4096
+
+class RkStream(ctypes.Structure):
+    """
+    Поток точек расчёта для графика (см. RkStream в rk_core.h): решатель дописывает в кольцевой буфер
+    принятые точки - x и первые width - 1 компонент решения, а другой поток забирает их через drain.
+    Если читатель не успевает, решатель пропускает точки и прореживает поток (stride удваивается
+    не чаще одного раза между вызовами drain).
+    """
+    _fields_ = [('data', ctypes.POINTER(ctypes.c_double)), ('capacity', ctypes.c_int), ('width', ctypes.c_int),
+                ('written', ctypes.c_longlong), ('read', ctypes.c_longlong), ('stride', ctypes.c_longlong), ('skipped', ctypes.c_longlong),
+                ('strideRead', ctypes.c_longlong)]
+
+    def __init__(self, width: int = 2, capacity: int = RK_STREAM_CAPACITY):
+        buffer = np.zeros((capacity, width), dtype=np.float64)
+        super().__init__(buffer.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), capacity, width, 0, 0, 1, 0, -1)
+        self.buffer = buffer    # Память буфера принадлежит объекту
+    def drain(self):
+        """
+        Строки (k, width), записанные с прошлого вызова. Вызывается из одного потока.
+        """
+        written = self.written
+        rows = self.buffer[np.arange(self.read, written) % self.capacity]
+        self.read = written
+        return rows
+
+@contextlib.contextmanager
+def trackStream(lib, stream: typing.Optional[RkStream]):
+    """
+    Передаёт библиотеке stream на время вызова решателя, как trackProgress.
+    """
+    if stream is None:
+        yield
+        return
+    lib.setStream(ctypes.byref(stream))
+    try:
+        yield
+    finally:
+        lib.setStream(None)
+
+class RkStats(ctypes.Structure):
+    """
+    Статистика расчёта (см. RkStats в rk_core.h): решатель заполняет её по ходу цикла, поэтому справка
+    не просматривает таблицу результата. Счётчики относятся к одному вызову решателя; величины,
+    которых нет (например, оценки погрешности у метода с постоянным шагом), - NaN.
+    """
+    _fields_ = [('accepted', ctypes.c_longlong), ('rejected', ctypes.c_longlong), ('doublings', ctypes.c_longlong),
+                ('rhsEvaluations', ctypes.c_longlong),
+                ('maxError', ctypes.c_double), ('maxErrorX', ctypes.c_double),
+                ('minH', ctypes.c_double), ('minHX', ctypes.c_double), ('maxH', ctypes.c_double), ('maxHX', ctypes.c_double),
+                ('x', ctypes.c_double), ('boundaryDistance', ctypes.c_double),
+                ('maxReferenceError', ctypes.c_double), ('maxReferenceErrorX', ctypes.c_double)]
+    COUNTERS = ('accepted', 'rejected', 'doublings', 'rhsEvaluations')
+    EXTREMES = (('maxError', max), ('minH', min), ('maxH', max), ('maxReferenceError', max))
+
+    @classmethod
+    def empty(cls, x: float = np.nan):
+        """
+        Статистика до первого шага из точки x.
+        """
+        nan = np.nan
+        return cls(0, 0, 0, 0, nan, nan, nan, nan, nan, nan, x, nan, nan, nan)
+    @classmethod
+    def fromTable(cls, x, xmax: float, h=None, error=None, c1=None, c2=None, referenceError=None):
+        """
+        Статистика по таблице результата, когда решатель её не собирал (например, результат загружен из файла).
+        c1 и c2 - накопленные счётчики, поэтому берутся их последние значения; вычисления правой части
+        по таблице не восстановить (0).
+        """
+        stats = cls.empty()
+        stats.accepted = len(x)
+        if len(x) == 0:
+            return stats
+        stats.x = x[-1]
+        stats.boundaryDistance = abs(xmax - x[-1])
+        if c1 is not None:
+            stats.rejected = int(c1[-1])
+        if c2 is not None:
+            stats.doublings = int(c2[-1])
+        for name, values, find in (('maxError', error, np.argmax), ('minH', h, np.argmin), ('maxH', h, np.argmax),
+                                   ('maxReferenceError', referenceError, np.argmax)):
+            if values is not None:
+                index = int(find(values))
+                setattr(stats, name, values[index])
+                setattr(stats, name + 'X', x[index])
+        return stats
+    def merged(self, following: 'RkStats'):
+        """
+        Статистика расчёта, продолженного вызовом following (RkCheckpoint): счётчики складываются,
+        экстремумы объединяются, последняя точка и расстояние до границы - от following.
+        """
+        stats = RkStats.from_buffer_copy(following)
+        for name in self.COUNTERS:
+            setattr(stats, name, getattr(self, name) + getattr(following, name))
+        for name, better in self.EXTREMES:
+            mine, theirs = getattr(self, name), getattr(following, name)
+            if not np.isnan(mine) and (np.isnan(theirs) or better(mine, theirs) != theirs):
+                setattr(stats, name, mine)
+                setattr(stats, name + 'X', getattr(self, name + 'X'))
+        return stats
+    def values(self):
+        return [float(getattr(self, name)) for name, _ in self._fields_]
+    def setValues(self, values):
+        for (name, kind), value in zip(self._fields_, values):
+            setattr(self, name, int(value) if kind is ctypes.c_longlong else float(value))
+
+@contextlib.contextmanager
+def trackStats(lib, stats: typing.Optional[RkStats]):
+    """
+    Передаёт библиотеке stats на время вызова решателя, как trackProgress.
+    """
+    if stats is None:
+        yield
+        return
+    lib.setStats(ctypes.byref(stats))
+    try:
+        yield
+    finally:
+        lib.setStats(None)
+
+def createResultBuffer(rows: int, columns: int):
+    """
+    Выделяет массив под результат решателя. Страницы памяти, до которых
+    решатель не дошёл, операционная система физически не выделяет.
+    """
+    return np.empty((max(rows, 0), columns), dtype=np.float64)
+
+# Способ контроля локальной погрешности (см. AdaptiveMethod в rk_core.h)
+ADAPTIVE_STEP_DOUBLING = 0      # Удвоение шага: шаг h и два шага h/2 методом РК4
+ADAPTIVE_DORMAND_PRINCE = 1     # Вложенная пара Дормана-Принса 5(4)
+ADAPTIVE_METHOD_NAMES = {ADAPTIVE_STEP_DOUBLING: 'Удвоение шага (РК4)', ADAPTIVE_DORMAND_PRINCE: 'Дорман-Принс 5(4)'}
+
+# Коды завершения решателя (см. RK_OK и RK_ERROR_* в rk_core.h)
+RK_OK = 0
+RK_ERROR_UNKNOWN_PROBLEM = -1
+RK_ERROR_OVERFLOW = -2
+RK_ERROR_NOT_FINITE = -3
+RK_ERROR_STEP_UNDERFLOW = -4
+RK_ERROR_INTERNAL = -5
+RK_ERROR_BAD_CHECKPOINT = -6
+RK_ERROR_MESSAGES = {
+    RK_ERROR_UNKNOWN_PROBLEM: 'Неизвестная задача',
+    RK_ERROR_OVERFLOW: 'Переполнение: решение вышло за пределы double',
+    RK_ERROR_NOT_FINITE: 'В решении появилось значение NaN',
+    RK_ERROR_STEP_UNDERFLOW: 'Шаг уменьшился до машинного нуля, расчёт не продвигается',
+    RK_ERROR_INTERNAL: 'Внутренняя ошибка решателя',
+    RK_ERROR_BAD_CHECKPOINT: 'Нет сохранённого состояния для продолжения расчёта',
+}
+
+class SolverError(ArithmeticError):
+    """
+    Решатель остановился с ошибкой code (RK_ERROR_*). headers и values - строки,
+    посчитанные до ошибки (values может быть пустым).
+    """
+    def __init__(self, code: int, headers=None, values=None):
+        super().__init__(RK_ERROR_MESSAGES.get(code, f"Ошибка решателя, код {code}"))
+        self.code = code
+        self.headers = headers
+        self.values = values
+
+def batchErrorCount(values):
+    """
+    Количество траекторий ансамбля с ошибкой: последний столбец результата solve_many_adaptive - код завершения.
+    """
+    return int(np.count_nonzero(values[:, -1] != RK_OK))
+
+def checkSolverStatus(status: int, headers, values):
+    """
+    Возвращает (headers, values), а при status != RK_OK бросает SolverError с этими строками.
+    """
+    if status != RK_OK:
+        raise SolverError(status, headers, values)
+    return headers, values
+
+# Формат файла результата решателя (см. rk_output.h)
+OUTPUT_FORMAT_CSV = 0
+OUTPUT_FORMAT_NPY = 1
+OUTPUT_EXTENSIONS = {OUTPUT_FORMAT_CSV: '.csv', OUTPUT_FORMAT_NPY: '.npy'}
+
+class NpyReaderMemmap:
+    """
+    Класс для чтения двоичных результатов (.npy со структурным типом, одно поле float64 на столбец).
+    Файл не разбирается, а отображается в память.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: Имя файла в каталоге output или абсолютный путь.
+        """
+        directory = self.getOutputDirectory()
+        self.filename = os.path.join(directory, filename)
+
+    def readAsNumpy(self):
+        """
+        Возвращает заголовки и значения в виде массивов NumPy, как CSVReaderPandas.readAsNumpy.
+        Значения - двумерное представление отображённого в память файла, без копирования.
+        """
+        records = np.load(self.filename, mmap_mode='r')
+        headers = np.array(records.dtype.names)
+        values = records.view(np.float64).reshape(len(records), len(headers))
+        return headers, values
+    def getOutputDirectory(self):
+        current_file_path = os.path.abspath(__file__)
+        current_directory = os.path.dirname(current_file_path)
+        parent_directory = os.path.dirname(current_directory)
+        return os.path.join(parent_directory, 'output')
+
+def saveResultNpy(filename, headers, values):
+    """
+    Сохраняет результат в том же формате, что пишут решатели в режиме OUTPUT_FORMAT_NPY.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    dtype = np.dtype([(str(name), '<f8') for name in headers])
+    records = values.reshape(-1).view(dtype)
+    np.save(filename, records)
+
+# Сохранение вкладки одним файлом: настройки и столбцы результата в сжатом архиве .npz
+BUNDLE_EXTENSION = '.npz'
+BUNDLE_VERSION = 1
+
+def saveResultBundle(filename, settings: dict, df: pd.DataFrame):
+    """
+    Сохраняет настройки (JSON-строкой) и столбцы df в один сжатый .npz. Каждый столбец - отдельный
+    массив: столбцы из целых значений (счётчики c1, c2) хранятся как int32, остальные - как float64.
+    Файл сначала пишется рядом под временным именем, поэтому прежнее сохранение не портится при ошибке.
+    """
+    arrays = {'version': np.array(BUNDLE_VERSION), 'settings': np.array(json.dumps(settings)),
+              'headers': np.asarray(df.columns, dtype=str)}
+    for index, name in enumerate(df.columns):
+        column = df[name].to_numpy()
+        if np.issubdtype(column.dtype, np.number):
+            column = column.astype(np.float64, copy=False)
+            integer = column.astype(np.int32)
+            if np.array_equal(integer, column):  # NaN и значения вне int32 не совпадут
+                column = integer
+        arrays[f'column{index}'] = column
+    temporary = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+class ResultBundle:
+    """
+    Чтение сохранения saveResultBundle. Архив не распаковывается целиком: при открытии читаются
+    только настройки и заголовки, каждый столбец распаковывается при первом обращении к нему.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.columns = {}
+        self.data = np.load(filename)
+        try:
+            version = int(self.data['version'])
+            if version > BUNDLE_VERSION:
+                raise ValueError(f"Сохранение версии {version} создано более новой версией программы")
+            self.settings = json.loads(str(self.data['settings']))
+            self.headers = self.data['headers']
+        except Exception:
+            self.data.close()
+            raise
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+    def close(self):
+        self.data.close()
+    def column(self, name):
+        """
+        Столбец name; распакованные столбцы запоминаются (NpzFile распаковывает заново при каждом обращении).
+        """
+        if name not in self.columns:
+            index = list(self.headers).index(name)
+            self.columns[name] = self.data[f'column{index}']
+        return self.columns[name]
+    def readAsNumpy(self):
+        """
+        Заголовки и значения float64, как NpyReaderMemmap.readAsNumpy.
+        """
+        values = np.column_stack([self.column(name) for name in self.headers]).astype(np.float64, copy=False)
+        return self.headers, values
+    def readAsDataFrame(self):
+        """
+        DataFrame со столбцами их собственных типов, без промежуточного двумерного массива.
+        """
+        return pd.DataFrame({str(name): self.column(name) for name in self.headers}, copy=False)
+
 class l1_test:
-    def __init__(self):
+    HEADERS_RK4 = np.array(['x', 'v', 'u'])
+    HEADERS_RK4_ADAPTIVE = np.array(['x', 'v', 'v2i', 'v-v2i', 'E', 'h', 'c1', 'c2', 'u', '|ui-vi|'])
+
+    def __init__(self, wait_for_build: bool = True):
         dynamicLibrary = CPPDynamicLibrary()
-        lib_path = dynamicLibrary.getPathTo("l1_test")
+        lib_path = dynamicLibrary.getPathTo("l1_test", wait_for_build)
         #print(f"load {lib_path}")
         if not os.path.exists(lib_path):
             raise FileNotFoundError(f"Не найден файл DLL по пути: {lib_path}")
@@ -72,21 +491,111 @@ class l1_test:
 
         self.lib.RK_4_adaptive.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int]
         self.lib.RK_4_adaptive.restype = ctypes.c_int
-    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int):
-        #int RK_4(double x0, double y0, double h, double xmax, int maxSteps)
-        code = self.lib.RK_4(x0, y0, h, xmax, maxSteps)
-        #print(code)
-        if code != 0:
-            raise Exception("Something went wrong")
-        #return self.getResult()
-    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int):
-        code = self.lib.RK_4_adaptive(x0, y0, h0, xmax, eps, eps_out, n_max)
-        #print(code)
-        if code != 0:
-            raise Exception("Something went wrong")
-        #return self.getResult()
+
+        #int RK_4_buffer(double x0, double y0, double h, double xmax, int Nmax, double* out, int capacity)
+        self.lib.RK_4_buffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_buffer.restype = ctypes.c_int
+
+        self.lib.RK_4_adaptive_buffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_adaptive_buffer.restype = ctypes.c_int
+
+        self.lib.DP_45_adaptive.argtypes = self.lib.RK_4_adaptive.argtypes
+        self.lib.DP_45_adaptive.restype = ctypes.c_int
+        self.lib.DP_45_adaptive_buffer.argtypes = self.lib.RK_4_adaptive_buffer.argtypes
+        self.lib.DP_45_adaptive_buffer.restype = ctypes.c_int
+
+        #int RK_4_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, const double* xEval, int evalCount, double* out, int capacity)
+        self.lib.RK_4_dense_buffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_dense_buffer.restype = ctypes.c_int
+
+        #int RK_4_adaptive_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity, const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows)
+        self.lib.RK_4_adaptive_dense_buffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        self.lib.RK_4_adaptive_dense_buffer.restype = ctypes.c_int
+
+        self.lib.setOutputFormat.argtypes = [ctypes.c_int]
+        self.lib.setOutputFormat.restype = None
+        self.lib.setOutputSampling.argtypes = [ctypes.c_int, ctypes.c_int, EvalPointsPointer, ctypes.c_int]
+        self.lib.setOutputSampling.restype = None
+        self.lib.setProgress.argtypes = [ctypes.POINTER(RkProgress)]
+        self.lib.setProgress.restype = None
+        self.lib.setCheckpoint.argtypes = [ctypes.POINTER(RkCheckpoint)]
+        self.lib.setCheckpoint.restype = None
+        self.lib.setStream.argtypes = [ctypes.POINTER(RkStream)]
+        self.lib.setStream.restype = None
+        self.lib.setStats.argtypes = [ctypes.POINTER(RkStats)]
+        self.lib.setStats.restype = None
+        self.lib.rkLastStatus.argtypes = []
+        self.lib.rkLastStatus.restype = ctypes.c_int
+        self.output_format = OUTPUT_FORMAT_CSV
+        self.sampling = (1, 0, None)
+    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        Возвращает (заголовки, значения) без записи на диск; значения - срез буфера решателя, без копирования.
+        """
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), len(self.HEADERS_RK4))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_buffer(x0, y0, h, xmax, maxSteps, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        :param method: ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (тогда v2i - решение вложенного метода 4-го порядка).
+        """
+        solver = self.lib.DP_45_adaptive_buffer if method == ADAPTIVE_DORMAND_PRINCE else self.lib.RK_4_adaptive_buffer
+        out = createResultBuffer(n_max + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = solver(x0, y0, h0, xmax, eps, eps_out, n_max, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows])
+    def rk4_adaptive_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        Плотный вывод: адаптивный метод идёт своим шагом, а решение возвращается в точках x_eval
+        (по возрастанию; точки вне пройденного отрезка пропускаются). Столбцы как у rk_4.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        with trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_dense_buffer(method, x0, y0, h0, xmax, eps, eps_out, n_max, x_eval, len(x_eval), out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive_with_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        rk4_adaptive и rk4_adaptive_dense за один расчёт: возвращает (результат rk4_adaptive, результат rk4_adaptive_dense).
+        SolverError содержит строки таблицы, посчитанные до ошибки.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(n_max + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        dense = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        dense_rows = ctypes.c_int(0)
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_adaptive_dense_buffer(method, x0, y0, h0, xmax, eps, eps_out, n_max, out, out.shape[0],
+                                                       x_eval, len(x_eval), dense, dense.shape[0], ctypes.byref(dense_rows))
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows]), (self.HEADERS_RK4, dense[:dense_rows.value])
+    def setOutputFormat(self, output_format: int):
+        """
+        Формат файла для rk_4_to_file/rk4_adaptive_to_file: OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY.
+        """
+        self.output_format = output_format
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        """
+        Прореживание вывода rk_4, rk4_adaptive и *_to_file прямо в цикле решателя: каждая every-я строка
+        или первые строки с x >= x_out[i] (по возрастанию), не больше max_rows строк (0 - без ограничения).
+        Последняя строка расчёта выводится всегда. Без аргументов прореживание отключается.
+        """
+        self.sampling = (every, max_rows, None if x_out is None else prepareEvalPoints(x_out))
+    def rk_4_to_file(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = self.lib.RK_4(x0, y0, h, xmax, maxSteps)
+        return checkSolverStatus(code, *self.getResult())
+    def rk4_adaptive_to_file(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        solver = self.lib.DP_45_adaptive if method == ADAPTIVE_DORMAND_PRINCE else self.lib.RK_4_adaptive
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = solver(x0, y0, h0, xmax, eps, eps_out, n_max)
+        return checkSolverStatus(code, *self.getResult())
     def getResult(self):
-        CSVReader = CSVReaderPandas('output_test.csv')
+        filename = 'output_test' + OUTPUT_EXTENSIONS[self.output_format]
+        if self.output_format == OUTPUT_FORMAT_NPY:
+            return NpyReaderMemmap(filename).readAsNumpy()
+        CSVReader = CSVReaderPandas(filename, delimiter=";")
         headers, values = CSVReader.readAsNumpy()
         return headers, values
 
@@ -95,9 +604,14 @@ class l1_test:
 
 
 class l1_1:
-    def __init__(self):
+    HEADERS_RK4 = np.array(['xi', 'vi'])
+    HEADERS_RK4_ADAPTIVE = np.array(['xi', 'vi', 'v2i', 'vi-v2i', 'E', 'hi', 'c1', 'c2'])
+    # Столбцы solve_many_adaptive: конечное состояние каждой траектории
+    HEADERS_BATCH_ADAPTIVE = np.array(['xi', 'vi', 'hi', 'c1', 'c2', 'steps', 'status'])
+
+    def __init__(self, wait_for_build: bool = True):
         dynamicLibrary = CPPDynamicLibrary()
-        lib_path = dynamicLibrary.getPathTo("l1_1")
+        lib_path = dynamicLibrary.getPathTo("l1_1", wait_for_build)
         if not os.path.exists(lib_path):
             raise FileNotFoundError(f"Не найден файл DLL по пути: {lib_path}")
         self.lib = ctypes.CDLL(lib_path)
@@ -107,26 +621,153 @@ class l1_1:
 
         self.lib.RK_4_adaptive.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int]
         self.lib.RK_4_adaptive.restype = ctypes.c_int
-    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int):
-        #int RK_4(double x0, double y0, double h, double xmax, int maxSteps)
-        code = self.lib.RK_4(x0, y0, h, xmax, maxSteps)
-        if code != 0:
-            raise Exception("Something went wrong")
-        return self.getResult()
-    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int):
-        code = self.lib.RK_4_adaptive(x0, y0, h0, xmax, eps, eps_out, n_max)
-        if code != 0:
-            raise Exception("Something went wrong")
-        return self.getResult()
+
+        self.lib.RK_4_buffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_buffer.restype = ctypes.c_int
+
+        self.lib.RK_4_adaptive_buffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_adaptive_buffer.restype = ctypes.c_int
+
+        self.lib.DP_45_adaptive.argtypes = self.lib.RK_4_adaptive.argtypes
+        self.lib.DP_45_adaptive.restype = ctypes.c_int
+        self.lib.DP_45_adaptive_buffer.argtypes = self.lib.RK_4_adaptive_buffer.argtypes
+        self.lib.DP_45_adaptive_buffer.restype = ctypes.c_int
+
+        #int RK_4_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, const double* xEval, int evalCount, double* out, int capacity)
+        self.lib.RK_4_dense_buffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_dense_buffer.restype = ctypes.c_int
+
+        #int RK_4_adaptive_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity, const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows)
+        self.lib.RK_4_adaptive_dense_buffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        self.lib.RK_4_adaptive_dense_buffer.restype = ctypes.c_int
+
+        #int RK_4_batch(double x0, double* y, int n, double h, double xmax, int maxSteps, double* out, int capacity)
+        self.lib.RK_4_batch.argtypes = [ctypes.c_double, StateArrayPointer, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.RK_4_batch.restype = ctypes.c_int
+
+        self.lib.RK_4_adaptive_batch.argtypes = [ctypes.c_double, StateArrayPointer, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer]
+        self.lib.RK_4_adaptive_batch.restype = ctypes.c_int
+
+        self.lib.setOutputFormat.argtypes = [ctypes.c_int]
+        self.lib.setOutputFormat.restype = None
+        self.lib.setOutputSampling.argtypes = [ctypes.c_int, ctypes.c_int, EvalPointsPointer, ctypes.c_int]
+        self.lib.setOutputSampling.restype = None
+        self.lib.setProgress.argtypes = [ctypes.POINTER(RkProgress)]
+        self.lib.setProgress.restype = None
+        self.lib.setCheckpoint.argtypes = [ctypes.POINTER(RkCheckpoint)]
+        self.lib.setCheckpoint.restype = None
+        self.lib.setStream.argtypes = [ctypes.POINTER(RkStream)]
+        self.lib.setStream.restype = None
+        self.lib.setStats.argtypes = [ctypes.POINTER(RkStats)]
+        self.lib.setStats.restype = None
+        self.lib.rkLastStatus.argtypes = []
+        self.lib.rkLastStatus.restype = ctypes.c_int
+        self.output_format = OUTPUT_FORMAT_CSV
+        self.sampling = (1, 0, None)
+    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), len(self.HEADERS_RK4))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_buffer(x0, y0, h, xmax, maxSteps, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        :param method: ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (тогда v2i - решение вложенного метода 4-го порядка).
+        """
+        solver = self.lib.DP_45_adaptive_buffer if method == ADAPTIVE_DORMAND_PRINCE else self.lib.RK_4_adaptive_buffer
+        out = createResultBuffer(n_max + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = solver(x0, y0, h0, xmax, eps, eps_out, n_max, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows])
+    def rk4_adaptive_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        Плотный вывод: адаптивный метод идёт своим шагом, а решение возвращается в точках x_eval
+        (по возрастанию; точки вне пройденного отрезка пропускаются). Столбцы как у rk_4.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        with trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_dense_buffer(method, x0, y0, h0, xmax, eps, eps_out, n_max, x_eval, len(x_eval), out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive_with_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        rk4_adaptive и rk4_adaptive_dense за один расчёт: возвращает (результат rk4_adaptive, результат rk4_adaptive_dense).
+        SolverError содержит строки таблицы, посчитанные до ошибки.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(n_max + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        dense = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        dense_rows = ctypes.c_int(0)
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.RK_4_adaptive_dense_buffer(method, x0, y0, h0, xmax, eps, eps_out, n_max, out, out.shape[0],
+                                                       x_eval, len(x_eval), dense, dense.shape[0], ctypes.byref(dense_rows))
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows]), (self.HEADERS_RK4, dense[:dense_rows.value])
+    def solve_many(self, y0_array, x0: float, h: float, xmax: float, maxSteps: int):
+        """
+        Интегрирует по одной траектории на каждое значение из y0_array за один вызов решателя.
+
+        :return: Двумерный массив, строка на шаг: x, затем значения всех траекторий.
+        """
+        y = np.array(y0_array, dtype=np.float64).ravel()
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), len(y) + 1)
+        steps = self.lib.RK_4_batch(x0, y, len(y), h, xmax, maxSteps, out, out.shape[0])
+        return out[:steps]
+    def solve_many_adaptive(self, y0_array, x0: float, h0: float, xmax: float, eps: float, eps_out: float, n_max: int):
+        """
+        Как solve_many, но с контролем локальной погрешности, у каждой траектории свой шаг.
+        Траектории считаются одним вызовом и хранятся структурой массивов, но правая часть вычисляется
+        для каждой траектории отдельно (у них разные x и h), поэтому выигрыш по сравнению с rk4_adaptive
+        для каждой траектории - в основном отсутствие накладных расходов на вызовы, а не векторизация.
+
+        Ошибка одной траектории (переполнение, шаг меньше машинной точности) не прерывает расчёт остальных:
+        она останавливается в последней принятой точке, а код ошибки (RK_ERROR_*) пишется в столбец status.
+
+        :return: (двумерный массив, строка на траекторию, столбцы HEADERS_BATCH_ADAPTIVE; количество итераций
+                 общего цикла; количество траекторий с ошибкой).
+        """
+        y = np.array(y0_array, dtype=np.float64).ravel()
+        out = createResultBuffer(len(y), len(self.HEADERS_BATCH_ADAPTIVE))
+        iterations = self.lib.RK_4_adaptive_batch(x0, y, len(y), h0, xmax, eps, eps_out, n_max, out)
+        return out, iterations, batchErrorCount(out)
+    def setOutputFormat(self, output_format: int):
+        """
+        Формат файла для rk_4_to_file/rk4_adaptive_to_file: OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY.
+        """
+        self.output_format = output_format
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        """
+        Прореживание вывода rk_4, rk4_adaptive и *_to_file прямо в цикле решателя: каждая every-я строка
+        или первые строки с x >= x_out[i] (по возрастанию), не больше max_rows строк (0 - без ограничения).
+        Последняя строка расчёта выводится всегда. Без аргументов прореживание отключается.
+        """
+        self.sampling = (every, max_rows, None if x_out is None else prepareEvalPoints(x_out))
+    def rk_4_to_file(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = self.lib.RK_4(x0, y0, h, xmax, maxSteps)
+        return checkSolverStatus(code, *self.getResult())
+    def rk4_adaptive_to_file(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        solver = self.lib.DP_45_adaptive if method == ADAPTIVE_DORMAND_PRINCE else self.lib.RK_4_adaptive
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = solver(x0, y0, h0, xmax, eps, eps_out, n_max)
+        return checkSolverStatus(code, *self.getResult())
     def getResult(self):
-        CSVReader = CSVReaderPandas('output_test.csv')
+        filename = 'output_1' + OUTPUT_EXTENSIONS[self.output_format]
+        if self.output_format == OUTPUT_FORMAT_NPY:
+            return NpyReaderMemmap(filename).readAsNumpy()
+        CSVReader = CSVReaderPandas(filename, delimiter=";")
         headers, values = CSVReader.readAsNumpy()
         return headers, values
 
 class l1_2:
-    def __init__(self):
+    HEADERS_RK4 = np.array(['xi', 'vi1', 'vi2'])
+    HEADERS_RK4_ADAPTIVE = np.array(['xi', 'vi', 'vi2', "v'i", "v'i2", 'vi-vi2', "v'i-v'i2", 'hi', 'E', 'E_v', "E_v'", 'c1', 'c2'])
+    # Столбцы solve_many_adaptive: конечное состояние каждой траектории
+    HEADERS_BATCH_ADAPTIVE = np.array(['xi', 'vi', "v'i", 'hi', 'c1', 'c2', 'steps', 'status'])
+
+    def __init__(self, wait_for_build: bool = True):
         dynamicLibrary = CPPDynamicLibrary()
-        lib_path = dynamicLibrary.getPathTo("l1_2")
+        lib_path = dynamicLibrary.getPathTo("l1_2", wait_for_build)
         if not os.path.exists(lib_path):
             raise FileNotFoundError(f"Не найден файл DLL по пути: {lib_path}")
         self.lib = ctypes.CDLL(lib_path)
@@ -137,24 +778,603 @@ class l1_2:
         #int rungeKuttaAdaptive(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge)
         self.lib.rungeKuttaAdaptive.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double]
         self.lib.rungeKuttaAdaptive.restype = ctypes.c_int
-    def rk_4(self, x0: float, y10: float, y20: float, h:float, xmax:float, a: float, b: float, maxSteps: int):
-        #int RK_4(double x0, double y0, double h, double xmax, int maxSteps)
-        code = self.lib.rungeKutta(x0, y10, y20, h, xmax, a, b, maxSteps)
-        if code != 0:
-            raise Exception("Something went wrong")
-        return self.getResult()
-    def rk4_adaptive(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float):
-        code = self.lib.rungeKuttaAdaptive(x0, y10, y20, h, xmax, a, b, maxSteps, tolerance, edge)
-        if code != 0:
-            raise Exception("Something went wrong")
-        return self.getResult()
+
+        #int rungeKuttaBuffer(double x0, double y10, double y20, double h, double xmax, double a, double b, int maxSteps, double* out, int capacity)
+        self.lib.rungeKuttaBuffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rungeKuttaBuffer.restype = ctypes.c_int
+
+        self.lib.rungeKuttaAdaptiveBuffer.argtypes = [ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, ResultBufferPointer, ctypes.c_int]
+        self.lib.rungeKuttaAdaptiveBuffer.restype = ctypes.c_int
+
+        self.lib.dormandPrinceAdaptive.argtypes = self.lib.rungeKuttaAdaptive.argtypes
+        self.lib.dormandPrinceAdaptive.restype = ctypes.c_int
+        self.lib.dormandPrinceAdaptiveBuffer.argtypes = self.lib.rungeKuttaAdaptiveBuffer.argtypes
+        self.lib.dormandPrinceAdaptiveBuffer.restype = ctypes.c_int
+
+        #int rungeKuttaDenseBuffer(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, const double* xEval, int evalCount, double* out, int capacity)
+        self.lib.rungeKuttaDenseBuffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rungeKuttaDenseBuffer.restype = ctypes.c_int
+
+        #int rungeKuttaAdaptiveDenseBuffer(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, double* out, int capacity, const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows)
+        self.lib.rungeKuttaAdaptiveDenseBuffer.argtypes = [ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, ResultBufferPointer, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int, ctypes.POINTER(ctypes.c_int)]
+        self.lib.rungeKuttaAdaptiveDenseBuffer.restype = ctypes.c_int
+
+        #int rungeKuttaBatch(double x0, double* y1, double* y2, int n, double h, double xmax, double a, double b, int maxSteps, double* out, int capacity)
+        self.lib.rungeKuttaBatch.argtypes = [ctypes.c_double, StateArrayPointer, StateArrayPointer, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rungeKuttaBatch.restype = ctypes.c_int
+
+        self.lib.rungeKuttaAdaptiveBatch.argtypes = [ctypes.c_double, StateArrayPointer, StateArrayPointer, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, ResultBufferPointer]
+        self.lib.rungeKuttaAdaptiveBatch.restype = ctypes.c_int
+
+        self.lib.setOutputFormat.argtypes = [ctypes.c_int]
+        self.lib.setOutputFormat.restype = None
+        self.lib.setOutputSampling.argtypes = [ctypes.c_int, ctypes.c_int, EvalPointsPointer, ctypes.c_int]
+        self.lib.setOutputSampling.restype = None
+        self.lib.setProgress.argtypes = [ctypes.POINTER(RkProgress)]
+        self.lib.setProgress.restype = None
+        self.lib.setCheckpoint.argtypes = [ctypes.POINTER(RkCheckpoint)]
+        self.lib.setCheckpoint.restype = None
+        self.lib.setStream.argtypes = [ctypes.POINTER(RkStream)]
+        self.lib.setStream.restype = None
+        self.lib.setStats.argtypes = [ctypes.POINTER(RkStats)]
+        self.lib.setStats.restype = None
+        self.lib.rkLastStatus.argtypes = []
+        self.lib.rkLastStatus.restype = ctypes.c_int
+        self.output_format = OUTPUT_FORMAT_CSV
+        self.sampling = (1, 0, None)
+    def rk_4(self, x0: float, y10: float, y20: float, h:float, xmax:float, a: float, b: float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), len(self.HEADERS_RK4))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rungeKuttaBuffer(x0, y10, y20, h, xmax, a, b, maxSteps, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        :param method: ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (тогда vi2, v'i2 - решение вложенного метода 4-го порядка).
+        """
+        solver = self.lib.dormandPrinceAdaptiveBuffer if method == ADAPTIVE_DORMAND_PRINCE else self.lib.rungeKuttaAdaptiveBuffer
+        out = createResultBuffer(maxSteps + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = solver(x0, y10, y20, h, xmax, a, b, maxSteps, tolerance, edge, out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows])
+    def rk4_adaptive_dense(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        Плотный вывод: адаптивный метод идёт своим шагом, а решение возвращается в точках x_eval
+        (по возрастанию; точки вне пройденного отрезка пропускаются). Столбцы как у rk_4.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        with trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rungeKuttaDenseBuffer(method, x0, y10, y20, h, xmax, a, b, maxSteps, tolerance, edge, x_eval, len(x_eval), out, out.shape[0])
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4, out[:rows])
+    def rk4_adaptive_with_dense(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        rk4_adaptive и rk4_adaptive_dense за один расчёт: возвращает (результат rk4_adaptive, результат rk4_adaptive_dense).
+        SolverError содержит строки таблицы, посчитанные до ошибки.
+        """
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(maxSteps + 1, len(self.HEADERS_RK4_ADAPTIVE))
+        dense = createResultBuffer(len(x_eval), len(self.HEADERS_RK4))
+        dense_rows = ctypes.c_int(0)
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rungeKuttaAdaptiveDenseBuffer(method, x0, y10, y20, h, xmax, a, b, maxSteps, tolerance, edge, out, out.shape[0],
+                                                          x_eval, len(x_eval), dense, dense.shape[0], ctypes.byref(dense_rows))
+        return checkSolverStatus(self.lib.rkLastStatus(), self.HEADERS_RK4_ADAPTIVE, out[:rows]), (self.HEADERS_RK4, dense[:dense_rows.value])
+    def solve_many(self, y0_array, x0: float, h: float, xmax: float, a: float, b: float, maxSteps: int):
+        """
+        Интегрирует по одной траектории на каждую пару (u0, u'0) из y0_array (форма (n, 2))
+        за один вызов решателя.
+
+        :return: Двумерный массив, строка на шаг: x, затем u всех траекторий, затем u' всех траекторий.
+        """
+        y0 = np.asarray(y0_array, dtype=np.float64).reshape(-1, 2)
+        y1 = np.ascontiguousarray(y0[:, 0])
+        y2 = np.ascontiguousarray(y0[:, 1])
+        n = len(y1)
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), 2 * n + 1)
+        steps = self.lib.rungeKuttaBatch(x0, y1, y2, n, h, xmax, a, b, maxSteps, out, out.shape[0])
+        return out[:steps]
+    def solve_many_adaptive(self, y0_array, x0: float, h0: float, xmax: float, a: float, b: float, maxSteps: int, tolerance: float, edge: float):
+        """
+        Как solve_many, но с контролем локальной погрешности, у каждой траектории свой шаг.
+        Траектории считаются одним вызовом и хранятся структурой массивов, но правая часть вычисляется
+        для каждой траектории отдельно (у них разные x и h), поэтому выигрыш по сравнению с rk4_adaptive
+        для каждой траектории - в основном отсутствие накладных расходов на вызовы, а не векторизация.
+
+        Ошибка одной траектории (переполнение, шаг меньше машинной точности) не прерывает расчёт остальных:
+        она останавливается в последней принятой точке, а код ошибки (RK_ERROR_*) пишется в столбец status.
+
+        :return: (двумерный массив, строка на траекторию, столбцы HEADERS_BATCH_ADAPTIVE; количество итераций
+                 общего цикла; количество траекторий с ошибкой).
+        """
+        y0 = np.asarray(y0_array, dtype=np.float64).reshape(-1, 2)
+        y1 = np.ascontiguousarray(y0[:, 0])
+        y2 = np.ascontiguousarray(y0[:, 1])
+        out = createResultBuffer(len(y1), len(self.HEADERS_BATCH_ADAPTIVE))
+        iterations = self.lib.rungeKuttaAdaptiveBatch(x0, y1, y2, len(y1), h0, xmax, a, b, maxSteps, tolerance, edge, out)
+        return out, iterations, batchErrorCount(out)
+    def setOutputFormat(self, output_format: int):
+        """
+        Формат файла для rk_4_to_file/rk4_adaptive_to_file: OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY.
+        """
+        self.output_format = output_format
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        """
+        Прореживание вывода rk_4, rk4_adaptive и *_to_file прямо в цикле решателя: каждая every-я строка
+        или первые строки с x >= x_out[i] (по возрастанию), не больше max_rows строк (0 - без ограничения).
+        Последняя строка расчёта выводится всегда. Без аргументов прореживание отключается.
+        """
+        self.sampling = (every, max_rows, None if x_out is None else prepareEvalPoints(x_out))
+    def rk_4_to_file(self, x0: float, y10: float, y20: float, h:float, xmax:float, a: float, b: float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = self.lib.rungeKutta(x0, y10, y20, h, xmax, a, b, maxSteps)
+        return checkSolverStatus(code, *self.getResult())
+    def rk4_adaptive_to_file(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        solver = self.lib.dormandPrinceAdaptive if method == ADAPTIVE_DORMAND_PRINCE else self.lib.rungeKuttaAdaptive
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress):
+            self.lib.setOutputFormat(self.output_format)
+            code = solver(x0, y10, y20, h, xmax, a, b, maxSteps, tolerance, edge)
+        return checkSolverStatus(code, *self.getResult())
     def getResult(self):
-        CSVReader = CSVReaderPandas('output_test.csv')
+        filename = 'output_2' + OUTPUT_EXTENSIONS[self.output_format]
+        if self.output_format == OUTPUT_FORMAT_NPY:
+            return NpyReaderMemmap(filename).readAsNumpy()
+        CSVReader = CSVReaderPandas(filename, delimiter=";")
         headers, values = CSVReader.readAsNumpy()
         return headers, values
 
+class rk_core:
+    """
+    Универсальный решатель: задачи из реестра rk_problems.h, выбираемые по имени
+    ('test', 'main1', 'main2', 'ksr11', ...).
+    """
+    ERROR_UNKNOWN_PROBLEM = RK_ERROR_UNKNOWN_PROBLEM
+    ERROR_OVERFLOW = RK_ERROR_OVERFLOW
 
+    def __init__(self):
+        dynamicLibrary = CPPDynamicLibrary()
+        lib_path = dynamicLibrary.getPathTo("rk_core")
+        if not os.path.exists(lib_path):
+            raise FileNotFoundError(f"Не найден файл DLL по пути: {lib_path}")
+        self.lib = ctypes.CDLL(lib_path)
+
+        self.lib.rkProblemCount.argtypes = []
+        self.lib.rkProblemCount.restype = ctypes.c_int
+        self.lib.rkProblemName.argtypes = [ctypes.c_int]
+        self.lib.rkProblemName.restype = ctypes.c_char_p
+        self.lib.rkProblemFind.argtypes = [ctypes.c_char_p]
+        self.lib.rkProblemFind.restype = ctypes.c_int
+        self.lib.rkProblemDimension.argtypes = [ctypes.c_int]
+        self.lib.rkProblemDimension.restype = ctypes.c_int
+        self.lib.rkProblemParamCount.argtypes = [ctypes.c_int]
+        self.lib.rkProblemParamCount.restype = ctypes.c_int
+
+        #int rkSolve(int problem, const double* params, double x0, const double* y0, double h, double xmax, int maxSteps, double* out, int capacity)
+        self.lib.rkSolve.argtypes = [ctypes.c_int, StateArrayPointer, ctypes.c_double, StateArrayPointer, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rkSolve.restype = ctypes.c_int
+
+        #int rkSolveAdaptive(int problem, const double* params, double x0, const double* y0, double h0, double xmax, int maxSteps, double tolerance, double edge, int method, double* out, int capacity)
+        self.lib.rkSolveAdaptive.argtypes = [ctypes.c_int, StateArrayPointer, ctypes.c_double, StateArrayPointer, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rkSolveAdaptive.restype = ctypes.c_int
+
+        #int rkSolveDense(int problem, const double* params, double x0, const double* y0, double h0, double xmax, int maxSteps, double tolerance, double edge, int method, const double* xEval, int evalCount, double* out, int capacity)
+        self.lib.rkSolveDense.argtypes = [ctypes.c_int, StateArrayPointer, ctypes.c_double, StateArrayPointer, ctypes.c_double, ctypes.c_double, ctypes.c_int, ctypes.c_double, ctypes.c_double, ctypes.c_int, EvalPointsPointer, ctypes.c_int, ResultBufferPointer, ctypes.c_int]
+        self.lib.rkSolveDense.restype = ctypes.c_int
+
+        self.lib.setOutputSampling.argtypes = [ctypes.c_int, ctypes.c_int, EvalPointsPointer, ctypes.c_int]
+        self.lib.setOutputSampling.restype = None
+        self.lib.setProgress.argtypes = [ctypes.POINTER(RkProgress)]
+        self.lib.setProgress.restype = None
+        self.lib.setCheckpoint.argtypes = [ctypes.POINTER(RkCheckpoint)]
+        self.lib.setCheckpoint.restype = None
+        self.lib.setStream.argtypes = [ctypes.POINTER(RkStream)]
+        self.lib.setStream.restype = None
+        self.lib.setStats.argtypes = [ctypes.POINTER(RkStats)]
+        self.lib.setStats.restype = None
+        self.lib.rkLastStatus.argtypes = []
+        self.lib.rkLastStatus.restype = ctypes.c_int
+        self.sampling = (1, 0, None)
+    def problems(self):
+        """
+        Имена задач реестра.
+        """
+        return [self.lib.rkProblemName(i).decode() for i in range(self.lib.rkProblemCount())]
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        """
+        Прореживание вывода rk_4 и rk4_adaptive прямо в цикле решателя: каждая every-я строка
+        или первые строки с x >= x_out[i] (по возрастанию), не больше max_rows строк (0 - без ограничения).
+        Последняя строка расчёта выводится всегда. Без аргументов прореживание отключается.
+        """
+        self.sampling = (every, max_rows, None if x_out is None else prepareEvalPoints(x_out))
+    def _prepare(self, problem: str, params, y0):
+        index = self.lib.rkProblemFind(problem.encode())
+        if index < 0:
+            raise ValueError(f"Неизвестная задача: {problem}")
+        n = self.lib.rkProblemDimension(index)
+        params = np.zeros(max(self.lib.rkProblemParamCount(index), 1), dtype=np.float64) if params is None else np.ascontiguousarray(params, dtype=np.float64)
+        y0 = np.ascontiguousarray(np.atleast_1d(y0), dtype=np.float64)
+        if len(y0) != n:
+            raise ValueError(f"Задача {problem} имеет размерность {n}, передано начальных значений: {len(y0)}")
+        return index, n, params, y0
+    def _check(self, rows: int, headers, out):
+        if rows < 0:
+            raise SolverError(rows)
+        return checkSolverStatus(self.lib.rkLastStatus(), headers, out[:rows])
+    def rk_4(self, problem: str, params, x0: float, y0, h: float, xmax: float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        :return: (заголовки, значения), столбцы: x, y0..y(n-1).
+        """
+        index, n, params, y0 = self._prepare(problem, params, y0)
+        out = createResultBuffer(fixedStepCapacity(x0, h, xmax, maxSteps), n + 1)
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rkSolve(index, params, x0, y0, h, xmax, maxSteps, out, out.shape[0])
+        headers = np.array(['x'] + [f'y{i}' for i in range(n)])
+        return self._check(rows, headers, out)
+    def rk4_adaptive(self, problem: str, params, x0: float, y0, h0: float, xmax: float, maxSteps: int, tolerance: float, edge: float, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        :return: (заголовки, значения), столбцы: x, y0..y(n-1), y0_2..y(n-1)_2 (контрольное решение), h, E, c1, c2.
+        """
+        index, n, params, y0 = self._prepare(problem, params, y0)
+        out = createResultBuffer(maxSteps + 1, 2 * n + 5)
+        with trackSampling(self.lib, self.sampling), trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rkSolveAdaptive(index, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, method, out, out.shape[0])
+        headers = np.array(['x'] + [f'y{i}' for i in range(n)] + [f'y{i}_2' for i in range(n)] + ['h', 'E', 'c1', 'c2'])
+        return self._check(rows, headers, out)
+    def rk4_dense(self, problem: str, params, x0: float, y0, h0: float, xmax: float, maxSteps: int, tolerance: float, edge: float, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        """
+        Плотный вывод адаптивного метода в точках x_eval (по возрастанию).
+        :return: (заголовки, значения), столбцы как у rk_4: x, y0..y(n-1).
+        """
+        index, n, params, y0 = self._prepare(problem, params, y0)
+        x_eval = prepareEvalPoints(x_eval)
+        out = createResultBuffer(len(x_eval), n + 1)
+        with trackProgress(self.lib, progress), trackCheckpoint(self.lib, checkpoint), trackStream(self.lib, stream), trackStats(self.lib, stats):
+            rows = self.lib.rkSolveDense(index, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, method, x_eval, len(x_eval), out, out.shape[0])
+        headers = np.array(['x'] + [f'y{i}' for i in range(n)])
+        return self._check(rows, headers, out)
 
 
+# Кэш результатов решателей: повторный расчёт с теми же параметрами (например, возврат к прежнему
+# набору параметров на вкладке) берётся из памяти или с диска, а не интегрируется заново.
+# Ключ - класс решателя, хэш файла библиотеки (для ядра NumPy - модуля RK_numpy), метод,
+# все его аргументы (массивы - по содержимому) и прореживание вывода.
+RESULT_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+RESULT_CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024
 
-        
\ No newline at end of file
+class ResultCache:
+    """
+    Двухуровневый кэш результатов (заголовки, значения): в памяти - LRU с ограничением по байтам,
+    на диске - сжатые .npz в directory (None - только память); при переполнении каталога
+    удаляются файлы, которые дольше всего не использовались. Потокобезопасен.
+    """
+    def __init__(self, directory: typing.Optional[str] = RESULT_CACHE_DIRECTORY,
+                 memory_bytes: int = RESULT_CACHE_MEMORY_BYTES, disk_bytes: int = RESULT_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+    def get(self, key: str):
+        """
+        (заголовки, значения) или None, если результата нет ни в памяти, ни на диске.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        entry = self._load(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+    def put(self, key: str, headers, values):
+        """
+        Сохраняет копию результата (буфер решателя бывает больше самого результата) и возвращает её.
+        Значения в кэше только для чтения.
+        """
+        values = np.array(values, dtype=np.float64)
+        values.setflags(write=False)
+        entry = (headers, values)
+        self._remember(key, entry)
+        self._store(key, entry)
+        return entry
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    self._remove(os.path.join(self.directory, name))
+    def _remember(self, key, entry):
+        nbytes = entry[1].nbytes
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1].nbytes
+            if nbytes > self.memory_bytes:
+                return
+            self.entries[key] = entry
+            self.size += nbytes
+            while self.size > self.memory_bytes:
+                _, (headers, values) = self.entries.popitem(last=False)
+                self.size -= values.nbytes
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                headers, values = data['headers'], data['values']
+            os.utime(path)  # Время использования для вытеснения
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)  # Повреждённый или недописанный файл
+            return None
+        values.setflags(write=False)
+        return headers, values
+    def _store(self, key, entry):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, 'wb') as file:
+                np.savez_compressed(file, headers=np.asarray(entry[0], dtype=str), values=entry[1])
+            os.replace(temporary, path)
+        except OSError:
+            self._remove(temporary)
+            return
+        self._evictDisk()
+    def _evictDisk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_defaultResultCache = None
+
+def defaultResultCache():
+    """
+    Общий кэш вкладок (каталог RESULT_CACHE_DIRECTORY), создаётся при первом обращении.
+    """
+    global _defaultResultCache
+    if _defaultResultCache is None:
+        _defaultResultCache = ResultCache()
+    return _defaultResultCache
+
+# Хэши файлов библиотек: (путь, время изменения, размер) -> sha256 содержимого
+_buildHashes = {}
+
+def solverBuildHash(solver):
+    """
+    Хэш сборки решателя: файла библиотеки C++ или модуля ядра NumPy. Пересборка меняет ключи кэша.
+    """
+    lib = getattr(solver, 'lib', None)
+    path = lib._name if lib is not None else sys.modules[type(solver).__module__].__file__
+    stat = os.stat(path)
+    memo = (path, stat.st_mtime_ns, stat.st_size)
+    if memo not in _buildHashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        _buildHashes[memo] = digest.hexdigest()
+    return _buildHashes[memo]
+
+def hashArgument(digest, value):
+    """
+    Добавляет значение аргумента к ключу: числа - точно (float.hex), массивы и списки - по содержимому.
+    """
+    if value is None or isinstance(value, str):
+        digest.update(repr(value).encode())
+    elif isinstance(value, (int, float, np.integer, np.floating)):
+        digest.update(float(value).hex().encode())
+    elif isinstance(value, tuple):
+        digest.update(b'(')
+        for item in value:
+            hashArgument(digest, item)
+        digest.update(b')')
+    else:
+        array = np.ascontiguousarray(value, dtype=np.float64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.tobytes())
+    digest.update(b'|')
+
+class CachedSolver:
+    """
+    Решатель с кэшем результатов: rk_4, rk4_adaptive, rk4_adaptive_dense, rk4_adaptive_with_dense (rk4_dense
+    у rk_core) отдают результат из cache, если он уже считался с теми же аргументами; остальное передаётся
+    решателю как есть. Плотный вывод rk4_adaptive_with_dense хранится рядом с таблицей.
+    Расчёты с ошибкой (SolverError) и отменённые через progress не кэшируются. Состояние продолжаемого
+    расчёта (checkpoint с resume) входит в ключ, а итоговое состояние хранится рядом с результатом.
+    stream в ключ не входит и при попадании в кэш не заполняется, статистика (stats) хранится рядом с результатом.
+    Прореживание вывода нужно задавать через setOutputSampling этого объекта, иначе оно не попадёт в ключ.
+    """
+    CACHED_METHODS = ('rk_4', 'rk4_adaptive', 'rk4_adaptive_dense', 'rk4_adaptive_with_dense', 'rk4_dense')
+    DENSE_METHODS = ('rk4_adaptive_with_dense',)  # Возвращают пару (таблица, плотный вывод)
+    CHECKPOINT_HEADERS = np.array(['dimension', 'c1', 'c2', 'x', 'h', 'y'])
+    STATS_HEADERS = np.array([name for name, _ in RkStats._fields_])
+
+    def __init__(self, solver, cache: ResultCache):
+        self.solver = solver
+        self.cache = cache
+        self.sampling = (1, 0, None)
+    def __getattr__(self, name):
+        attribute = getattr(self.solver, name)
+        if name not in self.CACHED_METHODS:
+            return attribute
+        @functools.wraps(attribute)
+        def cached(*args, **kwargs):
+            return self._call(attribute, args, kwargs)
+        return cached
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        self.solver.setOutputSampling(every, max_rows, x_out)
+        self.sampling = (every, max_rows, None if x_out is None else prepareEvalPoints(x_out))
+    def _call(self, function, args, kwargs):
+        arguments = inspect.signature(function).bind(*args, **kwargs)
+        arguments.apply_defaults()
+        progress = arguments.arguments.pop('progress', None)
+        checkpoint = arguments.arguments.pop('checkpoint', None)
+        arguments.arguments.pop('stream', None)
+        stats = arguments.arguments.pop('stats', None)
+        # Ключ - по решателю, который считает (PendingSolver переходит с NumPy на библиотеку после сборки)
+        solver = function.__self__
+        digest = hashlib.sha256()
+        for part in (type(solver).__module__, type(solver).__name__, solverBuildHash(solver), function.__name__, self.sampling):
+            hashArgument(digest, part)
+        for value in arguments.arguments.values():
+            hashArgument(digest, value)
+        if checkpoint is not None and checkpoint.resume:
+            hashArgument(digest, (checkpoint.saved, checkpoint.dimension, checkpoint.c1, checkpoint.c2, checkpoint.x, checkpoint.h,
+                                  tuple(checkpoint.y[:checkpoint.dimension])))
+        key = digest.hexdigest()
+
+        dense = function.__name__ in self.DENSE_METHODS
+        cached = self.cache.get(key)
+        if dense and cached is not None:
+            cachedDense = self.cache.get(key + '.dense')
+            cached = None if cachedDense is None else (cached, cachedDense)
+        if (cached is not None and (checkpoint is None or self._restoreCheckpoint(key, checkpoint))
+                and (stats is None or self._restoreStats(key, stats))):
+            return cached
+        result = function(*args, **kwargs)
+        if progress is not None and progress.cancel:
+            return result
+        if checkpoint is not None and checkpoint.saved:
+            state = [checkpoint.dimension, checkpoint.c1, checkpoint.c2, checkpoint.x, checkpoint.h] + list(checkpoint.y[:checkpoint.dimension])
+            self.cache.put(key + '.checkpoint', self.CHECKPOINT_HEADERS, np.array([state]))
+        if stats is not None:
+            self.cache.put(key + '.stats', self.STATS_HEADERS, np.array([stats.values()]))
+        if dense:
+            return self.cache.put(key, *result[0]), self.cache.put(key + '.dense', *result[1])
+        return self.cache.put(key, *result)
+    def _restoreCheckpoint(self, key, checkpoint: RkCheckpoint):
+        """
+        Записывает в checkpoint итоговое состояние закэшированного расчёта; False, если его нет в кэше.
+        """
+        cached = self.cache.get(key + '.checkpoint')
+        if cached is None:
+            return False
+        state = cached[1][0]
+        checkpoint.dimension, checkpoint.c1, checkpoint.c2 = int(state[0]), int(state[1]), int(state[2])
+        checkpoint.x, checkpoint.h = state[3], state[4]
+        checkpoint.y[:checkpoint.dimension] = list(state[5:5 + checkpoint.dimension])
+        checkpoint.saved = 1
+        return True
+    def _restoreStats(self, key, stats: RkStats):
+        """
+        Записывает в stats статистику закэшированного расчёта; False, если её нет в кэше.
+        """
+        cached = self.cache.get(key + '.stats')
+        if cached is None:
+            return False
+        stats.setValues(cached[1][0])
+        return True
+
+
+# Выбор вычислительного ядра: 'native' - библиотеки C++, 'numpy' - RK_numpy,
+# 'auto' (по умолчанию) - библиотеки C++, а если для платформы их нет или они устарели - RK_numpy
+ENGINE_ENVIRONMENT_VARIABLE = 'RK_ENGINE'
+ENGINES = ('auto', 'native', 'numpy')
+
+def createSolver(name: str, engine: typing.Optional[str] = None, cache: typing.Optional[ResultCache] = None,
+                 wait_for_build: bool = True):
+    """
+    Создаёт решатель задачи name ('l1_test', 'l1_1', 'l1_2') на выбранном ядре.
+
+    :param engine: 'auto', 'native' или 'numpy'; по умолчанию берётся из переменной окружения RK_ENGINE.
+    :param cache: Кэш результатов (например, defaultResultCache()); тогда решатель оборачивается в CachedSolver.
+    :param wait_for_build: False - не ждать сборки библиотеки (build_libs) при ядре 'auto': пока она собирается
+        в фоне, решатель (PendingSolver) считает на ядре NumPy. Ядро 'native' сборку ждёт всегда.
+    """
+    solver = _createEngineSolver(name, engine, wait_for_build)
+    return solver if cache is None else CachedSolver(solver, cache)
+
+NATIVE_SOLVERS = {'l1_test': l1_test, 'l1_1': l1_1, 'l1_2': l1_2}
+
+def _createEngineSolver(name: str, engine: typing.Optional[str], wait_for_build: bool = True):
+    engine = (engine or os.environ.get(ENGINE_ENVIRONMENT_VARIABLE, 'auto')).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестное ядро {engine}, допустимые значения: {', '.join(ENGINES)}")
+    if engine != 'numpy':
+        try:
+            return NATIVE_SOLVERS[name](wait_for_build or engine == 'native')
+        except (FileNotFoundError, OSError, AttributeError) as e:
+            # AttributeError - в библиотеке нет нужной функции (устаревшая сборка в libs)
+            if engine == 'native':
+                raise
+            build = build_libs.libraryBuild(name)
+            if build is not None and not build.done():
+                print(f"Библиотека {name} собирается, до конца сборки используется ядро NumPy", file=sys.stderr)
+                return PendingSolver(name, build)
+            print(f"Библиотека {name} недоступна или устарела ({e}), используется ядро NumPy", file=sys.stderr)
+    import RK_numpy
+    return getattr(RK_numpy, name)()
+
+class PendingSolver:
+    """
+    Решатель задачи name, библиотека которой собирается в фоне (build - Future из build_libs.libraryBuild):
+    пока сборка идёт, считает ядро NumPy, после неё - библиотека. Переход происходит между вызовами
+    (начатый расчёт досчитывается на NumPy); прореживание и формат вывода переносятся в новый решатель.
+    """
+    def __init__(self, name: str, build):
+        import RK_numpy
+        self.name = name
+        self.build = build
+        self.solver = getattr(RK_numpy, name)()
+        self.sampling = None
+        self.output_format = None
+        self.lock = threading.Lock()
+    def current(self):
+        """
+        Решатель, который сейчас считает.
+        """
+        with self.lock:
+            if self.build is not None and self.build.done():
+                built, self.build = self.build.result(), None
+                if built:
+                    self._switch()
+            return self.solver
+    def _switch(self):
+        try:
+            solver = NATIVE_SOLVERS[self.name]()
+        except (FileNotFoundError, OSError, AttributeError) as e:
+            print(f"Собранная библиотека {self.name} не загружается ({e}), остаётся ядро NumPy", file=sys.stderr)
+            return
+        if self.sampling is not None:
+            solver.setOutputSampling(*self.sampling)
+        if self.output_format is not None:
+            solver.setOutputFormat(self.output_format)
+        self.solver = solver
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        self.sampling = (every, max_rows, x_out)
+        self.current().setOutputSampling(every, max_rows, x_out)
+    def setOutputFormat(self, output_format: int):
+        self.output_format = output_format
+        self.current().setOutputFormat(output_format)
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
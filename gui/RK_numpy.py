@@ -0,0 +1,835 @@
+import os
+import typing
+import threading
+import contextlib
+import numpy as np
+
+import RK
+from RK import fixedStepCapacity, prepareEvalPoints, saveResultNpy, NpyReaderMemmap, CSVReaderPandas, OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_NPY, OUTPUT_EXTENSIONS, ADAPTIVE_STEP_DOUBLING, ADAPTIVE_DORMAND_PRINCE, RkProgress, RK_PROGRESS_INTERVAL
+from RK import SolverError, checkSolverStatus, batchErrorCount, RK_OK, RK_ERROR_OVERFLOW, RK_ERROR_NOT_FINITE, RK_ERROR_STEP_UNDERFLOW, RK_ERROR_BAD_CHECKPOINT
+from RK import RkCheckpoint, RK_CHECKPOINT_MAX_DIMENSION, RkStream, RkStats
+
+# Вычислительное ядро на NumPy с тем же интерфейсом, что у классов RK.py (l1_test, l1_1, l1_2).
+# Повторяет логику rk_core.h: шаг Рунге-Кутты 4-го порядка, оценку погрешности удвоением шага,
+# деление и удвоение шага, пару Дормана-Принса 5(4). Используется, когда библиотеки C++ для платформы нет,
+# и для сверки результатов с ними (RK.createSolver(name, engine='numpy')).
+#
+# Состояние хранится массивом формы (m, n): m траекторий размерности n, поэтому ансамбли
+# (solve_many, solve_many_adaptive) считаются одним набором векторных операций на шаг.
+
+ERROR_DENOMINATOR = 15.     # 2^p - 1 - знаменатель в формуле вычисления О.Л.П
+ERROR_SCALE = 16.           # 2^p
+DOUBLING_DIVISOR = 32.      # 2^(p+1)
+
+
+# Правые части задач (как в rk_problems.h): x - число или массив (m,), y - массив (m, n)
+def testRhs(x, y, params):
+    return y
+
+def main1Rhs(x, y, params):
+    v = y[:, 0]
+    return (v * v * x / (1 + x * x) + v - v * v * v * np.sin(10 * x))[:, None]
+
+def main2Rhs(x, y, params):
+    a, b = params
+    return np.stack([y[:, 1], -a * y[:, 1] + b * np.sin(y[:, 0])], axis=1)
+
+
+def rk4Step(rhs, params, x, y, h):
+    """
+    Один шаг метода Рунге-Кутты 4-го порядка для всех траекторий; x и h - числа или массивы (m,).
+    """
+    hc = np.reshape(h, (-1, 1))
+    k1 = rhs(x, y, params)
+    k2 = rhs(x + h / 2, y + hc / 2 * k1, params)
+    k3 = rhs(x + h / 2, y + hc / 2 * k2, params)
+    k4 = rhs(x + h, y + hc * k3, params)
+    return y + hc * (k1 + 2 * k2 + 2 * k3 + k4) / 6
+
+def stepDoublingError(rhs, params, x, y, h):
+    """
+    Шаг h и два шага h/2. Возвращает (погрешность (m,), погрешности по компонентам (m, n), full, half).
+    """
+    full = rk4Step(rhs, params, x, y, h)
+    half = rk4Step(rhs, params, x, y, h / 2)
+    half = rk4Step(rhs, params, x + h / 2, half, h / 2)
+    s = np.abs(full - half) / ERROR_DENOMINATOR
+    return np.sqrt(np.sum(s * s, axis=1)), s, full, half
+
+def stateStatus(y):
+    """
+    RK_OK или код ошибки по первой неконечной компоненте, как stateStatus в rk_core.h.
+    """
+    bad = ~np.isfinite(y)
+    if not bad.any():
+        return RK_OK
+    return RK_ERROR_NOT_FINITE if np.isnan(y[bad][0]) else RK_ERROR_OVERFLOW
+
+def checkState(y):
+    status = stateStatus(y)
+    if status != RK_OK:
+        raise SolverError(status)
+
+def checkStep(x, h):
+    if x + h == x:
+        raise SolverError(RK_ERROR_STEP_UNDERFLOW)
+
+# Код завершения последнего расчёта в текущем потоке (как rkStatus в rk_core.h)
+_statusState = threading.local()
+
+@contextlib.contextmanager
+def solverGuard():
+    """
+    Как rkGuard в rk_core.h: SolverError останавливает цикл решателя, посчитанные точки остаются,
+    код ошибки сохраняется для lastStatus().
+    """
+    _statusState.status = RK_OK
+    try:
+        yield
+    except SolverError as e:
+        _statusState.status = e.code
+
+def lastStatus():
+    return getattr(_statusState, 'status', RK_OK)
+
+
+# Ход расчёта, отслеживаемый в текущем потоке (как rkProgress в rk_core.h)
+_progressState = threading.local()
+
+@contextlib.contextmanager
+def trackProgress(progress):
+    previous = getattr(_progressState, 'progress', None)
+    _progressState.progress = progress
+    try:
+        yield
+    finally:
+        _progressState.progress = previous
+
+def progressContinue(x, step, rejected):
+    """
+    Раз в RK_PROGRESS_INTERVAL шагов обновляет ход расчёта; False - расчёт отменён.
+    """
+    progress = getattr(_progressState, 'progress', None)
+    if progress is None or step % RK_PROGRESS_INTERVAL != 0:
+        return True
+    progress.x = x
+    progress.steps = step
+    progress.rejected = rejected
+    return progress.cancel == 0
+
+def progressFinish(x, step, rejected):
+    progress = getattr(_progressState, 'progress', None)
+    if progress is not None:
+        progress.x = x
+        progress.steps = step
+        progress.rejected = rejected
+
+def progressCancelled():
+    progress = getattr(_progressState, 'progress', None)
+    return progress is not None and progress.cancel != 0
+
+
+# Состояние для продолжения расчёта в текущем потоке (как rkCheckpoint в rk_core.h)
+_checkpointState = threading.local()
+
+@contextlib.contextmanager
+def trackCheckpoint(checkpoint):
+    previous = getattr(_checkpointState, 'checkpoint', None)
+    _checkpointState.checkpoint = checkpoint
+    try:
+        yield
+    finally:
+        _checkpointState.checkpoint = previous
+
+def checkpointStart(x, y):
+    """
+    Начальная точка расчёта: (True, x, y) сохранённого состояния при продолжении, иначе (False, x, y) как есть.
+    """
+    checkpoint = getattr(_checkpointState, 'checkpoint', None)
+    if checkpoint is None or not checkpoint.resume:
+        return False, x, y
+    if not checkpoint.saved or checkpoint.dimension != y.shape[1]:
+        raise SolverError(RK_ERROR_BAD_CHECKPOINT)
+    return True, checkpoint.x, np.array(checkpoint.y[:checkpoint.dimension]).reshape(1, -1)
+
+def checkpointResume(x, y, h, c1, c2):
+    """
+    Начальное состояние решателя (x, y, h, c1, c2): сохранённое при продолжении, иначе переданное.
+    """
+    resumed, x, y = checkpointStart(x, y)
+    checkpoint = getattr(_checkpointState, 'checkpoint', None)
+    if resumed:
+        h, c1, c2 = checkpoint.h, checkpoint.c1, checkpoint.c2
+    if checkpoint is not None:
+        checkpoint.saved = 0
+    return x, y, h, c1, c2
+
+def checkpointSave(x, y, h, c1, c2):
+    checkpoint = getattr(_checkpointState, 'checkpoint', None)
+    n = y.shape[1]
+    if checkpoint is None or n > RK_CHECKPOINT_MAX_DIMENSION:
+        return
+    checkpoint.dimension = n
+    checkpoint.x = x
+    checkpoint.h = h
+    checkpoint.c1 = c1
+    checkpoint.c2 = c2
+    checkpoint.y[:n] = [float(v) for v in y[0]]
+    checkpoint.saved = 1
+
+
+
+# Поток точек для графика в текущем потоке (как rkStream в rk_core.h)
+_streamState = threading.local()
+
+@contextlib.contextmanager
+def trackStream(stream):
+    previous = getattr(_streamState, 'stream', None)
+    _streamState.stream = stream
+    try:
+        yield
+    finally:
+        _streamState.stream = previous
+
+def streamPoint(x, y):
+    """
+    Дописывает точку (x, y[0]) в поток, как streamPoint в rk_core.h.
+    """
+    stream = getattr(_streamState, 'stream', None)
+    if stream is None:
+        return
+    stream.skipped += 1
+    if stream.skipped < stream.stride:
+        return
+    stream.skipped = 0
+    written = stream.written
+    if written - stream.read >= stream.capacity:
+        if stream.read != stream.strideRead:
+            stream.stride *= 2
+            stream.strideRead = stream.read
+        return
+    count = min(y.shape[1], stream.width - 1)
+    row = stream.buffer[written % stream.capacity]
+    row[0] = x
+    row[1:1 + count] = y[0, :count]
+    stream.written = written + 1
+
+
+# Статистика расчёта в текущем потоке (как rkStats в rk_core.h)
+_statsState = threading.local()
+
+@contextlib.contextmanager
+def trackStats(stats):
+    previous = getattr(_statsState, 'stats', None)
+    _statsState.stats = stats
+    try:
+        yield
+    finally:
+        _statsState.stats = previous
+
+def statsStart(x):
+    stats = getattr(_statsState, 'stats', None)
+    if stats is not None:
+        stats.setValues(RkStats.empty(x).values())
+
+def statsStep(x, h, error=np.nan):
+    """
+    Принятый шаг h, закончившийся в точке x, как statsStep в rk_core.h.
+    """
+    stats = getattr(_statsState, 'stats', None)
+    if stats is None:
+        return
+    stats.accepted += 1
+    if not np.isnan(error) and not error <= stats.maxError:
+        stats.maxError, stats.maxErrorX = error, x
+    if not h >= stats.minH:
+        stats.minH, stats.minHX = h, x
+    if not h <= stats.maxH:
+        stats.maxH, stats.maxHX = h, x
+
+def statsReference(x, error):
+    """
+    Отклонения error (массив) от точного решения в точках x, как statsReference в rk_core.h.
+    """
+    stats = getattr(_statsState, 'stats', None)
+    if stats is None or len(x) == 0:
+        return
+    index = int(np.argmax(error))
+    if not error[index] <= stats.maxReferenceError:
+        stats.maxReferenceError, stats.maxReferenceErrorX = error[index], x[index]
+
+def statsFinish(x, xmax, rejected, doublings, rhsEvaluations):
+    stats = getattr(_statsState, 'stats', None)
+    if stats is None:
+        return
+    stats.x = x
+    stats.boundaryDistance = abs(xmax - x)
+    stats.rejected = rejected
+    stats.doublings = doublings
+    stats.rhsEvaluations = rhsEvaluations
+
+def statsAddEvaluations(rhsEvaluations):
+    """
+    Вычисления правой части вне цикла решателя (плотный вывод), как DenseOutput::finish в rk_core.h.
+    """
+    stats = getattr(_statsState, 'stats', None)
+    if stats is not None:
+        stats.rhsEvaluations += rhsEvaluations
+
+class CountingRhs:
+    """
+    Правая часть со счётчиком вычислений, как CountingRhs в rk_core.h.
+    """
+    def __init__(self, rhs):
+        self.rhs = rhs
+        self.count = 0
+    def __call__(self, x, y, params):
+        self.count += 1
+        return self.rhs(x, y, params)
+
+def fixedRun(rhs, params, x0, y0, h, xmax, maxSteps):
+    """
+    Постоянный шаг для одной траектории. Возвращает (x (k,), y (k, n)).
+    """
+    rhs = CountingRhs(rhs)
+    y = np.array(y0, dtype=np.float64).reshape(1, -1)
+    capacity = fixedStepCapacity(x0, h, xmax, maxSteps)
+    xs = np.empty(capacity)
+    ys = np.empty((capacity, y.shape[1]))
+    x = x0
+    step = 0
+    with solverGuard(), np.errstate(all='ignore'):
+        # Шаг сохранённого состояния не используется: шаг всегда берётся из вызова
+        x, y, _, _, _ = checkpointResume(x, y, h, 0, 0)
+        streamPoint(x, y)
+        statsStart(x)
+        while x + h <= xmax and step < maxSteps and progressContinue(x, step, 0):
+            y = rk4Step(rhs, params, x, y, h)
+            checkState(y)
+            x = x + h
+            streamPoint(x, y)
+            statsStep(x, h)
+            if step < capacity:
+                xs[step] = x
+                ys[step] = y[0]
+            step += 1
+        checkpointSave(x, y, h, 0, 0)
+        statsFinish(x, xmax, 0, 0, rhs.count)
+    progressFinish(x, step, 0)
+    rows = min(step, capacity)
+    return xs[:rows], ys[:rows]
+
+def adaptiveRun(rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace):
+    """
+    Контроль локальной погрешности для одной траектории, как rk4AdaptiveRun в rk_core.h.
+    Возвращает список принятых точек (x, y, y_half, e, E, h, c1, c2), где e и E - оценки
+    погрешности по компонентам и общая (уже умноженные на 2^p).
+    """
+    rhs = CountingRhs(rhs)
+    y = np.array(y0, dtype=np.float64).reshape(1, -1)
+    x = x0
+    h = h0
+    c1 = 0
+    c2 = 0
+    step = 0
+    points = []
+    with solverGuard(), np.errstate(all='ignore'):
+        x, y, h, c1, c2 = checkpointResume(x, y, h, c1, c2)
+        streamPoint(x, y)
+        statsStart(x)
+        c1_start, c2_start = c1, c2
+        while x + h <= xmax and abs(x + h - xmax) > edge and step < maxSteps and progressContinue(x, step, c1):
+            error, s, full, half = _checkedStepDoubling(rhs, params, x, y, h)
+
+            halved = False
+            while error > tolerance:
+                c1 += 1
+                h /= 2
+                halved = True
+                checkStep(x, h)
+                if not retryInPlace:
+                    break
+                error, s, full, half = _checkedStepDoubling(rhs, params, x, y, h)
+            if error > tolerance:
+                step += 1
+                continue
+
+            x += h
+            y = full
+            doubling = not halved and error < tolerance / DOUBLING_DIVISOR
+            if doubling:
+                c2 += 1
+            points.append((x, full[0], half[0], s[0] * ERROR_SCALE, error * ERROR_SCALE, h, c1, c2))
+            streamPoint(x, y)
+            statsStep(x, h, error * ERROR_SCALE)
+            if doubling:
+                h *= 2
+            step += 1
+
+        h_next = h
+        if x + h > xmax and not progressCancelled():
+            h = xmax - x
+            error, s, full, half = _checkedStepDoubling(rhs, params, x, y, h)
+            x += h
+            y = full
+            points.append((x, full[0], half[0], s[0] * ERROR_SCALE, error * ERROR_SCALE, h, c1, c2))
+            streamPoint(x, y)
+            statsStep(x, h, error * ERROR_SCALE)
+        checkpointSave(x, y, h_next, c1, c2)
+        statsFinish(x, xmax, c1 - c1_start, c2 - c2_start, rhs.count)
+    progressFinish(x, step, c1)
+    return points
+
+def _checkedStepDoubling(rhs, params, x, y, h):
+    error, s, full, half = stepDoublingError(rhs, params, x, y, h)
+    checkState(full)
+    checkState(half)
+    return error[0], s, full, half
+
+# Вложенная пара Дормана-Принса 5(4): строки таблицы Бутчера, веса 5-го порядка и разность весов 5-го и 4-го
+DP_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+DP_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+DP_E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+DP_SAFETY = 0.9
+DP_MIN_FACTOR = 0.2
+DP_MAX_FACTOR = 5.
+
+def dormandPrinceStep(rhs, params, x, y, h, k1):
+    """
+    Шаг пары Дормана-Принса 5(4) для одной траектории; k1 = f(x, y).
+    Возвращает (погрешность, погрешности по компонентам, y5, y4, k7), k7 = f(x + h, y5).
+    """
+    k = [k1]
+    for stage in range(1, 7):
+        increment = sum(a * k[j] for j, a in enumerate(DP_A[stage]) if a != 0)
+        k.append(rhs(x + DP_C[stage] * h, y + h * increment, params))
+    y5 = y + h * sum(a * k[j] for j, a in enumerate(DP_A[6]) if a != 0)
+    difference = h * sum(DP_E[j] * k[j] for j in range(7) if DP_E[j] != 0)
+    e = np.abs(difference[0])
+    return np.sqrt(np.sum(e * e)), e, y5, y5 - difference, k[6]
+
+def dormandPrinceFactor(error, tolerance):
+    if error == 0:
+        return DP_MAX_FACTOR
+    return min(DP_MAX_FACTOR, max(DP_MIN_FACTOR, DP_SAFETY * (tolerance / error) ** (1 / 5)))
+
+def dormandPrinceRun(rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge):
+    """
+    Метод Дормана-Принса 5(4) для одной траектории, как dormandPrinceAdaptiveRun в rk_core.h.
+    Возвращает список принятых точек в том же виде, что adaptiveRun (y_half - решение 4-го порядка).
+    """
+    rhs = CountingRhs(rhs)
+    y = np.array(y0, dtype=np.float64).reshape(1, -1)
+    x = x0
+    h = h0
+    c1 = 0
+    c2 = 0
+    step = 0
+    points = []
+    with solverGuard(), np.errstate(all='ignore'):
+        x, y, h, c1, c2 = checkpointResume(x, y, h, c1, c2)
+        streamPoint(x, y)
+        statsStart(x)
+        c1_start, c2_start = c1, c2
+        k1 = rhs(x, y, params)
+        while x + h <= xmax and abs(x + h - xmax) > edge and step < maxSteps and progressContinue(x, step, c1):
+            error, e, y5, y4, k7 = dormandPrinceStep(rhs, params, x, y, h, k1)
+            checkState(y5)
+
+            rejected = False
+            while error > tolerance:
+                c1 += 1
+                h *= dormandPrinceFactor(error, tolerance)
+                rejected = True
+                checkStep(x, h)
+                error, e, y5, y4, k7 = dormandPrinceStep(rhs, params, x, y, h, k1)
+                checkState(y5)
+
+            x += h
+            y = y5
+            k1 = k7
+            factor = dormandPrinceFactor(error, tolerance)
+            if rejected and factor > 1:
+                factor = 1.
+            if factor > 1:
+                c2 += 1
+            points.append((x, y5[0], y4[0], e, error, h, c1, c2))
+            streamPoint(x, y)
+            statsStep(x, h, error)
+            h *= factor
+            step += 1
+
+        h_next = h
+        if x + h > xmax and not progressCancelled():
+            h = xmax - x
+            error, e, y5, y4, k7 = dormandPrinceStep(rhs, params, x, y, h, k1)
+            checkState(y5)
+            x += h
+            y = y5
+            points.append((x, y5[0], y4[0], e, error, h, c1, c2))
+            streamPoint(x, y)
+            statsStep(x, h, error)
+        checkpointSave(x, y, h_next, c1, c2)
+        statsFinish(x, xmax, c1 - c1_start, c2 - c2_start, rhs.count)
+    progressFinish(x, step, c1)
+    return points
+
+def runAdaptive(method, rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace):
+    if method == ADAPTIVE_DORMAND_PRINCE:
+        return dormandPrinceRun(rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge)
+    return adaptiveRun(rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace)
+
+def hermiteInterpolate(x0, y0, f0, x1, y1, f1, x):
+    """
+    Кубический эрмитов интерполянт на шагах [x0, x1], как hermiteInterpolate в rk_core.h.
+    x0, x1, x - массивы (k,), y0, f0, y1, f1 - (k, n).
+    """
+    h = (x1 - x0)[:, None]
+    t = ((x - x0) / (x1 - x0))[:, None]
+    h00 = (1 + 2 * t) * (1 - t) ** 2
+    h10 = t * (1 - t) ** 2
+    h01 = t * t * (3 - 2 * t)
+    h11 = t * t * (t - 1)
+    return h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
+
+def adaptiveDenseRun(method, rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, x_eval):
+    """
+    Адаптивный метод вместе с плотным выводом за один расчёт, как adaptiveDenseRun в rk_core.h.
+    Возвращает (points из runAdaptive, x (k,), y (k, n)).
+    """
+    resumed, x_start, y_start = checkpointStart(x0, np.array(y0, dtype=np.float64).reshape(1, -1))
+    points = runAdaptive(method, rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace)
+    x, y = densePoints(points, rhs, params, x0, resumed, x_start, y_start, x_eval, method == ADAPTIVE_DORMAND_PRINCE)
+    return points, x, y
+
+def denseRun(method, rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, x_eval):
+    """
+    Плотный вывод адаптивного метода, как denseAdaptiveRun в rk_core.h: решение в точках x_eval
+    (по возрастанию; точки вне пройденного отрезка пропускаются, при продолжении расчёта - и сама
+    сохранённая точка). Возвращает (x (k,), y (k, n)).
+    """
+    _, x, y = adaptiveDenseRun(method, rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, x_eval)
+    return x, y
+
+def densePoints(points, rhs, params, x0, resumed, x_start, y_start, x_eval, fsal=False):
+    """
+    Значения в точках x_eval по принятым точкам адаптивного метода (points из runAdaptive), начиная
+    с состояния (x_start, y_start), прочитанного checkpointStart до расчёта. fsal - производные в точках
+    уже вычислены методом (k7 Дормана-Принса) и в статистику не входят. Возвращает (x (k,), y (k, n)).
+    """
+    xs = np.array([x_start] + [point[0] for point in points], dtype=np.float64)
+    ys = np.vstack([y_start] + [point[1] for point in points])
+    x_eval = np.asarray(x_eval, dtype=np.float64)
+    # Вычисления правой части - как у DenseOutput: в начальной точке и (без fsal) на каждом шаге, пока
+    # не выведены все точки. Производные здесь всё равно считаются заново одним векторным вызовом:
+    # для Дормана-Принса это те же f(x, y), что k7
+    pending = x_eval[x_eval > x_start]
+    if len(pending) > 0:
+        statsAddEvaluations(1 if fsal else 1 + min(int(np.searchsorted(xs[1:], pending[-1], side='left')) + 1, len(points)))
+    x_eval = x_eval[((x_eval > x_start) if resumed else (x_eval >= x0)) & (x_eval <= xs[-1])]
+    if len(xs) < 2:
+        return x_eval, np.repeat(ys, len(x_eval), axis=0)
+    with np.errstate(all='ignore'):
+        fs = rhs(xs, ys, params)
+    right = np.clip(np.searchsorted(xs, x_eval, side='left'), 1, len(xs) - 1)
+    left = right - 1
+    return x_eval, hermiteInterpolate(xs[left], ys[left], fs[left], xs[right], ys[right], fs[right], x_eval)
+
+def fixedBatch(rhs, params, x0, y0, h, xmax, maxSteps):
+    """
+    Постоянный шаг для m траекторий сразу. Возвращает (x (k,), y (k, m, n)).
+    """
+    y = np.array(y0, dtype=np.float64)
+    capacity = fixedStepCapacity(x0, h, xmax, maxSteps)
+    xs = np.empty(capacity)
+    ys = np.empty((capacity,) + y.shape)
+    x = x0
+    step = 0
+    with np.errstate(all='ignore'):
+        while x + h <= xmax and step < maxSteps:
+            y = rk4Step(rhs, params, x, y, h)
+            x = x + h
+            if step < capacity:
+                xs[step] = x
+                ys[step] = y
+            step += 1
+    rows = min(step, capacity)
+    return xs[:rows], ys[:rows]
+
+def adaptiveBatch(rhs, params, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace):
+    """
+    Контроль локальной погрешности для m траекторий: у каждой свои x, h и счётчики,
+    на каждой итерации все активные траектории делают один шаг. При retryInPlace отвергнутые
+    траектории сразу пересчитываются с h/2 в той же итерации, как в rk4AdaptiveRun.
+    Траектория с ошибкой останавливается в последней принятой точке, остальные продолжают расчёт.
+    Возвращает (x, y, h, c1, c2, steps, status) конечных состояний и количество итераций общего цикла,
+    как rk4AdaptiveBatchRun в rk_core.h.
+    """
+    y = np.array(y0, dtype=np.float64)
+    m = len(y)
+    x = np.full(m, float(x0))
+    h = np.full(m, float(h0))
+    c1 = np.zeros(m, dtype=np.int64)
+    c2 = np.zeros(m, dtype=np.int64)
+    step = np.zeros(m, dtype=np.int64)
+    status = np.full(m, RK_OK, dtype=np.int64)
+    active = np.ones(m, dtype=bool)
+    iterations = 0
+
+    with np.errstate(all='ignore'):
+        while active.any():
+            iterations += 1
+            go = active & (x + h <= xmax) & (np.abs(x + h - xmax) > edge) & (step < maxSteps)
+            last = np.nonzero(active & ~go & (x + h > xmax))[0]
+            if last.size:
+                h[last] = xmax - x[last]
+                full = rk4Step(rhs, params, x[last], y[last], h[last])
+                status[last] = laneStatus(full)
+                ok = status[last] == RK_OK
+                y[last[ok]] = full[ok]
+                x[last[ok]] = xmax
+            active = go
+
+            index = np.nonzero(go)[0]
+            halved = np.zeros(m, dtype=bool)
+            while index.size:
+                error, s, full, half = stepDoublingError(rhs, params, x[index], y[index], h[index])
+                status[index] = laneStatus(np.concatenate([full, half], axis=1))
+                ok = status[index] == RK_OK
+                active[index[~ok]] = False
+                index, error, full = index[ok], error[ok], full[ok]
+
+                reject = error > tolerance
+                accepted = index[~reject]
+                x[accepted] += h[accepted]
+                y[accepted] = full[~reject]
+                doubling = accepted[~halved[accepted] & (error[~reject] < tolerance / DOUBLING_DIVISOR)]
+                c2[doubling] += 1
+                h[doubling] *= 2
+                step[accepted] += 1
+
+                index = index[reject]
+                c1[index] += 1
+                h[index] /= 2
+                status[index] = np.where(x[index] + h[index] == x[index], RK_ERROR_STEP_UNDERFLOW, RK_OK)
+                active[index[status[index] != RK_OK]] = False
+                index = index[status[index] == RK_OK]
+                halved[index] = True
+                if not retryInPlace:
+                    step[index] += 1
+                    break
+    return (x, y, h, c1, c2, step, status), iterations
+
+def laneStatus(values):
+    """
+    Коды завершения траекторий (строк values) по первой неконечной компоненте, как stateStatus в rk_core.h.
+    """
+    bad = ~np.isfinite(values)
+    first = values[np.arange(len(values)), np.argmax(bad, axis=1)]
+    return np.where(bad.any(axis=1), np.where(np.isnan(first), RK_ERROR_NOT_FINITE, RK_ERROR_OVERFLOW), RK_OK)
+
+
+def sampleRows(values, every=1, max_rows=0, x_out=None):
+    """
+    Прореживание строк результата (первый столбец - x), как SampledRowWriter в rk_output.h:
+    каждая every-я строка или первые строки с x >= x_out[i], затем не больше max_rows строк
+    с шагом 2^k по отобранным. Последняя строка выводится всегда.
+    """
+    count = len(values)
+    if count == 0:
+        return values
+    if x_out is not None and len(x_out) > 0:
+        # Количество пройденных точек x_out после каждой строки и перед ней
+        passed = np.searchsorted(x_out, values[:, 0], side='right')
+        selected = passed > np.concatenate([[0], passed[:-1]])
+    else:
+        selected = (np.arange(count) + 1) % every == 0
+    index = np.flatnonzero(selected)
+    if max_rows > 0:
+        capacity = max_rows - 1
+        stride = 1
+        while capacity > 0 and (len(index) + stride - 1) // stride > capacity:
+            stride *= 2
+        index = index[::stride] if capacity > 0 else index[:0]
+    if len(index) == 0 or index[-1] != count - 1:
+        index = np.append(index, count - 1)
+    return values[index]
+
+
+class NumpySolver:
+    """
+    Общая часть классов ядра NumPy: запись результата в файл в выбранном формате.
+    """
+    OUTPUT_NAME = ''
+
+    def __init__(self):
+        self.output_format = OUTPUT_FORMAT_CSV
+        self.sampling = (1, 0, None)
+    def setOutputFormat(self, output_format: int):
+        self.output_format = output_format
+    def setOutputSampling(self, every: int = 1, max_rows: int = 0, x_out=None):
+        self.sampling = (max(every, 1), max(max_rows, 0), None if x_out is None else prepareEvalPoints(x_out))
+    def _sample(self, headers, values):
+        every, max_rows, x_out = self.sampling
+        if every == 1 and max_rows == 0 and x_out is None:
+            return headers, values
+        return headers, sampleRows(values, every, max_rows, x_out)
+    def _writeSolved(self, solve):
+        """
+        Записывает результат solve() в файл. При SolverError записываются строки до ошибки,
+        и ошибка бросается дальше с прочитанным из файла результатом, как у библиотек C++.
+        """
+        try:
+            headers, values = solve()
+        except SolverError as e:
+            self._writeResult(e.headers, e.values)
+            raise SolverError(e.code, *self.getResult())
+        return self._writeResult(headers, values)
+    def _writeResult(self, headers, values):
+        filename = self.OUTPUT_NAME + OUTPUT_EXTENSIONS[self.output_format]
+        path = os.path.join(NpyReaderMemmap(filename).getOutputDirectory(), filename)
+        if self.output_format == OUTPUT_FORMAT_NPY:
+            saveResultNpy(path, headers, values)
+        else:
+            np.savetxt(path, values, delimiter=';', header=';'.join(headers), comments='', fmt='%.17g')
+        return self.getResult()
+    def getResult(self):
+        filename = self.OUTPUT_NAME + OUTPUT_EXTENSIONS[self.output_format]
+        if self.output_format == OUTPUT_FORMAT_NPY:
+            return NpyReaderMemmap(filename).readAsNumpy()
+        CSVReader = CSVReaderPandas(filename, delimiter=";")
+        headers, values = CSVReader.readAsNumpy()
+        return headers, values
+
+
+class l1_test(NumpySolver):
+    HEADERS_RK4 = RK.l1_test.HEADERS_RK4
+    HEADERS_RK4_ADAPTIVE = RK.l1_test.HEADERS_RK4_ADAPTIVE
+    OUTPUT_NAME = 'output_test'
+
+    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = fixedRun(testRhs, None, x0, [y0], h, xmax, maxSteps)
+            u = y0 * np.exp(x)
+            statsReference(x, np.abs(u - y[:, 0]))
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4, np.column_stack([x, y[:, 0], u])))
+    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points = runAdaptive(method, testRhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False)
+            values = self._adaptiveValues(points, y0)
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, values))
+    def rk4_adaptive_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = denseRun(method, testRhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False, prepareEvalPoints(x_eval))
+        return checkSolverStatus(lastStatus(), self.HEADERS_RK4, np.column_stack([x, y[:, 0], y0 * np.exp(x)]))
+    def rk4_adaptive_with_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points, x, y = adaptiveDenseRun(method, testRhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False, prepareEvalPoints(x_eval))
+            values = self._adaptiveValues(points, y0)
+        return (checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, values)),
+                (self.HEADERS_RK4, np.column_stack([x, y[:, 0], y0 * np.exp(x)])))
+    def _adaptiveValues(self, points, y0):
+        values = np.empty((len(points), len(self.HEADERS_RK4_ADAPTIVE)))
+        for k, (x, v, v2, e, E, h, c1, c2) in enumerate(points):
+            u = y0 * np.exp(x)
+            values[k] = (x, v[0], v2[0], v[0] - v2[0], E, h, c1, c2, u, abs(u - v[0]))
+        statsReference(values[:, 0], values[:, 9])
+        return values
+    def rk_4_to_file(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk_4(x0, y0, h, xmax, maxSteps, progress=progress))
+    def rk4_adaptive_to_file(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk4_adaptive(x0, y0, h0, xmax, eps, eps_out, n_max, method, progress=progress))
+
+
+class l1_1(NumpySolver):
+    HEADERS_RK4 = RK.l1_1.HEADERS_RK4
+    HEADERS_RK4_ADAPTIVE = RK.l1_1.HEADERS_RK4_ADAPTIVE
+    HEADERS_BATCH_ADAPTIVE = RK.l1_1.HEADERS_BATCH_ADAPTIVE
+    OUTPUT_NAME = 'output_1'
+
+    def rk_4(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = fixedRun(main1Rhs, None, x0, [y0], h, xmax, maxSteps)
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4, np.column_stack([x, y[:, 0]])))
+    def rk4_adaptive(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points = runAdaptive(method, main1Rhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False)
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, self._adaptiveValues(points)))
+    def rk4_adaptive_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = denseRun(method, main1Rhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False, prepareEvalPoints(x_eval))
+        return checkSolverStatus(lastStatus(), self.HEADERS_RK4, np.column_stack([x, y[:, 0]]))
+    def rk4_adaptive_with_dense(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points, x, y = adaptiveDenseRun(method, main1Rhs, None, x0, [y0], h0, xmax, n_max, eps, eps_out, False, prepareEvalPoints(x_eval))
+        return (checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, self._adaptiveValues(points))),
+                (self.HEADERS_RK4, np.column_stack([x, y[:, 0]])))
+    def _adaptiveValues(self, points):
+        values = np.empty((len(points), len(self.HEADERS_RK4_ADAPTIVE)))
+        for k, (x, v, v2, e, E, h, c1, c2) in enumerate(points):
+            values[k] = (x, v[0], v2[0], v[0] - v2[0], E, h, c1, c2)
+        return values
+    def solve_many(self, y0_array, x0: float, h: float, xmax: float, maxSteps: int):
+        y0 = np.array(y0_array, dtype=np.float64).reshape(-1, 1)
+        x, y = fixedBatch(main1Rhs, None, x0, y0, h, xmax, maxSteps)
+        return np.column_stack([x, y[:, :, 0]])
+    def solve_many_adaptive(self, y0_array, x0: float, h0: float, xmax: float, eps: float, eps_out: float, n_max: int):
+        y0 = np.array(y0_array, dtype=np.float64).reshape(-1, 1)
+        (x, y, h, c1, c2, steps, status), iterations = adaptiveBatch(main1Rhs, None, x0, y0, h0, xmax, n_max, eps, eps_out, False)
+        values = np.column_stack([x, y[:, 0], h, c1, c2, steps, status]).astype(np.float64)
+        return values, iterations, batchErrorCount(values)
+    def rk_4_to_file(self, x0: float, y0: float, h:float, xmax:float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk_4(x0, y0, h, xmax, maxSteps, progress=progress))
+    def rk4_adaptive_to_file(self, x0: float, y0: float, h0: float, xmax: float, eps: float, eps_out:float, n_max:int, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk4_adaptive(x0, y0, h0, xmax, eps, eps_out, n_max, method, progress=progress))
+
+
+class l1_2(NumpySolver):
+    HEADERS_RK4 = RK.l1_2.HEADERS_RK4
+    HEADERS_RK4_ADAPTIVE = RK.l1_2.HEADERS_RK4_ADAPTIVE
+    HEADERS_BATCH_ADAPTIVE = RK.l1_2.HEADERS_BATCH_ADAPTIVE
+    OUTPUT_NAME = 'output_2'
+
+    def rk_4(self, x0: float, y10: float, y20: float, h:float, xmax:float, a: float, b: float, maxSteps: int, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = fixedRun(main2Rhs, (a, b), x0, [y10, y20], h, xmax, maxSteps)
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4, np.column_stack([x, y])))
+    def rk4_adaptive(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points = runAdaptive(method, main2Rhs, (a, b), x0, [y10, y20], h, xmax, maxSteps, tolerance, edge, True)
+        return checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, self._adaptiveValues(points)))
+    def rk4_adaptive_dense(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            x, y = denseRun(method, main2Rhs, (a, b), x0, [y10, y20], h, xmax, maxSteps, tolerance, edge, True, prepareEvalPoints(x_eval))
+        return checkSolverStatus(lastStatus(), self.HEADERS_RK4, np.column_stack([x, y]))
+    def rk4_adaptive_with_dense(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, x_eval, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None, checkpoint: typing.Optional[RkCheckpoint] = None, stream: typing.Optional[RkStream] = None, stats: typing.Optional[RkStats] = None):
+        with trackProgress(progress), trackCheckpoint(checkpoint), trackStream(stream), trackStats(stats):
+            points, x, y = adaptiveDenseRun(method, main2Rhs, (a, b), x0, [y10, y20], h, xmax, maxSteps, tolerance, edge, True, prepareEvalPoints(x_eval))
+        return (checkSolverStatus(lastStatus(), *self._sample(self.HEADERS_RK4_ADAPTIVE, self._adaptiveValues(points))),
+                (self.HEADERS_RK4, np.column_stack([x, y])))
+    def _adaptiveValues(self, points):
+        values = np.empty((len(points), len(self.HEADERS_RK4_ADAPTIVE)))
+        for k, (x, y, y_half, e, E, h, c1, c2) in enumerate(points):
+            values[k] = (x, y[0], y_half[0], y[1], y_half[1], y[0] - y_half[0], y[1] - y_half[1], h, E, e[0], e[1], c1, c2)
+        return values
+    def solve_many(self, y0_array, x0: float, h: float, xmax: float, a: float, b: float, maxSteps: int):
+        y0 = np.asarray(y0_array, dtype=np.float64).reshape(-1, 2)
+        x, y = fixedBatch(main2Rhs, (a, b), x0, y0, h, xmax, maxSteps)
+        return np.column_stack([x, y[:, :, 0], y[:, :, 1]])
+    def solve_many_adaptive(self, y0_array, x0: float, h0: float, xmax: float, a: float, b: float, maxSteps: int, tolerance: float, edge: float):
+        y0 = np.asarray(y0_array, dtype=np.float64).reshape(-1, 2)
+        (x, y, h, c1, c2, steps, status), iterations = adaptiveBatch(main2Rhs, (a, b), x0, y0, h0, xmax, maxSteps, tolerance, edge, True)
+        values = np.column_stack([x, y, h, c1, c2, steps, status]).astype(np.float64)
+        return values, iterations, batchErrorCount(values)
+    def rk_4_to_file(self, x0: float, y10: float, y20: float, h:float, xmax:float, a: float, b: float, maxSteps: int, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk_4(x0, y10, y20, h, xmax, a, b, maxSteps, progress=progress))
+    def rk4_adaptive_to_file(self, x0: float, y10: float, y20: float, xmax:float, h:float, a: float, b: float, maxSteps: int, tolerance:float, edge:float, method: int = ADAPTIVE_STEP_DOUBLING, progress: typing.Optional[RkProgress] = None):
+        return self._writeSolved(lambda: self.rk4_adaptive(x0, y10, y20, xmax, h, a, b, maxSteps, tolerance, edge, method, progress=progress))
@@ -0,0 +1,371 @@
+import argparse
+import csv
+import ctypes
+import datetime
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from RK import createSolver, CPPDynamicLibrary, RkProgress, RkStats, trackProgress, SolverError, \
+    ADAPTIVE_STEP_DOUBLING, ADAPTIVE_DORMAND_PRINCE
+
+# Замеры производительности решателей и пути "файл CSV -> pandas -> график".
+# Каждый замер повторяется --repeat раз, в результат идёт наименьшее время (меньше всего шума).
+# Результаты пишутся в JSON; --compare сравнивает два таких файла (например, две сборки библиотек
+# или ядра native и numpy).
+#
+# Решатели: RK_4 / RK_4_adaptive (l1_test, l1_1), rungeKutta / rungeKuttaAdaptive (l1_2) - через
+# буферный вызов (без записи файла), и решатель по длине дуги ksr11 (пишет CSV на каждом шаге,
+# поэтому его время включает запись). Для каждого - шагов в секунду и вычислений правой части
+# на принятый шаг (RkStats; у ksr11 статистики нет).
+# Ввод-вывод (только ядро native): запись CSV (решатель с записью в файл минус тот же расчёт
+# в буфер), загрузка pd.read_csv и перерисовка графика (GraphLayout, как во вкладках).
+#
+# --work-precision: работа-точность на тестовой задаче с точным решением u(x) = C·e^x (l1_test).
+# Каждый метод проходит по сетке h или eps; для каждого запуска записываются истинная глобальная
+# погрешность max|u-v| по всем точкам, время и число вычислений правой части. Результат - таблица
+# CSV, JSON и графики погрешности от времени и от вычислений правой части; --target выбирает самый
+# дешёвый запуск с погрешностью не больше заданной.
+
+BENCHMARK_REPEAT = 3
+BENCHMARK_OUTPUT = os.path.join('..', 'output', 'benchmark.json')
+BENCHMARK_MAX_ADAPTIVE_STEPS = 10_000_000
+
+
+def fixedSteps(x0, xmax, h):
+    return int(np.ceil((xmax - x0) / h)) + 1
+
+
+# (библиотека, метод, параметр сетки, значения; run(решатель, значение, stats))
+SOLVER_CASES = [
+    ('l1_test', 'RK_4', 'h', [1e-3, 1e-4, 1e-5],
+     lambda s, h, stats: s.rk_4(0, 1, h, 10, fixedSteps(0, 10, h), stats=stats)),
+    ('l1_test', 'RK_4_adaptive', 'eps', [1e-6, 1e-9, 1e-12],
+     lambda s, eps, stats: s.rk4_adaptive(0, 1, 1e-3, 10, eps, 1e-12, BENCHMARK_MAX_ADAPTIVE_STEPS, stats=stats)),
+    ('l1_1', 'RK_4', 'h', [1e-4, 1e-5, 1e-6],
+     lambda s, h, stats: s.rk_4(0, 1, h, 1, fixedSteps(0, 1, h), stats=stats)),
+    ('l1_1', 'RK_4_adaptive', 'eps', [1e-6, 1e-9, 1e-12],
+     lambda s, eps, stats: s.rk4_adaptive(0, 1, 1e-3, 1, eps, 1e-12, BENCHMARK_MAX_ADAPTIVE_STEPS, stats=stats)),
+    ('l1_2', 'rungeKutta', 'h', [1e-3, 1e-4, 1e-5],
+     lambda s, h, stats: s.rk_4(0, 0, 1, h, 10, 1, 1, fixedSteps(0, 10, h), stats=stats)),
+    ('l1_2', 'rungeKuttaAdaptive', 'eps', [1e-6, 1e-9, 1e-12],
+     lambda s, eps, stats: s.rk4_adaptive(0, 0, 1, 10, 1e-3, 1, 1, BENCHMARK_MAX_ADAPTIVE_STEPS, eps, 1e-12, stats=stats)),
+]
+
+# ksr11: rungeKuttaAdaptive(x0, y10, y20, h0, maxLength, K, L, maxSteps, tolerance, edge)
+KSR11_TOLERANCES = [1e-6, 1e-8, 1e-10]
+
+# (библиотека, буферный расчёт, тот же расчёт с записью CSV через экспорт библиотеки); около 10^5 строк
+IO_CASES = [
+    ('l1_test', lambda s: s.rk_4(0, 1, 1e-4, 10, 100_000),
+     lambda s: s.lib.RK_4(0, 1, 1e-4, 10, 100_000)),
+    ('l1_1', lambda s: s.rk_4(0, 1, 1e-5, 1, 100_000),
+     lambda s: s.lib.RK_4(0, 1, 1e-5, 1, 100_000)),
+    ('l1_2', lambda s: s.rk_4(0, 0, 1, 1e-4, 10, 1, 1, 100_000),
+     lambda s: s.lib.rungeKutta(0, 0, 1, 1e-4, 10, 1, 1, 100_000)),
+]
+
+# Тестовая задача для --work-precision: u' = u, u(x0) = u0, точное решение u0·e^(x-x0)
+WORK_PRECISION_PROBLEM = {'x0': 0.0, 'u0': 1.0, 'xmax': 5.0}
+WORK_PRECISION_OUTPUT = os.path.join('..', 'output', 'work_precision')
+
+# (метод, параметр сетки, значения; run(решатель, задача, значение, stats) -> (заголовки, значения)).
+# Новый метод решателя добавляется сюда строкой с его вызовом
+WORK_PRECISION_METHODS = [
+    ('РК4, постоянный шаг', 'h', np.logspace(-1, -4, 7),
+     lambda s, p, h, stats: s.rk_4(p['x0'], p['u0'], h, p['xmax'], fixedSteps(p['x0'], p['xmax'], h), stats=stats)),
+    ('РК4, удвоение шага', 'eps', np.logspace(-4, -13, 10),
+     lambda s, p, eps, stats: s.rk4_adaptive(p['x0'], p['u0'], 1e-3, p['xmax'], eps, 1e-12, BENCHMARK_MAX_ADAPTIVE_STEPS,
+                                             ADAPTIVE_STEP_DOUBLING, stats=stats)),
+    ('Дорман-Принс 5(4)', 'eps', np.logspace(-4, -13, 10),
+     lambda s, p, eps, stats: s.rk4_adaptive(p['x0'], p['u0'], 1e-3, p['xmax'], eps, 1e-12, BENCHMARK_MAX_ADAPTIVE_STEPS,
+                                             ADAPTIVE_DORMAND_PRINCE, stats=stats)),
+]
+WORK_PRECISION_COLUMNS = ['method', 'parameter', 'value', 'error', 'errorX', 'seconds', 'rhsEvaluations', 'steps', 'rejected']
+
+
+def bestTime(function, repeat):
+    """
+    Наименьшее время из repeat вызовов function() и результат последнего вызова.
+    """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def fileDigest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def libraryInfo(solver):
+    lib = getattr(solver, 'lib', None)
+    if lib is None:
+        return {'engine': 'numpy'}
+    return {'engine': 'native', 'path': lib._name, 'sha1': fileDigest(lib._name)}
+
+
+def solverRecord(library, method, parameter, value, seconds, stats):
+    steps = int(stats.accepted) if stats is not None else None
+    return {
+        'name': f"{library}.{method}[{parameter}={value:g}]",
+        'library': library, 'method': method, parameter: value,
+        'seconds': seconds,
+        'steps': steps,
+        'stepsPerSecond': steps / seconds if steps and seconds > 0 else None,
+        'rhsPerStep': stats.rhsEvaluations / steps if stats is not None and steps else None,
+    }
+
+
+def benchmarkSolvers(engine, repeat, quick, libraries):
+    records = []
+    for library, method, parameter, values, run in SOLVER_CASES:
+        if library not in libraries:
+            continue
+        solver = libraries[library]
+        for value in values[:1] if quick else values:
+            stats = RkStats()
+            try:
+                seconds, _ = bestTime(lambda: run(solver, value, stats), repeat)
+            except SolverError as e:
+                print(f"{library}.{method} {parameter}={value:g}: {e}", file=sys.stderr)
+                continue
+            record = solverRecord(library, method, parameter, value, seconds, stats)
+            records.append(record)
+            print(f"{record['name']:45} {seconds:9.4f} с {record['stepsPerSecond'] or 0:14,.0f} шаг/с "
+                  f"{record['rhsPerStep'] or 0:6.2f} f/шаг")
+    return records
+
+
+def benchmarkKsr11(repeat, quick):
+    """
+    Решатель по длине дуги ksr11 (библиотека без обёртки в RK.py): шаги считаются по RkProgress.
+    """
+    try:
+        lib = ctypes.CDLL(CPPDynamicLibrary().getPathTo('ksr11'))
+    except OSError as e:
+        print(f"ksr11 недоступна: {e}", file=sys.stderr)
+        return [], None
+    lib.rungeKuttaAdaptive.argtypes = [ctypes.c_double] * 7 + [ctypes.c_int, ctypes.c_double, ctypes.c_double]
+    lib.rungeKuttaAdaptive.restype = ctypes.c_int
+    lib.setProgress.argtypes = [ctypes.POINTER(RkProgress)]
+    records = []
+    for tolerance in KSR11_TOLERANCES[:1] if quick else KSR11_TOLERANCES:
+        progress = RkProgress()
+
+        def run():
+            with trackProgress(lib, progress):
+                return lib.rungeKuttaAdaptive(0, 0, 0, 1e-3, 10, 2, 1, BENCHMARK_MAX_ADAPTIVE_STEPS, tolerance, 1e-12)
+
+        seconds, _ = bestTime(run, repeat)
+        steps = int(progress.steps)
+        record = {'name': f"ksr11.rungeKuttaAdaptive[tolerance={tolerance:g}]", 'library': 'ksr11',
+                  'method': 'rungeKuttaAdaptive', 'tolerance': tolerance, 'seconds': seconds, 'steps': steps,
+                  'stepsPerSecond': steps / seconds if steps and seconds > 0 else None, 'rhsPerStep': None}
+        records.append(record)
+        print(f"{record['name']:45} {seconds:9.4f} с {record['stepsPerSecond'] or 0:14,.0f} шаг/с (с записью CSV)")
+    return records, {'engine': 'native', 'path': lib._name, 'sha1': fileDigest(lib._name)}
+
+
+def benchmarkIo(repeat, libraries):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    from custom_loyauts import GraphLayout
+    app = QApplication.instance() or QApplication([])
+    records = []
+    for library, solve, solveToFile in IO_CASES:
+        solver = libraries.get(library)
+        if solver is None or getattr(solver, 'lib', None) is None:
+            continue
+        solveSeconds, (headers, values) = bestTime(lambda: solve(solver), repeat)
+        fileSeconds, _ = bestTime(lambda: solveToFile(solver), repeat)
+        readSeconds, (headers, values) = bestTime(solver.getResult, repeat)
+        graph = GraphLayout()
+
+        def refresh():
+            # Новые массивы каждый раз, иначе линия не прореживается заново (DecimatedLine.setData)
+            x, y = np.array(values[:, 0]), np.array(values[:, 1])
+            graph.clear()
+            graph.plot(x, y, 'v')
+            graph.draw()
+            graph.canvas.draw()  # draw() только планирует отрисовку, здесь она выполняется сразу
+
+        plotSeconds, _ = bestTime(refresh, repeat)
+        rows = len(values)
+        phases = {'solve': solveSeconds, 'csvWrite': max(fileSeconds - solveSeconds, 0.0),
+                  'readCsv': readSeconds, 'plotRefresh': plotSeconds}
+        for phase, seconds in phases.items():
+            records.append({'name': f"{library}.io.{phase}", 'library': library, 'phase': phase,
+                            'rows': rows, 'seconds': seconds})
+        print(f"{library + '.io':45} строк {rows}: " + ", ".join(f"{phase} {seconds:.4f} с" for phase, seconds in phases.items()))
+    app.processEvents()
+    return records
+
+
+def runBenchmarks(engine, repeat, quick, only):
+    names = ['l1_test', 'l1_1', 'l1_2']
+    libraries = {name: createSolver(name, engine) for name in names if only is None or name in only}
+    results = benchmarkSolvers(engine, repeat, quick, libraries)
+    info = {name: libraryInfo(solver) for name, solver in libraries.items()}
+    if engine != 'numpy' and (only is None or 'ksr11' in only):
+        records, ksr11Info = benchmarkKsr11(repeat, quick)
+        results += records
+        if ksr11Info is not None:
+            info['ksr11'] = ksr11Info
+    if engine != 'numpy':
+        results += benchmarkIo(repeat, libraries)
+    return {'meta': benchmarkMeta(engine, repeat, quick, info), 'results': results}
+
+
+def benchmarkMeta(engine, repeat, quick, libraries):
+    return {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'engine': engine, 'repeat': repeat, 'quick': quick,
+        'python': platform.python_version(), 'numpy': np.__version__,
+        'platform': platform.platform(), 'machine': platform.machine(), 'processor': platform.processor(),
+        'libraries': libraries,
+    }
+
+
+def globalError(headers, values, problem):
+    """
+    Истинная глобальная погрешность max|u-v| по всем точкам решения и x, где она достигается.
+    Точное решение считается здесь, а не берётся из столбца u библиотеки.
+    """
+    headers = list(headers)
+    x, v = values[:, headers.index('x')], values[:, headers.index('v')]
+    error = np.abs(problem['u0'] * np.exp(x - problem['x0']) - v)
+    index = int(np.argmax(error))
+    return float(error[index]), float(x[index])
+
+
+def runWorkPrecision(engine, repeat, quick, problem=WORK_PRECISION_PROBLEM):
+    solver = createSolver('l1_test', engine)
+    rows = []
+    for method, parameter, values, run in WORK_PRECISION_METHODS:
+        for value in values[::3] if quick else values:
+            value = float(value)
+            stats = RkStats()
+            try:
+                seconds, (headers, table) = bestTime(lambda: run(solver, problem, value, stats), repeat)
+            except SolverError as e:
+                print(f"{method} {parameter}={value:g}: {e}", file=sys.stderr)
+                continue
+            error, errorX = globalError(headers, table, problem)
+            row = {'method': method, 'parameter': parameter, 'value': value, 'error': error, 'errorX': errorX,
+                   'seconds': seconds, 'rhsEvaluations': int(stats.rhsEvaluations),
+                   'steps': int(stats.accepted), 'rejected': int(stats.rejected)}
+            rows.append(row)
+            print(f"{method:22} {parameter}={value:<9.3g} погрешность {error:9.2e}  {seconds:9.5f} с  "
+                  f"{row['rhsEvaluations']:>10} f")
+    return {'meta': dict(benchmarkMeta(engine, repeat, quick, {'l1_test': libraryInfo(solver)}), problem=problem),
+            'results': rows}
+
+
+def cheapestRun(rows, target, cost='rhsEvaluations'):
+    """
+    Запуск с погрешностью не больше target и наименьшей стоимостью cost (rhsEvaluations или seconds), либо None.
+    """
+    suitable = [row for row in rows if row['error'] <= target]
+    return min(suitable, key=lambda row: row[cost]) if suitable else None
+
+
+def saveWorkPrecision(report, output):
+    """
+    output.json (метаданные и таблица), output.csv (таблица) и output.png (кривые работа-точность).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output + '.json', 'w') as file:
+        json.dump(report, file, indent=4)
+    with open(output + '.csv', 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=WORK_PRECISION_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report['results'])
+
+    # Figure без pyplot: рисование без окна и без выбора бэкенда
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(12, 5), tight_layout=True)
+    timeAxes, rhsAxes = figure.subplots(1, 2)
+    for method, _, _, _ in WORK_PRECISION_METHODS:
+        rows = [row for row in report['results'] if row['method'] == method]
+        if not rows:
+            continue
+        error = [row['error'] for row in rows]
+        timeAxes.loglog([row['seconds'] for row in rows], error, 'o-', label=method)
+        rhsAxes.loglog([row['rhsEvaluations'] for row in rows], error, 'o-', label=method)
+    for axes, label in ((timeAxes, 'Время, с'), (rhsAxes, 'Вычислений правой части')):
+        axes.set_xlabel(label)
+        axes.set_ylabel('max|u - v|')
+        axes.grid(True, which='both', alpha=0.3)
+        axes.legend()
+    problem = report['meta']['problem']
+    figure.suptitle(f"Работа-точность: u' = u, u({problem['x0']:g}) = {problem['u0']:g}, x до {problem['xmax']:g}")
+    figure.savefig(output + '.png', dpi=120)
+
+
+def compareResults(basePath, newPath):
+    """
+    Таблица времени по общим замерам двух файлов; ускорение > 1 - второй файл быстрее.
+    """
+    with open(basePath) as file:
+        base = {record['name']: record for record in json.load(file)['results']}
+    with open(newPath) as file:
+        new = {record['name']: record for record in json.load(file)['results']}
+    print(f"{'замер':45} {'было, с':>10} {'стало, с':>10} {'ускорение':>10}")
+    for name in base:
+        if name in new:
+            before, after = base[name]['seconds'], new[name]['seconds']
+            speedup = before / after if after > 0 else float('inf')
+            print(f"{name:45} {before:10.4f} {after:10.4f} {speedup:10.3g}")
+    missing = sorted(set(base) ^ set(new))
+    if missing:
+        print(f"Замеры только в одном из файлов: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности решателей, записи и чтения CSV и перерисовки графика")
+    parser.add_argument('--engine', default=None, help="ядро: native, numpy или auto (по умолчанию RK_ENGINE)")
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument('--quick', action='store_true', help="только первое значение шага/точности в каждом замере")
+    parser.add_argument('--only', nargs='*', default=None, help="библиотеки: l1_test l1_1 l1_2 ksr11")
+    parser.add_argument('--output', default=BENCHMARK_OUTPUT)
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="сравнить два файла результатов")
+    parser.add_argument('--work-precision', action='store_true',
+                        help="работа-точность на тестовой задаче (результаты - " + WORK_PRECISION_OUTPUT + ".json/.csv/.png)")
+    parser.add_argument('--target', type=float, default=None, help="с --work-precision: самый дешёвый запуск с такой погрешностью")
+    args = parser.parse_args()
+
+    if args.compare:
+        compareResults(*args.compare)
+        sys.exit(0)
+    engine = args.engine or os.environ.get('RK_ENGINE', 'auto')
+    if args.work_precision:
+        output = WORK_PRECISION_OUTPUT if args.output == BENCHMARK_OUTPUT else os.path.splitext(args.output)[0]
+        report = runWorkPrecision(engine, args.repeat, args.quick)
+        saveWorkPrecision(report, output)
+        print(f"Результаты записаны в {output}.json, {output}.csv и {output}.png")
+        if args.target is not None:
+            for cost, label, unit in (('rhsEvaluations', 'по вычислениям правой части', 'f'), ('seconds', 'по времени', 'с')):
+                row = cheapestRun(report['results'], args.target, cost)
+                if row is None:
+                    print(f"Погрешность {args.target:g} не достигнута ни одним запуском")
+                    break
+                print(f"Дешевле всего {label}: {row['method']}, {row['parameter']}={row['value']:g} "
+                      f"(погрешность {row['error']:.2e}, {row[cost]:g} {unit})")
+        sys.exit(0)
+    report = runBenchmarks(engine, args.repeat, args.quick, args.only)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f"Результаты записаны в {args.output}")
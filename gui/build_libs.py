@@ -0,0 +1,293 @@
+import argparse
+import ctypes
+import functools
+import hashlib
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Локальная сборка библиотек решателя с оптимизацией. Библиотеки в libs собираются с -O2 под любой
+# процессор (см. .github/workflows/build.yml), поэтому CPPDynamicLibrary сначала ищет сборку в кэше
+# BUILD_CACHE_DIRECTORY и при необходимости собирает её здесь. Ключ сборки - хэш исходника
+# и всех подключённых им локальных заголовков, компилятора (его версии), флагов и платформы,
+# поэтому изменённый исходник или другие флаги дают новую сборку, а старые остаются в кэше.
+# Сборка занимает секунды, поэтому, если в libs есть библиотека не старше исходников и со всеми их
+# функциями, она используется в этом запуске, а сборка идёт в фоне (оптимизированная библиотека -
+# со следующего запуска). Вкладки GUI не ждут сборки и без такой библиотеки: до её конца они считают
+# на ядре NumPy, а потом переходят на собранную библиотеку (RK.PendingSolver).
+# Без компилятора или исходников используются библиотеки из libs.
+#
+# Переменные окружения:
+#   RK_BUILD=auto|off  - собирать ли библиотеки (по умолчанию auto)
+#   RK_BUILD_NATIVE=1  - -march=native: быстрее, но сборка годится только для этого процессора
+#   RK_BUILD_LTO=1     - оптимизация при компоновке (-flto, /GL)
+#   CXX                - компилятор (по умолчанию g++, clang++ или c++; на Windows - cl)
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Сборки лежат в BUILD_CACHE_DIRECTORY/lib-<ключ>/, на той же глубине, что и libs/<платформа>/:
+# библиотеки ищут каталог output как ../../output относительно себя
+BUILD_CACHE_DIRECTORY = os.path.join(SOURCE_DIRECTORY, 'cache')
+LIBRARIES = ('l1_test', 'l1_1', 'l1_2', 'rk_core', 'ksr11')
+EXTENSIONS = {"Windows": '.dll', "Darwin": '.dylib', "Linux": '.so'}
+
+BUILD_ENVIRONMENT_VARIABLE = 'RK_BUILD'
+NATIVE_ENVIRONMENT_VARIABLE = 'RK_BUILD_NATIVE'
+LTO_ENVIRONMENT_VARIABLE = 'RK_BUILD_LTO'
+
+# -ffp-contract=off и /fp:precise запрещают объединять умножение и сложение в FMA (с -march=native g++
+# иначе использует vfmadd), поэтому сборки из кэша совпадают со сборками из libs до бита
+GCC_FLAGS = ['-shared', '-fPIC', '-std=c++17', '-O3', '-ffp-contract=off']
+MSVC_FLAGS = ['/LD', '/std:c++17', '/O2', '/fp:precise', '/EHsc', '/nologo']
+
+INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+EXPORT_PATTERN = re.compile(r'^[ \t]*extern\s+"C"\s+EXPORT\s+[^;{(]*?(\w+)\s*\(', re.MULTILINE)
+
+
+def buildEnabled():
+    return os.environ.get(BUILD_ENVIRONMENT_VARIABLE, 'auto').lower() != 'off'
+
+
+def environmentFlag(name):
+    return os.environ.get(name, '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+@functools.lru_cache(maxsize=None)
+def findCompiler():
+    """
+    Путь к компилятору или None, если его нет.
+    """
+    names = [os.environ['CXX']] if os.environ.get('CXX') else []
+    names += ['cl'] if platform.system() == 'Windows' else ['g++', 'clang++', 'c++']
+    for name in names:
+        path = shutil.which(name)
+        if path is not None:
+            return path
+    return None
+
+
+def isMsvc(compiler):
+    return os.path.splitext(os.path.basename(compiler))[0].lower() == 'cl'
+
+
+@functools.lru_cache(maxsize=None)
+def compilerIdentity(compiler):
+    """
+    Первая строка вывода версии компилятора (cl печатает её в stderr при запуске без аргументов).
+    """
+    command = [compiler] if isMsvc(compiler) else [compiler, '--version']
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return compiler
+    output = (completed.stdout or completed.stderr).strip()
+    return output.splitlines()[0] if output else compiler
+
+
+def compilerFlags(compiler, native, lto):
+    if isMsvc(compiler):
+        return MSVC_FLAGS + (['/GL'] if lto else [])
+    return GCC_FLAGS + (['-march=native'] if native else []) + (['-flto'] if lto else [])
+
+
+def sourceFiles(name):
+    """
+    Исходник библиотеки и локальные заголовки, которые он подключает (рекурсивно), в порядке обхода.
+    """
+    files, pending = [], [name + '.cpp']
+    while pending:
+        file = pending.pop(0)
+        path = os.path.join(SOURCE_DIRECTORY, file)
+        if path in files or not os.path.exists(path):
+            continue
+        files.append(path)
+        with open(path, 'r', encoding='utf-8', errors='replace') as source:
+            pending += INCLUDE_PATTERN.findall(source.read())
+    return files
+
+
+def sourceExports(name):
+    """
+    Имена функций extern "C" EXPORT из исходника библиотеки и его заголовков.
+    """
+    exports = set()
+    for path in sourceFiles(name):
+        with open(path, 'r', encoding='utf-8', errors='replace') as source:
+            exports.update(EXPORT_PATTERN.findall(source.read()))
+    return exports
+
+
+def missingExports(library, name):
+    """
+    Функции исходника, которых нет в собранной библиотеке library (все, если она не загружается).
+    """
+    exports = sourceExports(name)
+    try:
+        loaded = ctypes.CDLL(library)
+    except OSError:
+        return sorted(exports)
+    return sorted(export for export in exports if not hasattr(loaded, export))
+
+
+def buildKey(name, compiler, flags, native):
+    digest = hashlib.sha1()
+    for path in sourceFiles(name):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    digest.update(compilerIdentity(compiler).encode())
+    digest.update(' '.join(flags).encode())
+    digest.update(f"{platform.system()} {platform.machine()}".encode())
+    if native:
+        digest.update(platform.node().encode())  # Сборка под процессор этой машины
+    return digest.hexdigest()[:16]
+
+
+def compileLibrary(compiler, flags, source, target):
+    if isMsvc(compiler):
+        objects = os.path.dirname(target) + os.sep
+        command = [compiler] + flags + [f'/Fe:{target}', f'/Fo:{objects}', source]
+    else:
+        command = [compiler] + flags + ['-o', target, source]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)}\n{completed.stdout}{completed.stderr}")
+
+
+def libraryPath(name, fallback=None, native=None, lto=None, rebuild=False, wait=True):
+    """
+    Путь к оптимизированной сборке библиотеки name в кэше; собирает её, если сборки с таким ключом ещё нет.
+    fallback - библиотека из libs: если она есть, не старше исходников и в ней есть все их функции,
+    сборка запускается в фоне и возвращается None. wait=False - не ждать сборки и без такой библиотеки
+    (вкладки GUI: пока идёт сборка, считает ядро NumPy, см. libraryBuild). None также, если собрать нельзя
+    (сборка отключена, нет компилятора или исходника, ошибка компиляции); тогда используется библиотека из libs.
+    """
+    if not buildEnabled():
+        return None
+    native = environmentFlag(NATIVE_ENVIRONMENT_VARIABLE) if native is None else native
+    lto = environmentFlag(LTO_ENVIRONMENT_VARIABLE) if lto is None else lto
+    target = _buildTarget(name, native, lto)
+    if target is None:
+        return None
+    path = target[-1]
+    with _buildsLock:
+        build = _builds.get(path)
+        if build is None:
+            if os.path.exists(path) and not rebuild:
+                return path
+            build = _builds[path] = _startBuild(name, *target)
+    if not build.done() and (not wait or (fallback is not None and _usableFallback(fallback, name))):
+        return None
+    return path if build.result() else None
+
+
+def libraryBuild(name, native=None, lto=None):
+    """
+    Future сборки библиотеки name, запущенной libraryPath в этом процессе (результат - True, если библиотека
+    собрана), или None, если сборка не запускалась.
+    """
+    if not buildEnabled():
+        return None
+    native = environmentFlag(NATIVE_ENVIRONMENT_VARIABLE) if native is None else native
+    lto = environmentFlag(LTO_ENVIRONMENT_VARIABLE) if lto is None else lto
+    target = _buildTarget(name, native, lto)
+    if target is None:
+        return None
+    with _buildsLock:
+        return _builds.get(target[-1])
+
+
+# Сборки этого процесса: путь в кэше -> Future. Неудачная сборка не запускается повторно,
+# а несколько решателей одной библиотеки ждут одну сборку
+_builds = {}
+_buildsLock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _buildTarget(name, native, lto):
+    # Результат запоминается на процесс: исходники не хэшируются заново при каждом создании решателя
+    compiler = findCompiler()
+    source = os.path.join(SOURCE_DIRECTORY, name + '.cpp')
+    if compiler is None or not os.path.exists(source):
+        return None
+    flags = compilerFlags(compiler, native, lto)
+    directory = os.path.join(BUILD_CACHE_DIRECTORY, 'lib-' + buildKey(name, compiler, flags, native))
+    return compiler, tuple(flags), source, os.path.join(directory, name + EXTENSIONS[platform.system()])
+
+
+@functools.lru_cache(maxsize=None)
+def _usableFallback(fallback, name):
+    return not isStale(fallback, name)
+
+
+def _startBuild(name, compiler, flags, source, path):
+    # Сборка всегда идёт в отдельном потоке (компилятор - отдельный процесс), ждать её или нет, решает вызывающий
+    build = Future()
+    def run():
+        try:
+            build.set_result(buildLibrary(name, compiler, list(flags), source, path))
+        except BaseException as e:
+            build.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return build
+
+
+def isStale(library, name):
+    """
+    Библиотеки нет, она старше исходника либо его заголовков или в ней нет каких-то функций исходника.
+    После клонирования репозитория время изменения файлов ничего не говорит о версии библиотеки в libs,
+    поэтому проверяются и функции.
+    """
+    try:
+        built = os.path.getmtime(library)
+    except OSError:
+        return True
+    if any(os.path.getmtime(path) > built for path in sourceFiles(name)):
+        return True
+    missing = missingExports(library, name)
+    if missing:
+        print(f"В {library} нет функций {', '.join(missing)}, библиотека собирается заново", file=sys.stderr)
+    return bool(missing)
+
+
+def buildLibrary(name, compiler, flags, source, path):
+    # Сборка во временный каталог и переименование: параллельные процессы не видят недособранный файл
+    directory = os.path.dirname(path)
+    temporary = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(temporary, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        print(f"Сборка {name} ({' '.join(flags)})...", file=sys.stderr)
+        compileLibrary(compiler, flags, source, os.path.join(temporary, os.path.basename(path)))
+        os.makedirs(directory, exist_ok=True)
+        os.replace(os.path.join(temporary, os.path.basename(path)), path)
+        print(f"Библиотека {name} собрана за {time.perf_counter() - start:.1f} с: {path}", file=sys.stderr)
+        return True
+    except (OSError, RuntimeError) as e:
+        print(f"Не удалось собрать {name}, используется библиотека из libs: {e}", file=sys.stderr)
+        return False
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оптимизированная сборка библиотек решателя в кэш " + BUILD_CACHE_DIRECTORY)
+    parser.add_argument('names', nargs='*', default=list(LIBRARIES), help="библиотеки (по умолчанию все)")
+    parser.add_argument('--native', action='store_true', default=None, help="-march=native (как RK_BUILD_NATIVE=1)")
+    parser.add_argument('--lto', action='store_true', default=None, help="оптимизация при компоновке (как RK_BUILD_LTO=1)")
+    parser.add_argument('--rebuild', action='store_true', help="собрать заново, даже если сборка есть в кэше")
+    args = parser.parse_args()
+
+    if findCompiler() is None:
+        sys.exit("Компилятор C++ не найден (можно указать переменной окружения CXX)")
+    # Библиотеки собираются параллельно: компилятор - отдельный процесс
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        paths = list(executor.map(lambda name: libraryPath(name, None, args.native, args.lto, args.rebuild), args.names))
+    failed = [name for name, path in zip(args.names, paths) if path is None]
+    if failed:
+        sys.exit(f"Не собраны: {', '.join(failed)}")
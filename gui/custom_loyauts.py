@@ -1,8 +1,24 @@
-from PySide6.QtWidgets import QCheckBox, QErrorMessage ,QDialogButtonBox, QApplication, QPushButton, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QHBoxLayout, QSpinBox, QDoubleSpinBox, QVBoxLayout, QLineEdit, QLabel, QDialog
-from PySide6.QtGui import QDoubleValidator, QIntValidator
+from PySide6.QtWidgets import QCheckBox, QComboBox, QErrorMessage ,QDialogButtonBox, QApplication, QPushButton, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QHBoxLayout, QSpinBox, QDoubleSpinBox, QVBoxLayout, QLineEdit, QLabel, QDialog, QProgressBar, QTableView, QStatusBar
+from PySide6.QtGui import QDoubleValidator, QIntValidator, QPixmap
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal, Qt, QAbstractTableModel, QModelIndex
+import io
+import os
+import sys
+import time
+import json
+import ctypes
+import hashlib
+import logging
+import datetime
+import platform
+import itertools
+import contextlib
 import numpy as np
+import matplotlib
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
+from RK import RESULT_CACHE_DIRECTORY, ADAPTIVE_METHOD_NAMES, ADAPTIVE_STEP_DOUBLING, RkProgress, RkCheckpoint
 # Требования python 3.9
 
 class GraphLayout(QVBoxLayout):
@@ -13,13 +29,16 @@ class GraphLayout(QVBoxLayout):
         self.addWidget(self.checkBoxLogScale)
         self.canvas = MatplotlibGraph(self)
         self.addWidget(self.canvas)
+        # Масштабирование и сдвиг графика; линии прореживаются заново для видимой области (DecimatedLine)
+        self.toolbar = NavigationToolbar(self.canvas)
+        self.addWidget(self.toolbar)
         self.checkBoxLogScale.checkStateChanged.connect(self.checkStateChangedLogScaleComboBox)
     def checkStateChangedLogScaleComboBox(self):
         if self.checkBoxLogScale.isChecked():
             self.canvas.ax.set_yscale('log')
         else:
             self.canvas.ax.set_yscale('linear')
-        self.canvas.draw()
+        self.canvas.draw_idle()
 
     def clear(self):
         self.canvas.clear()
@@ -38,6 +57,16 @@ class GraphLayout(QVBoxLayout):
 
     def draw(self):
         self.canvas.Draw()
+        self.toolbar.update()   # Новые данные - новая исходная область для кнопки "Home"
+
+    def startLive(self, label='', keep=False):
+        self.canvas.startLive(label, keep)
+
+    def appendLive(self, X, Y):
+        self.canvas.appendLive(X, Y)
+
+    def stopLive(self):
+        self.canvas.stopLive()
     def legend(self):
         self.canvas.ax.legend()
 
@@ -57,6 +86,45 @@ class NewWindow(QDialog):
         # Устанавливаем layout для формы
         self.setLayout(layout)
 
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    Таблица результатов поверх столбцов DataFrame (массивов NumPy, без копирования): текст ячейки
+    формируется в data() только для строк, которые видны в таблице.
+    """
+    def __init__(self, df, parent=None):
+        super().__init__(parent)
+        self.headers = [str(column) for column in df.columns]
+        self.columns = [df[column].to_numpy() for column in df.columns]
+        self.rows = len(df)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(float(self.columns[index.column()][index.row()]))
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+class ResultTableDialog(QDialog):
+    """Окно "Таблица результатов" для DataFrame расчёта."""
+    def __init__(self, df, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Таблица результатов")
+        layout = QVBoxLayout(self)
+        self.table = QTableView()
+        self.table.setModel(DataFrameTableModel(df, self.table))
+        layout.addWidget(self.table)
+
 class LatexRendererLayout(QVBoxLayout):
     def __init__(self):
         super().__init__()
@@ -67,38 +135,207 @@ class LatexRendererLayout(QVBoxLayout):
     def render(self, tex):
         self.canvas.render(tex)
 
-class MatplolibLatexRenderer(FigureCanvas):
+# Картинки формул кэшируются на диске рядом с кэшем результатов: при следующих запусках формулы
+# не отрисовываются заново (mathtext при первой отрисовке загружает шрифты)
+FORMULA_CACHE_DIRECTORY = os.path.join(RESULT_CACHE_DIRECTORY, 'formulas')
+FORMULA_FONT_SIZE = 20
+FORMULA_DPI = 100
+
+class MatplolibLatexRenderer(QLabel):
+    """
+    Формула, отрисованная matplotlib (mathtext) в картинку PNG и показанная как QPixmap.
+    Картинка ищется в FORMULA_CACHE_DIRECTORY по хэшу формулы, размера шрифта, разрешения и версии matplotlib.
+    """
     def __init__(self, parent=None):
-        # Создание Figure и добавление осей
-        self.fig = Figure()
-        #self.canvas = FigureCanvas(self.fig)
-
-
-        # Инициализация FigureCanvas с созданной фигурой
-        super(MatplolibLatexRenderer, self).__init__(self.fig)
-        self.render()
+        super(MatplolibLatexRenderer, self).__init__()
+        self.setAlignment(Qt.AlignCenter)
 
     def render(self, tex='$x$'):
-        self.fig.clear()
-        ax = self.fig.add_subplot(111)
-        ax.axis('off')
-        ax.text(0.5, 0.5, tex, fontsize=20, ha='center', va='center')
-        self.draw()
-
+        ratio = self.devicePixelRatioF()
+        dpi = round(FORMULA_DPI * ratio)
+        key = hashlib.sha1(f"{tex}|{FORMULA_FONT_SIZE}|{dpi}|{matplotlib.__version__}".encode()).hexdigest()
+        path = os.path.join(FORMULA_CACHE_DIRECTORY, key + '.png')
+        pixmap = QPixmap()
+        if not pixmap.load(path):
+            data = self.renderPng(tex, dpi)
+            pixmap.loadFromData(data, 'PNG')
+            self.store(path, data)
+        pixmap.setDevicePixelRatio(ratio)
+        self.setPixmap(pixmap)
+
+    @staticmethod
+    def renderPng(tex, dpi):
+        from matplotlib.font_manager import FontProperties
+        from matplotlib.mathtext import math_to_image
+        buffer = io.BytesIO()
+        math_to_image(tex, buffer, prop=FontProperties(size=FORMULA_FONT_SIZE), dpi=dpi, format='png')
+        return buffer.getvalue()
+
+    @staticmethod
+    def store(path, data):
+        # Кэш необязателен: если каталог недоступен для записи, формула просто отрисуется снова
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+
+# Прореживание линий графика: в каждой группе точек остаются первая, последняя и точки с минимумом и максимумом,
+# поэтому на экране не теряются ни выбросы, ни границы колебаний
+PLOT_BUCKETS_PER_PIXEL = 2          # Групп на пиксель ширины осей
+PLOT_MIN_WIDTH = 400                # Ширина осей в пикселях, пока окно ещё не показано
+PLOT_POINTS_PER_BUCKET = 4          # Линии, где точек не больше, чем групп * PLOT_POINTS_PER_BUCKET, не прореживаются
+PLOT_LIVE_MAX_POINTS = 20000        # Растущая линия (appendLive) длиннее этого прореживается через точку
+
+def bucketExtremes(starts, n: int, arrays):
+    """
+    Индексы первой, последней и экстремальных (по каждому из arrays) точек групп [starts[i], starts[i + 1]),
+    последняя группа - до n. starts - возрастающие начала непустых групп.
+    """
+    ends = np.append(starts[1:], n) - 1
+    lengths = ends - starts + 1
+    keep = [starts, ends]
+    for values in arrays:
+        for reduce in (np.minimum, np.maximum):
+            extreme = np.repeat(reduce.reduceat(values, starts), lengths)
+            hits = np.flatnonzero(values == extreme)
+            keep.append(hits[np.searchsorted(hits, starts)])
+    return np.unique(np.concatenate(keep))
+
+def decimateLine(x, y, buckets: int, monotonic: bool, xlim=None, ylim=None):
+    """
+    Прореживает линию (x, y) до buckets групп в видимой области xlim, ylim (None - вся линия).
+    При возрастающем x группы - полосы равной ширины по x (пиксели), точки левее и правее области
+    отбрасываются. Иначе (фазовая кривая) группы - равные по числу точек отрезки кривой с экстремумами
+    и по x, и по y; точки вне области отбрасываются, а разрывы между оставшимися участками - NaN.
+    """
+    n = len(x)
+    if monotonic:
+        lo, hi = 0, n
+        if xlim is not None:
+            lo = max(int(np.searchsorted(x, min(xlim), 'left')) - 1, 0)
+            hi = min(int(np.searchsorted(x, max(xlim), 'right')) + 1, n)
+        xs, ys = x[lo:hi], y[lo:hi]
+        if len(xs) <= buckets * PLOT_POINTS_PER_BUCKET:
+            return xs, ys
+        starts = np.unique(np.searchsorted(xs, np.linspace(xs[0], xs[-1], buckets + 1)[:-1], 'left'))
+        keep = bucketExtremes(starts, len(xs), (ys,))
+        return xs[keep], ys[keep]
+
+    if xlim is None:
+        index = np.arange(n)
+    else:
+        inside = (x >= min(xlim)) & (x <= max(xlim)) & (y >= min(ylim)) & (y <= max(ylim))
+        near = inside.copy()
+        near[:-1] |= inside[1:]     # Соседние точки нужны, чтобы отрезки доходили до края области
+        near[1:] |= inside[:-1]
+        index = np.flatnonzero(near)
+    if len(index) <= buckets * PLOT_POINTS_PER_BUCKET:
+        keep = np.arange(len(index))
+    else:
+        starts = np.arange(0, len(index), -(-len(index) // buckets))
+        keep = bucketExtremes(starts, len(index), (x[index], y[index]))
+    runs = np.concatenate([[0], np.cumsum(np.diff(index) > 1)])[keep]
+    breaks = np.flatnonzero(np.diff(runs)) + 1
+    xs, ys = x[index[keep]], y[index[keep]]
+    return np.insert(xs, breaks, np.nan), np.insert(ys, breaks, np.nan)
+
+def sameArray(a, b) -> bool:
+    """Один и тот же буфер массива (b держит свою память, поэтому её адрес не может достаться новому массиву)."""
+    if b is None or a.shape != b.shape or a.strides != b.strides:
+        return False
+    return a.__array_interface__['data'][0] == b.__array_interface__['data'][0]
+
+class DecimatedLine:
+    """
+    Линия графика: хранит полные массивы, а рисует прореженные (decimateLine) для текущих пределов осей,
+    так что при увеличении масштаба детали берутся из полных данных. Артист Line2D создаётся один раз,
+    новые данные подставляются через setData.
+    """
+    def __init__(self, canvas, ax, X, Y, label=''):
+        self.canvas = canvas
+        self.ax = ax
+        self.x = None
+        self.y = None
+        self.line, = ax.plot([], [], label=label)
+        self.setData(X, Y)
+        ax.callbacks.connect('xlim_changed', self.onLimitsChanged)
+        ax.callbacks.connect('ylim_changed', self.onLimitsChanged)
+    def setData(self, X, Y):
+        """Новые данные линии; прореживание для всей линии пересчитывается, только если массивы другие."""
+        x = np.asarray(X, dtype=np.float64)
+        y = np.asarray(Y, dtype=np.float64)
+        if not (sameArray(x, self.x) and sameArray(y, self.y)):
+            self.x, self.y = x, y
+            self.monotonic = len(x) < 2 or bool(np.all(np.diff(x) >= 0))
+            # Неконечные значения (например, загруженные из файла) рисуются без прореживания
+            self.finite = bool(np.isfinite(x).all() and np.isfinite(y).all())
+            self.bounds = (x.min(), x.max(), y.min(), y.max()) if self.finite and len(x) else None
+            self.full = self._decimate(None, None)
+        # Пределы осей пересчитываются по всей линии (Draw), затем onLimitsChanged прорежет её для них
+        self.line.set_data(*self.full)
+        self.view = None
+    def _decimate(self, xlim, ylim):
+        if not self.finite:
+            return self.x, self.y
+        width = max(self.ax.bbox.width, PLOT_MIN_WIDTH)
+        return decimateLine(self.x, self.y, int(width * PLOT_BUCKETS_PER_PIXEL), self.monotonic, xlim, ylim)
+    def onLimitsChanged(self, ax):
+        if self.line.axes is None or self.bounds is None:
+            return
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        xmin, xmax, ymin, ymax = self.bounds
+        covered = min(xlim) <= xmin and max(xlim) >= xmax
+        if not self.monotonic:
+            covered = covered and min(ylim) <= ymin and max(ylim) >= ymax
+        # Для возрастающего x прореживание зависит только от xlim; вся линия в области - готовое self.full
+        view = 'full' if covered else (xlim if self.monotonic else (xlim, ylim))
+        if view == self.view:
+            return
+        self.view = view
+        self.line.set_data(*(self.full if covered else self._decimate(xlim, ylim)))
+        self.canvas.draw_idle()
 
 class MatplotlibGraph(FigureCanvas):
+    """
+    График с постоянными осями и линиями: clear + plot + Draw обновляют данные существующих Line2D
+    (линия определяется подписью), а линии, не переданные в plot после clear, снимаются с осей и
+    возвращаются на них без пересчёта, если данные не изменились.
+    """
     def __init__(self, parent=None):
         # Создание Figure и добавление осей
         self.fig = Figure()
         self.ax = self.fig.add_subplot(111)
+        self.lines = {}     # Подпись -> DecimatedLine; ссылки нужны и для обработчиков пределов (слабые ссылки)
+        self.shown = []     # Подписи линий, переданных в plot после clear
+        self.live = None    # Линия, растущая во время расчёта
+        self.liveX = np.empty(0)
+        self.liveY = np.empty(0)
+        self.liveLegend = False
+        self.onRendered = None  # onRendered(секунды) после каждой отрисовки фигуры (PhaseTimings.rendered)
 
         # Инициализация FigureCanvas с созданной фигурой
         super(MatplotlibGraph, self).__init__(self.fig)
 
+    def draw(self):
+        # Отрисовка, запланированная draw_idle, выполняется здесь
+        start = time.perf_counter()
+        super().draw()
+        if self.onRendered is not None:
+            self.onRendered(time.perf_counter() - start)
+
 
     def clear(self):
-        self.fig.clear()
-        self.ax = self.fig.add_subplot(111)
+        self.shown = []
+        if self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
 
     def set_ylabel(self, label):
         self.ax.set_ylabel(label)
@@ -110,10 +347,85 @@ class MatplotlibGraph(FigureCanvas):
         self.ax.set_title(title)
 
     def plot(self, X, Y, label=''):
-        self.ax.plot(X, Y, label=label)
+        line = self.lines.get(label)
+        if line is None:
+            self.lines[label] = DecimatedLine(self, self.ax, X, Y, label)
+        else:
+            line.setData(X, Y)
+            if line.line.axes is None:
+                self.ax.add_line(line.line)
+        self.shown.append(label)
 
     def Draw(self):
-        self.draw()
+        self._removeLive()
+        for label, line in self.lines.items():
+            if label not in self.shown and line.line.axes is not None:
+                line.line.remove()
+        self.ax.relim()
+        self.ax.set_autoscale_on(True)
+        self.ax.autoscale_view()
+        self.draw_idle()
+
+    def startLive(self, label='', keep=False):
+        """
+        Линия, которая растёт во время расчёта (appendLive). keep - оставить на осях линии последнего Draw
+        (продолжение расчёта), иначе они снимаются до stopLive или следующего Draw.
+        """
+        self._removeLive()
+        self.liveLegend = self.ax.get_legend() is not None
+        if not keep:
+            for line in self.lines.values():
+                if line.line.axes is not None:
+                    line.line.remove()
+            if self.liveLegend:
+                self.ax.get_legend().remove()
+        self.liveX = np.empty(0)
+        self.liveY = np.empty(0)
+        self.live, = self.ax.plot([], [], label=label if not keep else '_' + label)
+        if not keep and label:
+            self.ax.legend()
+        self.ax.set_autoscale_on(True)
+        self.draw_idle()
+
+    def appendLive(self, X, Y):
+        if self.live is None:
+            return
+        self.liveX = np.concatenate([self.liveX, X])
+        self.liveY = np.concatenate([self.liveY, Y])
+        if len(self.liveX) > PLOT_LIVE_MAX_POINTS:
+            # Прореживание через точку с сохранением последней
+            self.liveX = np.append(self.liveX[:-1:2], self.liveX[-1])
+            self.liveY = np.append(self.liveY[:-1:2], self.liveY[-1])
+        self.live.set_data(self.liveX, self.liveY)
+        # Пределы следуют за линией, пока пользователь сам не изменил масштаб (autoscale выключается панелью)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.draw_idle()
+
+    def stopLive(self):
+        """
+        Убирает растущую линию и возвращает на оси линии последнего Draw.
+        """
+        if self.live is None:
+            return
+        self._removeLive()
+        for label in self.shown:
+            line = self.lines[label].line
+            if line.axes is None:
+                self.ax.add_line(line)
+        if self.liveLegend and self.ax.get_legend() is None:
+            self.ax.legend()
+        self.ax.relim()
+        self.ax.set_autoscale_on(True)
+        self.ax.autoscale_view()
+        self.draw_idle()
+
+    def _removeLive(self):
+        if self.live is not None:
+            self.live.remove()
+            self.live = None
+            self.liveX = np.empty(0)
+            self.liveY = np.empty(0)
 
 
 class ErrorDialog(QDialog):
@@ -222,8 +534,23 @@ class NumericalIntegrationParametersInput(QVBoxLayout):
         self.epsilonInput = FloatNumberInput('Параметр локальной ошибки')
         mainLoyaut.addLayout(self.epsilonInput)
         self.addLayout(mainLoyaut)
+
+        # Способ оценки локальной погрешности (удвоение шага или вложенная пара Дормана-Принса)
+        methodLoyaut = QHBoxLayout()
+        methodLoyaut.addWidget(QLabel("Оценка погрешности"))
+        self.adaptiveMethodComboBox = QComboBox()
+        for method, name in ADAPTIVE_METHOD_NAMES.items():
+            self.adaptiveMethodComboBox.addItem(name, method)
+        methodLoyaut.addWidget(self.adaptiveMethodComboBox)
+        # Плотный вывод: график строится по интерполянту адаптивного решения в заданном числе точек
+        # (пусто или 0 - по узлам сетки)
+        self.densePointsInput = IntNumberInput('Точек на графике (плотный вывод)')
+        methodLoyaut.addLayout(self.densePointsInput)
+        self.addLayout(methodLoyaut)
     def controlLocalErrorCheckBoxStateChanged(self):
         self.epsilonInput.setReadOnly(not self.controlLocalErrorCheckBox.isChecked())
+        self.adaptiveMethodComboBox.setEnabled(self.controlLocalErrorCheckBox.isChecked())
+        self.densePointsInput.setReadOnly(not self.controlLocalErrorCheckBox.isChecked())
     def getStartStep(self):
         return self.h0Input.getFloatNumber()
     def getEpsilonLocalError(self):
@@ -232,6 +559,15 @@ class NumericalIntegrationParametersInput(QVBoxLayout):
         return self.controlLocalErrorCheckBox.isChecked()
     def setChecked(self, checked):
         self.controlLocalErrorCheckBox.setChecked(checked)
+    def getDensePoints(self):
+        if self.densePointsInput.intNumberLineEdit.text() == '':
+            return 0
+        return self.densePointsInput.getIntNumber()
+    def getAdaptiveMethod(self):
+        return self.adaptiveMethodComboBox.currentData()
+    def setAdaptiveMethod(self, method):
+        index = self.adaptiveMethodComboBox.findData(method)
+        self.adaptiveMethodComboBox.setCurrentIndex(index if index >= 0 else self.adaptiveMethodComboBox.findData(ADAPTIVE_STEP_DOUBLING))
     
 class XlimitsInput(QVBoxLayout):
     def __init__(self):
@@ -288,3 +624,293 @@ class ABInput(QVBoxLayout):
     
     def getB(self):
         return self.BInput.getFloatNumber()
+
+
+# Время этапов расчёта и пиковая память. Каждый замер пишется строкой JSON в TIMING_LOG_FILE
+# (путь меняет переменная окружения RK_TIMING_LOG, off - без журнала), сводка последней операции
+# вкладки показывается в её строке состояния (TimingStatusBar)
+TIMING_LOG_FILE = os.path.join(os.path.dirname(RESULT_CACHE_DIRECTORY), 'output', 'timing.log')
+TIMING_LOG_ENVIRONMENT_VARIABLE = 'RK_TIMING_LOG'
+PHASE_NAMES = {
+    'solve': 'решение',
+    'dataframe': 'таблица',
+    'columns': 'столбцы',
+    'plot': 'график',
+    'render': 'отрисовка',
+    'read': 'чтение файла',
+    'write': 'запись файла',
+    'build': 'создание вкладки',
+    'window': 'показ окна',
+    'ready': 'готовность первой вкладки',
+}
+_timingRuns = itertools.count(1)
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    # PROCESS_MEMORY_COUNTERS из psapi.h
+    _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong),
+                ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+
+def peakMemoryBytes():
+    """
+    Наибольший объём физической памяти процесса с его запуска (байты) или None, если его не узнать.
+    Учитывает и буферы решателя, и память pandas и matplotlib, в отличие от tracemalloc, и ничего не замедляет.
+    """
+    if platform.system() == 'Windows':
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+        except (AttributeError, OSError):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024     # В Linux - килобайты
+
+
+def timingLogger():
+    """
+    Журнал замеров: строки JSON в TIMING_LOG_FILE. Обработчик добавляется при первом вызове.
+    """
+    logger = logging.getLogger('rk.timing')
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        path = os.environ.get(TIMING_LOG_ENVIRONMENT_VARIABLE, TIMING_LOG_FILE)
+        handler = logging.NullHandler()
+        if path.lower() != 'off':
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                handler = logging.FileHandler(path, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+            except OSError as e:
+                print(f"Журнал замеров не открыт: {e}", file=sys.stderr)
+        logger.addHandler(handler)
+    return logger
+
+
+class PhaseTimings:
+    """
+    Время этапов одной операции вкладки (расчёт, загрузка, сохранение): with timings.phase('solve'): ...
+    Повторные замеры одного этапа складываются. Этапы из PHASE_NAMES; 'solve' замеряется
+    в потоке расчёта, остальные - в потоке интерфейса. Отрисовка графика (draw_idle) происходит позже,
+    её время приходит в rendered после expectRender.
+    """
+    def __init__(self, tab: str, operation: str):
+        self.tab = tab
+        self.operation = operation
+        self.run = next(_timingRuns)
+        self.phases = {}    # Этап -> секунды
+        self.peakMemory = None
+        self.renderPending = False
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.) + seconds
+        self.peakMemory = peakMemoryBytes()
+        timingLogger().info(json.dumps({
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'tab': self.tab, 'operation': self.operation, 'run': self.run,
+            'phase': name, 'seconds': round(seconds, 6), 'peakMemory': self.peakMemory,
+        }))
+    def expectRender(self):
+        self.renderPending = True
+    def rendered(self, seconds: float):
+        """
+        Время отрисовки фигуры; учитывается только первая отрисовка после expectRender. Возвращает True, если учтено.
+        """
+        if not self.renderPending:
+            return False
+        self.renderPending = False
+        self.add('render', seconds)
+        return True
+    def total(self):
+        return sum(self.phases.values())
+    def summary(self):
+        parts = [f"{PHASE_NAMES.get(name, name)} {seconds:.3f} с" for name, seconds in self.phases.items()]
+        if len(parts) > 1:
+            parts.append(f"всего {self.total():.3f} с")
+        if self.peakMemory is not None:
+            parts.append(f"пик памяти {self.peakMemory / 2**20:.0f} МБ")
+        return " · ".join(parts)
+
+class TimingStatusBar(QStatusBar):
+    """Строка состояния вкладки: время этапов последней операции (PhaseTimings) и пиковая память."""
+    def __init__(self):
+        super().__init__()
+        self.setSizeGripEnabled(False)
+    def showTimings(self, timings):
+        self.showMessage(timings.summary())
+
+class CalculationSignals(QObject):
+    finished = Signal(object, object)   # (задание, результат)
+    failed = Signal(object, object)     # (задание, исключение)
+
+class CalculationJob(QRunnable):
+    """
+    Вызов function(progress) в потоке QThreadPool; результат или исключение приходят сигналами.
+    progress (RkProgress) решатель обновляет по ходу расчёта, progress.cancel = 1 его останавливает.
+    """
+    def __init__(self, function):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.function = function
+        self.progress = RkProgress()
+        self.signals = CalculationSignals()
+    def run(self):
+        try:
+            result = self.function(self.progress)
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+            return
+        self.signals.finished.emit(self, result)
+
+class CalculationProgressBar(QProgressBar):
+    """Ход расчёта по x (доля отрезка [x0, x_end]), число шагов и отклонённых шагов."""
+    RESOLUTION = 1000
+
+    def __init__(self):
+        super().__init__()
+        self.setRange(0, self.RESOLUTION)
+        self.setVisible(False)
+    def start(self):
+        self.setValue(0)
+        self.setFormat("Запуск...")
+        self.setVisible(True)
+    def showProgress(self, progress, x0, x_end):
+        fraction = (progress.x - x0) / (x_end - x0) if x_end > x0 else 0.
+        self.setValue(int(min(max(fraction, 0.), 1.) * self.RESOLUTION))
+        self.setFormat(f"x = {progress.x:.6g}, шагов: {progress.steps}, отклонено: {progress.rejected}")
+    def stop(self):
+        self.setVisible(False)
+
+class CalculationRunner(QObject):
+    """
+    Запуск расчётов вкладки вне потока интерфейса. Пока расчёт идёт, кнопка запуска
+    называется "Отмена", а progressBar (CalculationProgressBar, необязательно) показывает ход расчёта.
+    Отмена останавливает цикл решателя (RkProgress.cancel), результат отменённого расчёта отбрасывается.
+    onFinished(result) и onFailed(exception) вызываются в потоке интерфейса. Если в submit передан stream
+    (RkStream, который заполняет расчёт), onStream(rows) получает его новые точки с тем же интервалом,
+    что и индикатор хода расчёта, а onStream(None) - что расчёт завершён или отменён.
+    """
+    START_TEXT = "Начать вычисления"
+    CANCEL_TEXT = "Отмена"
+    PROGRESS_INTERVAL_MS = 100
+
+    def __init__(self, button, onFinished, onFailed, progressBar=None, onStream=None):
+        super().__init__(button)
+        self.button = button
+        self.onFinished = onFinished
+        self.onFailed = onFailed
+        self.progressBar = progressBar
+        self.onStream = onStream
+        self.stream = None
+        self.span = (0., 0.)
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.PROGRESS_INTERVAL_MS)
+        self.timer.timeout.connect(self._showProgress)
+        self.job = None
+        self.jobs = set()   # Ссылки на задания до их завершения, включая отменённые
+    def isRunning(self):
+        return self.job is not None
+    def submit(self, function, x0: float = 0., x_end: float = 0., stream=None):
+        """
+        function(progress) выполняется в пуле потоков; [x0, x_end] - отрезок для индикатора хода расчёта,
+        stream - RkStream, который function передаёт решателю (для onStream).
+        """
+        job = CalculationJob(function)
+        job.signals.finished.connect(self._jobFinished)
+        job.signals.failed.connect(self._jobFailed)
+        self.jobs.add(job)
+        self.job = job
+        self.span = (x0, x_end)
+        self.stream = stream if self.onStream is not None else None
+        self.button.setText(self.CANCEL_TEXT)
+        if self.progressBar is not None:
+            self.progressBar.start()
+        if self.progressBar is not None or self.stream is not None:
+            self.timer.start()
+        QThreadPool.globalInstance().start(job)
+    def cancel(self):
+        if self.job is not None:
+            self.job.progress.cancel = 1
+        self._stop()
+    def _stop(self):
+        self.job = None
+        self.timer.stop()
+        if self.progressBar is not None:
+            self.progressBar.stop()
+        if self.stream is not None:
+            self.stream = None
+            self.onStream(None)
+        self.button.setText(self.START_TEXT)
+    def _showProgress(self):
+        if self.job is None:
+            return
+        if self.progressBar is not None:
+            self.progressBar.showProgress(self.job.progress, *self.span)
+        if self.stream is not None:
+            rows = self.stream.drain()
+            if len(rows) > 0:
+                self.onStream(rows)
+    def _complete(self, job):
+        self.jobs.discard(job)
+        if job is not self.job:
+            return False
+        self._stop()
+        return True
+    def _jobFinished(self, job, result):
+        if self._complete(job):
+            self.onFinished(result)
+    def _jobFailed(self, job, error):
+        if self._complete(job):
+            self.onFailed(error)
+
+class CalculationCheckpoint:
+    """
+    Продолжение расчёта вкладки до большего конечного X. Если с прошлого показанного расчёта изменилось
+    только конечное X и оно больше достигнутого, решатель начинает с сохранённого состояния (RkCheckpoint),
+    а вкладка дописывает новые строки к прежним, вместо расчёта с начала.
+    """
+    def __init__(self):
+        self.checkpoint = None      # Состояние после показанного результата
+        self.parameters = None      # Параметры этого расчёта, кроме конечного X
+        self.pending = None         # Состояние запущенного расчёта и его параметры
+        self.resuming = False
+    def prepare(self, parameters, x_end: float):
+        """
+        Вызывается в потоке интерфейса перед запуском расчёта. Возвращает состояние для решателя:
+        копию сохранённого, если расчёт продолжается, иначе новое.
+        """
+        self.resuming = self.checkpoint is not None and parameters == self.parameters and x_end > self.checkpoint.x
+        checkpoint = self.checkpoint.resumed() if self.resuming else RkCheckpoint()
+        self.pending = (checkpoint, parameters)
+        return checkpoint
+    def commit(self):
+        """
+        Результат запущенного расчёта показан. Возвращает True, если он продолжает прежний результат.
+        Расчёт, остановленный ошибкой, не сохраняет состояние, и следующий начнётся с начала.
+        """
+        checkpoint, parameters = self.pending
+        self.checkpoint = checkpoint if checkpoint.saved else None
+        self.parameters = parameters
+        self.pending = None
+        return self.resuming
+    def reset(self):
+        self.checkpoint = None
+        self.parameters = None
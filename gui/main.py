@@ -1,17 +1,78 @@
-from test_task import *
-from main_1_task import *
-from main_2_task import *
-from PySide6.QtWidgets import QMainWindow, QTabWidget
+import time
+STARTUP_TIME = time.perf_counter()  # Отсчёт времени запуска - до тяжёлых импортов
+
+import importlib
+from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel
+from PySide6.QtCore import Qt, QTimer
 
 # Сделать логарифмическую шкалу галочку
 # Максимальное ОЛП в точке какой?
 
+# Вкладки: (модуль, класс, заголовок). Модуль вкладки (а с ним pandas, matplotlib и библиотека решателя)
+# импортируется, а вкладка создаётся при первом показе, поэтому окно появляется сразу.
+# Время создания вкладок и холодного запуска пишется в журнал замеров (timingLogger в custom_loyauts).
+TABS = [
+    ("test_task", "TabTestTask", "Тестовая задача"),
+    ("main_1_task", "TabMainTask1", "Основная задача 1"),
+    ("main_2_task", "TabMainTask2", "Основная задача 2"),
+]
+
+
+def logTiming(tab, operation, **phases):
+    # custom_loyauts импортируется только после первой вкладки: он уже загружен её модулем
+    from custom_loyauts import PhaseTimings
+    timings = PhaseTimings(tab, operation)
+    for name, seconds in phases.items():
+        timings.add(name, seconds)
+
+
+class LazyTab(QWidget):
+    """
+    Место вкладки в QTabWidget: при первом показе импортирует module и создаёт в себе вкладку className.
+    Пока вкладка создаётся, показывается надпись "Загрузка...". onBuilt(lazyTab) вызывается после создания.
+    """
+    def __init__(self, module, className, onBuilt=None):
+        super().__init__()
+        self.module = module
+        self.className = className
+        self.onBuilt = onBuilt
+        self.tab = None
+        self.buildTime = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+        self.placeholder = QLabel("Загрузка...")
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.placeholder)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.tab is None:
+            # Создание откладывается до следующей итерации цикла событий, чтобы окно успело отрисоваться
+            QTimer.singleShot(0, self.build)
+
+    def build(self):
+        if self.tab is not None:
+            return
+        start = time.perf_counter()
+        tabClass = getattr(importlib.import_module(self.module), self.className)
+        self.tab = tabClass()
+        self.layout().removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.layout().addWidget(self.tab)
+        self.buildTime = time.perf_counter() - start
+        logTiming(self.tab.settings_file, 'build', build=self.buildTime)
+        if self.onBuilt is not None:
+            self.onBuilt(self)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
         self.setWindowTitle("Меню выбора вкладок")
+        self.shownTime = None  # Время от запуска до показа окна
+        self.readyTime = None  # Время от запуска до готовности первой показанной вкладки
 
         # Создание основного виджета QTabWidget
         self.tab_widget = QTabWidget()
@@ -23,21 +84,9 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.tab_widget)
 
     def create_tabs(self):
-        # Вкладка 1
-        tab1 = TabTestTask()
-
-        # Вкладка 2
-        tab2 = TabMainTask1()
-
-        tab3 = TabMainTask2()
-        #layout2 = QVBoxLayout()
-        #layout2.addWidget(QLabel("Содержимое второй вкладки"))
-        #tab2.setLayout(layout2)
-
-        # Добавляем вкладки в QTabWidget
-        self.tab_widget.addTab(tab1, "Тестовая задача")
-        self.tab_widget.addTab(tab2, "Основная задача 1")
-        self.tab_widget.addTab(tab3, "Основная задача 2")
+        # Вкладки создаются при первом показе (LazyTab)
+        for module, className, title in TABS:
+            self.tab_widget.addTab(LazyTab(module, className, self.onTabBuilt), title)
 
         # Можно добавить иконки к вкладкам, если нужно:
         # self.tab_widget.setTabIcon(0, QIcon('icon1.png'))
@@ -45,6 +94,17 @@ class MainWindow(QMainWindow):
         # Можно изменять расположение вкладок
         # self.tab_widget.setTabPosition(QTabWidget.West)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.shownTime is None:
+            self.shownTime = time.perf_counter() - STARTUP_TIME
+
+    def onTabBuilt(self, lazyTab):
+        if self.readyTime is None:
+            # Время холодного запуска считается от начала импорта main
+            self.readyTime = time.perf_counter() - STARTUP_TIME
+            logTiming('main', 'startup', window=self.shownTime, ready=self.readyTime)
+
 
 if __name__ == "__main__":
     app = QApplication([])
@@ -53,4 +113,4 @@ if __name__ == "__main__":
     window.setMinimumSize(400, 600)
     window.show()
 
-    app.exec()
\ No newline at end of file
+    app.exec()
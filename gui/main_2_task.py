@@ -11,51 +11,61 @@ import ctypes
 import platform
 import subprocess
 import pandas as pd
-from RK import l1_2  # Импортируем l1_2
-from custom_loyauts import LatexRendererLayout, GraphLayout, IntNumberInput, FloatNumberInput, NumericalIntegrationParametersInput, StartConditions2, XlimitsInput, NewWindow, ABInput, ErrorDialog
+from RK import createSolver, defaultResultCache, RkStream, RkStats, NpyReaderMemmap, saveResultBundle, ResultBundle, BUNDLE_EXTENSION, ADAPTIVE_STEP_DOUBLING, SolverError
+from custom_loyauts import LatexRendererLayout, GraphLayout, IntNumberInput, FloatNumberInput, NumericalIntegrationParametersInput, StartConditions2, XlimitsInput, NewWindow, ABInput, ErrorDialog, CalculationRunner, CalculationProgressBar, CalculationCheckpoint, ResultTableDialog, PhaseTimings, TimingStatusBar
 
 class MainTask2Plotter:
+    # Графики graphComboBox: номера столбцов (x, u, u') по осям, подпись линии, подписи осей x и y
+    GRAPHS = {
+        "x - u(x)": ((0, 1), "u(x)", "x", 'u'),
+        "x - u'(x)": ((0, 2), "u'(x)", "x", '$\\dot{x}$'),
+        "u - u'(x)": ((1, 2), "u`(u)", "u", '$\\dot{u}$'),
+        "u`-u": ((2, 1), "u(u`)", '$\\dot{u}$', "u"),
+    }
+
     def __init__(self, graph_layout, graph_combobox):
         self.graph_layout = graph_layout
         self.graph_combobox = graph_combobox
+        self.live = None
 
     def plot(self, x, u, du):
         self.graph_layout.clear()
         selected_graph = self.graph_combobox.currentText()
 
-        if selected_graph == "x - u(x)":
-            self.graph_layout.plot(x, u, label="u(x)")
-            self.graph_layout.set_ylabel('u') 
-            self.graph_layout.set_xlabel("x")
-        elif selected_graph == "x - u'(x)":
-            self.graph_layout.plot(x, du, label="u'(x)")
-            self.graph_layout.set_xlabel("x")
-            self.graph_layout.set_ylabel('$\\dot{x}$')
-        elif selected_graph == "u - u'(x)":
-            self.graph_layout.plot(u, du, label="u`(u)")
-            self.graph_layout.set_ylabel('$\\dot{u}$')
-            self.graph_layout.set_xlabel("u")
-        elif selected_graph == "u`-u":
-            self.graph_layout.plot(du, u, label="u(u`)")
-            self.graph_layout.set_xlabel('$\\dot{u}$')
-            self.graph_layout.set_ylabel("u")
+        if selected_graph in self.GRAPHS:
+            (i, j), label, xlabel, ylabel = self.GRAPHS[selected_graph]
+            columns = (x, u, du)
+            self.graph_layout.plot(columns[i], columns[j], label=label)
+            self.graph_layout.set_xlabel(xlabel)
+            self.graph_layout.set_ylabel(ylabel)
 
         self.graph_layout.set_title(f"График: {selected_graph}")
         
         self.graph_layout.legend()
         self.graph_layout.draw()
 
+    # Выбранный график во время расчёта: строки RkStream (x, u, u')
+    def startLive(self, keep=False):
+        self.live = self.GRAPHS.get(self.graph_combobox.currentText())
+        if self.live is not None:
+            self.graph_layout.startLive(self.live[1], keep)
+
+    def appendLive(self, rows):
+        if self.live is not None:
+            i, j = self.live[0]
+            self.graph_layout.appendLive(rows[:, i], rows[:, j])
+
+    def stopLive(self):
+        self.live = None
+        self.graph_layout.stopLive()
+
 class MainTask2SettingsManager:
     def __init__(self, settings_file, ui_elements):
         self.settings_file = settings_file
         self.ui_elements = ui_elements
 
     def save_settings(self, df, filename):
-        # Сохранение DataFrame в CSV файл
-        csv_filename = filename + ".csv"
-        df.to_csv(csv_filename, sep=";", index=False, header=False)
-
-        # Сохранение настроек в JSON файл
+        # Настройки и результат сохраняются одним сжатым файлом .npz (см. saveResultBundle)
         settings = {
             "initialConditions": {
                 "X0": self.ui_elements["initialConditions"].X0Input.floatNumberLineEdit.text(),
@@ -70,7 +80,9 @@ class MainTask2SettingsManager:
                 "h0": self.ui_elements["numericalIntegrationParametersInput"].h0Input.floatNumberLineEdit.text(),
                 "controlLocalError": self.ui_elements["numericalIntegrationParametersInput"].controlLocalErrorCheckBox.isChecked(),
                 "epsilon": self.ui_elements["numericalIntegrationParametersInput"].epsilonInput.floatNumberLineEdit.text(),
-                "to_be_control_local_error": self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError()
+                "to_be_control_local_error": self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError(),
+                "adaptiveMethod": self.ui_elements["numericalIntegrationParametersInput"].getAdaptiveMethod(),
+                "densePoints": self.ui_elements["numericalIntegrationParametersInput"].densePointsInput.intNumberLineEdit.text()
             },
             "abinput": {
                 "a": self.ui_elements["abinput"].AInput.floatNumberLineEdit.text(),
@@ -78,29 +90,30 @@ class MainTask2SettingsManager:
             },
             "amountOfSteps": self.ui_elements["amountOfStepsInput"].intNumberLineEdit.text(),
             "selectedGraph": self.ui_elements["graphComboBox"].currentText(),
-            "csv_filename": os.path.relpath(csv_filename, os.path.dirname(filename)),  # Относительный путь
             "task_number": 2
         }
 
-        json_filename = filename + ".json"
-        #dirname, file = os.path.split(os.path.abspath(__file__))
-        #json_filename = os.path.join(dirname, (filename + ".json"))
+        bundle_filename = filename + BUNDLE_EXTENSION
         try:
-            with open(json_filename, "w") as f:
-                json.dump(settings, f, indent=4)
-            print(f"Настройки сохранены в файлы {json_filename} и {csv_filename}")
+            saveResultBundle(bundle_filename, settings, df)
+            print(f"Настройки сохранены в файл {bundle_filename}")
         except Exception as e:
             print(f"Ошибка при сохранении настроек: {e}", file=sys.stderr)
             ErrorDialog(f"Ошибка при сохранении настроек: {e}").exec()
 
     def load_settings(self):
         filename, _ = QFileDialog.getOpenFileName(
-            None, "Загрузить настройки", "", "JSON files (*.json)"
+            None, "Загрузить настройки", "", "Сохранения (*.npz *.json)"
         )
         if filename:
             try:
-                with open(filename, "r") as f:
-                    settings = json.load(f)
+                if filename.endswith(BUNDLE_EXTENSION):
+                    # Читаются только настройки, столбцы результата распаковываются позже в load_dataframe
+                    with ResultBundle(filename) as bundle:
+                        settings = bundle.settings
+                else:
+                    with open(filename, "r") as f:
+                        settings = json.load(f)
 
                 if "task_number" not in settings or settings["task_number"] != 2:
                     print("Ошибка: Загруженный файл настроек не соответствует основной задаче 2.")
@@ -115,14 +128,22 @@ class MainTask2SettingsManager:
                 self.ui_elements["numericalIntegrationParametersInput"].h0Input.floatNumberLineEdit.setText(settings["numericalIntegrationParameters"]["h0"])
                 self.ui_elements["numericalIntegrationParametersInput"].controlLocalErrorCheckBox.setChecked(settings["numericalIntegrationParameters"]["controlLocalError"])
                 self.ui_elements["numericalIntegrationParametersInput"].epsilonInput.floatNumberLineEdit.setText(settings["numericalIntegrationParameters"]["epsilon"])
+                # В старых сохранениях способа оценки погрешности нет - удвоение шага
+                self.ui_elements["numericalIntegrationParametersInput"].setAdaptiveMethod(settings["numericalIntegrationParameters"].get("adaptiveMethod", ADAPTIVE_STEP_DOUBLING))
+                self.ui_elements["numericalIntegrationParametersInput"].densePointsInput.setIntNumber(settings["numericalIntegrationParameters"].get("densePoints", ""))
                 self.ui_elements["abinput"].AInput.floatNumberLineEdit.setText(settings["abinput"]["a"])
                 self.ui_elements["abinput"].BInput.floatNumberLineEdit.setText(settings["abinput"]["b"])
                 self.ui_elements["amountOfStepsInput"].intNumberLineEdit.setText(settings["amountOfSteps"])
                 self.ui_elements["numericalIntegrationParametersInput"].setChecked(settings["numericalIntegrationParameters"]["to_be_control_local_error"])
                 self.ui_elements["graphComboBox"].setCurrentText(settings["selectedGraph"])
 
-                csv_filename = os.path.join(os.path.dirname(filename), settings["csv_filename"])
-                self.ui_elements["parent"].load_dataframe(csv_filename, self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError())
+                if filename.endswith(BUNDLE_EXTENSION):
+                    result_filename = filename
+                else:
+                    # Старые сохранения: JSON, а результат рядом в .npy (или в CSV у самых старых)
+                    result_filename = settings["npy_filename"] if "npy_filename" in settings else settings["csv_filename"]
+                    result_filename = os.path.join(os.path.dirname(filename), result_filename)
+                self.ui_elements["parent"].load_dataframe(result_filename, self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError())
                 self.ui_elements["parent"].refreshPlot()  # Обновление графика после загрузки
 
                 print(f"Настройки загружены из файла {filename}")
@@ -135,9 +156,13 @@ class TabMainTask2(QWidget):
         super().__init__()
         self.mainLayout = QVBoxLayout()
         self.setLayout(self.mainLayout)
-        self.RK = l1_2()  # Инициализируем l1_2
+        self.RK = createSolver("l1_2", cache=defaultResultCache(), wait_for_build=False)  # Инициализируем l1_2
         self.settings_file = "main_task_2"  # Базовое имя файла без расширения
         self.df = None  # Переменная для хранения DataFrame
+        self.dfDense = None  # Плотный вывод для графика (None - график по узлам сетки)
+        self.stats = None  # Статистика решателя для справки (RkStats; None - собирается по таблице)
+        self.checkpoint = CalculationCheckpoint()  # Продолжение расчёта при увеличении конечного X
+        self.timings = PhaseTimings(self.settings_file, 'calculation')  # Время этапов последней операции (строка состояния)
         self.to_be_control_local_error = False # Флаг, указывающий, нужно ли контролировать локальную погрешность
 
         # UI элементы
@@ -162,6 +187,10 @@ class TabMainTask2(QWidget):
         calculatePushButton.setText("Начать вычисления")
         self.mainLayout.addWidget(calculatePushButton)
         calculatePushButton.clicked.connect(self.calculateClick)
+        calculationProgressBar = CalculationProgressBar()
+        self.mainLayout.addWidget(calculationProgressBar)
+        self.calculation = CalculationRunner(calculatePushButton, self.onCalculationFinished, self.onCalculationFailed, calculationProgressBar,
+                                             self.onCalculationStream)
 
         self.amountOfStepsInput = IntNumberInput("Количество шагов")
         self.mainLayout.addLayout(self.amountOfStepsInput)
@@ -172,7 +201,7 @@ class TabMainTask2(QWidget):
         # ComboBox для выбора графика
         self.graphComboBox = QComboBox()
         self.graphComboBox.addItems(["x - u(x)", "x - u'(x)", "u - u'(x)", "u`-u"])
-        self.graphComboBox.currentIndexChanged.connect(self.refreshPlot)  # Обновление при выборе
+        self.graphComboBox.currentIndexChanged.connect(self.replot)  # Обновление при выборе
         self.mainLayout.addWidget(self.graphComboBox)
 
         aboutLoyaut = QHBoxLayout()
@@ -197,7 +226,11 @@ class TabMainTask2(QWidget):
 
         self.mainLayout.addLayout(aboutLoyaut)
 
+        self.statusBar = TimingStatusBar()
+        self.mainLayout.addWidget(self.statusBar)
+
         self.plotter = MainTask2Plotter(self.graph, self.graphComboBox)
+        self.graph.canvas.onRendered = self.onPlotRendered
         self.settings_manager = MainTask2SettingsManager(self.settings_file, {
             "initialConditions": self.initialConditions,
             "xlimitsInput": self.xlimitsInput,
@@ -211,11 +244,47 @@ class TabMainTask2(QWidget):
 
 
     def calculateClick(self):
-        # ... (код для получения параметров из UI)
+        if self.calculation.isRunning():
+            self.calculation.cancel()
+            return
         if self._validate_input():
-            self._perform_calculation()
-            self.tryLoadResult(self.to_be_control_local_error)
-            self.refreshPlot()
+            # Принятые точки основного расчёта по ходу вычислений рисуются на графике
+            stream = RkStream(3)
+            calculate = self._prepare_calculation(stream)
+            self.plotter.startLive(self.checkpoint.resuming)
+            self.calculation.submit(calculate, self.initialConditions.getX0(), self.xlimitsInput.getEndX(), stream)
+
+    def onCalculationStream(self, rows):
+        if rows is None:
+            self.plotter.stopLive()
+        else:
+            self.plotter.appendLive(rows)
+
+    def onCalculationFinished(self, output):
+        result, adaptive, dense, stats = output
+        previous, previousDense, previousStats = self.df, self.dfDense, self.stats
+        self.stats = stats
+        self.to_be_control_local_error = adaptive
+        self.tryLoadResult(result, adaptive)
+        self.dfDense = None if dense is None else pd.DataFrame(dense[1], columns=['x', 'u', 'u\''], copy=False)
+        if self.checkpoint.commit():
+            # Продолжение расчёта: новые строки дописываются к прежним
+            with self.timings.phase('dataframe'):
+                self.df = pd.concat([previous, self.df], ignore_index=True)
+                if previousDense is not None and self.dfDense is not None:
+                    self.dfDense = pd.concat([previousDense, self.dfDense], ignore_index=True)
+            self.stats = None if previousStats is None or stats is None else previousStats.merged(stats)
+        self.refreshPlot()
+        self.statusBar.showTimings(self.timings)
+
+    def onCalculationFailed(self, error):
+        if isinstance(error, SolverError) and error.values is not None and len(error.values) > 0:
+            # Строки, посчитанные до ошибки решателя, показываются как результат расчёта
+            adaptive = error.values.shape[1] == len(self.RK.HEADERS_RK4_ADAPTIVE)
+            self.onCalculationFinished(((error.headers, error.values), adaptive, None, None))
+            self.show_error(f"Расчёт остановлен: {error}. Показаны строки, посчитанные до ошибки: {len(error.values)}.")
+            return
+        self.show_error(f"Ошибка во время вычислений: {error}")
 
     def _validate_input(self):
         x_end = self.xlimitsInput.getEndX()
@@ -242,7 +311,13 @@ class TabMainTask2(QWidget):
 
         return True
 
-    def _perform_calculation(self):
+    def _prepare_calculation(self, stream=None):
+        """
+        Считывает параметры с формы (в потоке интерфейса) и возвращает функцию расчёта calculate(progress) для CalculationRunner.
+        stream (RkStream) получает точки основного расчёта, плотный вывод в него не пишется.
+        Функция возвращает (результат, адаптивный ли расчёт, плотный вывод для графика или None, статистика расчёта).
+        """
+        parameters = self.numericalIntegrationParametersInput
         x_end = self.xlimitsInput.getEndX()
         x0 = self.initialConditions.getX0()
         u_x0 = self.initialConditions.getUX0()
@@ -251,22 +326,54 @@ class TabMainTask2(QWidget):
         b = self.abinput.getB()
         epsilon_border = self.xlimitsInput.getEndEpsilon()
         amountOfSteps = self.amountOfStepsInput.getIntNumber()
-        h0 = self.numericalIntegrationParametersInput.getStartStep()
-        local_error = self.numericalIntegrationParametersInput.getEpsilonLocalError()
-        self.to_be_control_local_error = self.numericalIntegrationParametersInput.isControlLocalError()
-
-        try:
-            if self.to_be_control_local_error:
-                self.RK.rk4_adaptive(x0, u_x0, du_x0, x_end, h0, a, b, amountOfSteps, local_error,
-                                    epsilon_border)  # Вызываем rk4_adaptive из l1_2
-            else:
-                self.RK.rk_4(x0, u_x0, du_x0, h0, x_end, a, b, amountOfSteps)  # Вызываем rk_4 из l1_2
-        except Exception as e:
-            self.show_error(f"Ошибка во время вычислений: {e}")
+        h0 = parameters.getStartStep()
+        local_error = parameters.getEpsilonLocalError()
+        adaptive = parameters.isControlLocalError()
+        method = parameters.getAdaptiveMethod()
+        dense_points = parameters.getDensePoints()
+        # Если изменилось только конечное X, расчёт продолжается с достигнутой точки
+        checkpoint = self.checkpoint.prepare((x0, u_x0, du_x0, a, b, epsilon_border, amountOfSteps, h0, local_error, adaptive, method, dense_points), x_end)
+
+        timings = self.timings = PhaseTimings(self.settings_file, 'calculation')
+
+        def calculate(progress):
+            stats = RkStats()
+            if not adaptive:
+                with timings.phase('solve'):
+                    result = self.RK.rk_4(x0, u_x0, du_x0, h0, x_end, a, b, amountOfSteps, progress=progress, checkpoint=checkpoint, stream=stream,
+                                          stats=stats)  # Вызываем rk_4 из l1_2
+                return result, adaptive, None, stats
+            with timings.phase('solve'):
+                if dense_points > 0:
+                    # Плотный вывод для графика: решение того же расчёта в равномерно расположенных точках отрезка
+                    result, dense = self.RK.rk4_adaptive_with_dense(x0, u_x0, du_x0, x_end, h0, a, b, amountOfSteps, local_error, epsilon_border,
+                                                                    np.linspace(x0, x_end, dense_points), method=method, progress=progress,
+                                                                    checkpoint=checkpoint, stream=stream, stats=stats)
+                else:
+                    result = self.RK.rk4_adaptive(x0, u_x0, du_x0, x_end, h0, a, b, amountOfSteps, local_error,
+                                                  epsilon_border, method=method, progress=progress, checkpoint=checkpoint, stream=stream,
+                                                  stats=stats)  # Вызываем rk4_adaptive из l1_2
+                    dense = None
+            return result, adaptive, dense, stats
+        return calculate
 
     def refreshPlot(self):
         if self.df is not None:
-            self.plotter.plot(self.getColumnValues(self.df, 'x'), self.getColumnValues(self.df, 'u'), self.getColumnValues(self.df, 'u\''))
+            df = self.dfDense if self.dfDense is not None else self.df
+            x, u, du = self.getColumnValues(df, 'x'), self.getColumnValues(df, 'u'), self.getColumnValues(df, 'u\'')
+            with self.timings.phase('plot'):
+                self.plotter.plot(x, u, du)
+            self.timings.expectRender()
+
+    def replot(self):
+        # Перерисовка при выборе графика - отдельная операция в строке состояния
+        self.timings = PhaseTimings(self.settings_file, 'redraw')
+        self.refreshPlot()
+        self.statusBar.showTimings(self.timings)
+
+    def onPlotRendered(self, seconds):
+        if self.timings.rendered(seconds):
+            self.statusBar.showTimings(self.timings)
 
     def closeEvent(self, event):
         self.saveSettings()
@@ -277,30 +384,7 @@ class TabMainTask2(QWidget):
             self.show_error("Ошибка: Сначала необходимо выполнить вычисления.")
             return
 
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Таблица результатов")
-        layout = QVBoxLayout(dialog)
-        table = QTableWidget()
-        layout.addWidget(table)
-
-        if self.to_be_control_local_error:
-            self.columns = ['x', 'u', 'u\'', 'u2i', 'u\'2i', 'u-u2i', 'u\'-u\'2i', 'h', 'e', 'e_v', 'e_v\'',
-                            'c1', 'c2']  # Замена 'E' на 'e'
-            self.data = self.df.values.tolist()[1:]  # Данные для таблицы
-        else:
-            self.columns = ['x', 'u', 'u\'']
-            
-            self.data = self.df.values.tolist()[1:]  # Данные для таблицы
-
-        table.setColumnCount(len(self.columns))
-        table.setRowCount(len(self.data))
-        table.setHorizontalHeaderLabels(self.columns)
-
-        for row, data_row in enumerate(self.data):
-            for col, value in enumerate(data_row):
-                item = QTableWidgetItem(str(value))
-                table.setItem(row, col, item)
-
+        dialog = ResultTableDialog(self.df, self)
         dialog.exec()
 
     def referenceButtonClick(self):
@@ -309,34 +393,23 @@ class TabMainTask2(QWidget):
             return
 
         try:
+            stats = self.stats
+            if stats is None:
+                # Статистики решателя нет (результат загружен из файла) - собираем её по таблице
+                column = lambda name: self.getColumnValues(self.df, name) if name in self.df.columns else None
+                stats = RkStats.fromTable(self.getColumnValues(self.df, 'x'), self.xlimitsInput.getEndX(), column('h'), column('e'),
+                                          column('c1'), column('c2'))
             report = ""
-            amountOfIterations = len(self.df['x']) - 1
-            report += f"Количество итераций: {amountOfIterations} \n"
-            x = self.getColumnValues(self.df, 'x')
-            l = len(x)
-            difference_between_the_right_border_and_the_last_calculated_point = abs(
-                x[l - 1] - self.xlimitsInput.getEndX())
-            report += f'разница между правой границей и последней вычисленной точки: {difference_between_the_right_border_and_the_last_calculated_point}\n'
+            report += f"Количество итераций: {stats.accepted} \n"
+            report += f'разница между правой границей и последней вычисленной точки: {stats.boundaryDistance}\n'
+            if stats.rhsEvaluations > 0:
+                report += f'Количество вычислений правой части: {stats.rhsEvaluations}\n'
             if self.to_be_control_local_error:
-                e = self.getColumnValues(self.df, 'e')  # Замена 'E' на 'e'
-                maxError = max(e)  # Замена 'E' на 'e'
-                max_error_index = e.index(maxError)
-                report += f'Максимальное значение ОЛП {maxError} при x = {x[max_error_index]}\n'
-                doubling = self.getColumnValues(self.df, 'c2')
-                countOfDoubling = sum(doubling)
-                report += f'Количество удвоений {countOfDoubling}\n'
-                doubling = self.getColumnValues(self.df, 'c1')
-                countOfDoubling = sum(doubling)
-                report += f'Количество делений {countOfDoubling}\n'
-                h = self.getColumnValues(self.df, 'h')
-                maxStep = max(h)
-                minStep = min(h)
-                xMinStep = h.index(minStep)
-                xMinStep = x[xMinStep]
-                xMaxStep = h.index(maxStep)
-                xMaxStep = x[xMaxStep]
-                report += f'максимальный шаг {maxStep} при x={xMaxStep}\n'
-                report += f'Минимальный шаг {minStep} при x={xMinStep}\n'
+                report += f'Максимальное значение ОЛП {stats.maxError} при x = {stats.maxErrorX}\n'
+                report += f'Количество удвоений {stats.doublings}\n'
+                report += f'Количество делений {stats.rejected}\n'
+                report += f'максимальный шаг {stats.maxH} при x={stats.maxHX}\n'
+                report += f'Минимальный шаг {stats.minH} при x={stats.minHX}\n'
             window = NewWindow('Справка', report)
             window.show()
             window.exec()
@@ -344,49 +417,68 @@ class TabMainTask2(QWidget):
         except Exception as e:
             self.show_error(f"Ошибка во время анализа: {e}")
 
-    def tryLoadResult(self, to_be_control_local_error):
+    def tryLoadResult(self, result, to_be_control_local_error):
+        if result is None:
+            return
         try:
-            current_file_path = os.path.abspath(__file__)
-            current_dir = os.path.dirname(current_file_path)
-            current_dir = os.path.join(current_dir, "..") 
-            current_dir = os.path.join(current_dir, "output")
-            file_path = os.path.join(current_dir, 'output_2.csv')
-            if to_be_control_local_error:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None,
-                                 names=['x', 'u', 'u2i', 'u\'', 'u\'2i', 'u-u2i', 'u\'-u\'2i', 'h', 'e', 'e_v',
-                                        'e_v\'', 'c1', 'c2'])  # Замена 'E' на 'e'
-            else:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None, names=['x', 'u', 'u\''])
+            headers, values = result
+            with self.timings.phase('dataframe'):
+                if to_be_control_local_error:
+                    self.df = pd.DataFrame(values, copy=False,
+                                     columns=['x', 'u', 'u2i', 'u\'', 'u\'2i', 'u-u2i', 'u\'-u\'2i', 'h', 'e', 'e_v',
+                                            'e_v\'', 'c1', 'c2'])  # Замена 'E' на 'e'
+                else:
+                    self.df = pd.DataFrame(values, columns=['x', 'u', 'u\''], copy=False)
         except Exception as e:
             self.show_error(f"Ошибка во время загрузки: {e}")
 
     def getColumnValues(self, df, column):
-        return pd.to_numeric(df[column][1:], errors='coerce').dropna().tolist()
+        with self.timings.phase('columns'):
+            return df[column].to_numpy(dtype=np.float64)
 
     def saveSettings(self):
         if self.df is not None:
-            filename, _ = QFileDialog.getSaveFileName(None, "Сохранить настройки", self.settings_file, "JSON files (*.json)")
+            filename, _ = QFileDialog.getSaveFileName(None, "Сохранить настройки", self.settings_file, "Сохранения (*.npz)")
             if filename:
-                self.settings_manager.save_settings(self.df, filename[:-5])  # Сохранение DataFrame и настроек
+                self.timings = PhaseTimings(self.settings_file, 'save')
+                with self.timings.phase('write'):
+                    self.settings_manager.save_settings(self.df, os.path.splitext(filename)[0])  # Сохранение DataFrame и настроек
+                self.statusBar.showTimings(self.timings)
 
     def loadSettings(self):
+        if self.calculation.isRunning():
+            self.calculation.cancel()  # Иначе результат расчёта заменит загруженный
+        self.dfDense = None
+        self.stats = None
+        self.checkpoint.reset()
+        timings = self.timings
         self.settings_manager.load_settings()
+        if self.timings is not timings:
+            self.statusBar.showTimings(self.timings)    # Загрузка результата (load_dataframe) и его график
         self.to_be_control_local_error= self.numericalIntegrationParametersInput.isControlLocalError()
 
     def load_dataframe(self, csv_filename, control_local_error):
-        """Загружает DataFrame из CSV файла в зависимости от control_local_error."""
+        """Загружает DataFrame из сохранения .npz или файла .npy (имена столбцов хранятся в файле) или из CSV в зависимости от control_local_error."""
         current_file_path = os.path.abspath(__file__)
         current_dir = os.path.dirname(current_file_path)
         current_dir = os.path.join(current_dir, "..") 
         current_dir = os.path.join(current_dir, "output")
         file_path = os.path.join(current_dir, csv_filename)
+        self.timings = PhaseTimings(self.settings_file, 'load')
         try:
-            if control_local_error:
-                self.df = pd.read_csv(file_path, delimiter=";", low_memory=False, header=None,
-                                       names=['x', 'u', 'u2i', 'u\'', 'u\'2i', 'u-u2i', 'u\'-u\'2i', 'h', 'e', 'e_v',
-                                        'e_v\'', 'c1', 'c2'])  # Замена 'E' на 'e'
-            else:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None, low_memory=False, names=['x', 'u', 'u\''])
+            with self.timings.phase('read'):
+                if file_path.endswith(BUNDLE_EXTENSION):
+                    with ResultBundle(file_path) as bundle:
+                        self.df = bundle.readAsDataFrame()
+                elif file_path.endswith(".npy"):
+                    headers, values = NpyReaderMemmap(file_path).readAsNumpy()
+                    self.df = pd.DataFrame(values, columns=headers, copy=False)
+                elif control_local_error:
+                    self.df = pd.read_csv(file_path, delimiter=";", low_memory=False, header=0,
+                                           names=['x', 'u', 'u2i', 'u\'', 'u\'2i', 'u-u2i', 'u\'-u\'2i', 'h', 'e', 'e_v',
+                                            'e_v\'', 'c1', 'c2'])  # Замена 'E' на 'e'
+                else:
+                    self.df = pd.read_csv(file_path, delimiter=";", header=0, low_memory=False, names=['x', 'u', 'u\''])
         except Exception as e:
             self.show_error(f"Ошибка при загрузке DataFrame: {e}")
 
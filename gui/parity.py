@@ -0,0 +1,133 @@
+import argparse
+import sys
+
+import numpy as np
+
+from RK import createSolver, RkStats, ADAPTIVE_STEP_DOUBLING, ADAPTIVE_DORMAND_PRINCE
+
+# Сверка ядер: те же расчёты на библиотеках C++ (native) и на RK_numpy (numpy) должны давать одинаковые
+# таблицы (с точностью до --rtol/--atol: порядок операций в NumPy бывает другим) и одинаковую статистику
+# (RkStats: принятые и отвергнутые шаги, удвоения, вычисления правой части). Проверяются постоянный шаг,
+# оба адаптивных метода, плотный вывод и ансамбли траекторий. Код возврата 1, если есть расхождения,
+# поэтому скрипт годится для проверки после изменения любого из ядер.
+
+PARITY_RTOL = 1e-10
+PARITY_ATOL = 1e-12
+PARITY_EVAL_POINTS = np.linspace(0, 1.5, 31)
+
+# (библиотека, расчёт, run(решатель, stats)); stats - RkStats или None, если метод статистику не собирает
+PARITY_CASES = [
+    ('l1_test', 'rk_4',
+     lambda s, stats: s.rk_4(0, 1, 1e-2, 5, 1000, stats=stats)),
+    ('l1_test', 'rk4_adaptive',
+     lambda s, stats: s.rk4_adaptive(0, 1, 1e-2, 5, 1e-8, 1e-9, 10000, ADAPTIVE_STEP_DOUBLING, stats=stats)),
+    ('l1_test', 'rk4_adaptive[dormand-prince]',
+     lambda s, stats: s.rk4_adaptive(0, 1, 1e-2, 5, 1e-8, 1e-9, 10000, ADAPTIVE_DORMAND_PRINCE, stats=stats)),
+    ('l1_test', 'rk4_adaptive_with_dense',
+     lambda s, stats: s.rk4_adaptive_with_dense(0, 1, 1e-2, 1.5, 1e-8, 1e-9, 10000, PARITY_EVAL_POINTS, stats=stats)),
+    ('l1_1', 'rk_4',
+     lambda s, stats: s.rk_4(0, 0.2, 1e-3, 1.5, 10000, stats=stats)),
+    ('l1_1', 'rk4_adaptive',
+     lambda s, stats: s.rk4_adaptive(0, 0.2, 1e-2, 1.5, 1e-8, 1e-9, 10000, ADAPTIVE_STEP_DOUBLING, stats=stats)),
+    ('l1_1', 'rk4_adaptive[dormand-prince]',
+     lambda s, stats: s.rk4_adaptive(0, 0.2, 1e-2, 1.5, 1e-8, 1e-9, 10000, ADAPTIVE_DORMAND_PRINCE, stats=stats)),
+    ('l1_1', 'rk4_adaptive_with_dense',
+     lambda s, stats: s.rk4_adaptive_with_dense(0, 0.2, 1e-2, 1.5, 1e-8, 1e-9, 10000, PARITY_EVAL_POINTS,
+                                                ADAPTIVE_DORMAND_PRINCE, stats=stats)),
+    ('l1_1', 'solve_many',
+     lambda s, stats: s.solve_many(np.linspace(0.05, 0.3, 8), 0, 1e-3, 1.5, 10000)),
+    ('l1_1', 'solve_many_adaptive',
+     lambda s, stats: s.solve_many_adaptive(np.linspace(0.05, 0.3, 8), 0, 1e-2, 1.5, 1e-8, 1e-9, 10000)),
+    ('l1_2', 'rk_4',
+     lambda s, stats: s.rk_4(0, 0, 1, 1e-2, 10, 1, 1, 10000, stats=stats)),
+    ('l1_2', 'rk4_adaptive',
+     lambda s, stats: s.rk4_adaptive(0, 0, 1, 10, 1e-2, 1, 1, 10000, 1e-8, 1e-9, ADAPTIVE_STEP_DOUBLING, stats=stats)),
+    ('l1_2', 'rk4_adaptive[dormand-prince]',
+     lambda s, stats: s.rk4_adaptive(0, 0, 1, 10, 1e-2, 1, 1, 10000, 1e-8, 1e-9, ADAPTIVE_DORMAND_PRINCE, stats=stats)),
+    ('l1_2', 'rk4_adaptive_with_dense',
+     lambda s, stats: s.rk4_adaptive_with_dense(0, 0, 1, 1.5, 1e-2, 1, 1, 10000, 1e-8, 1e-9, PARITY_EVAL_POINTS, stats=stats)),
+    ('l1_2', 'solve_many',
+     lambda s, stats: s.solve_many(np.linspace(-1, 1, 8), 0, 1e-2, 10, 1, 1, 10000)),
+    ('l1_2', 'solve_many_adaptive',
+     lambda s, stats: s.solve_many_adaptive(np.linspace(-1, 1, 8), 0, 1e-2, 10, 1, 1, 10000, 1e-8, 1e-9)),
+]
+
+
+def resultArrays(result):
+    """
+    Все массивы результата: (заголовки, значения), пары таблица/плотный вывод, (значения, итерации, ошибки).
+    """
+    if isinstance(result, tuple):
+        return [array for part in result for array in resultArrays(part)]
+    return [np.asarray(result)]
+
+
+def compareArrays(native, numpy, rtol, atol):
+    """
+    (описание первого расхождения, None) или (None, наибольшая разность), если массивы совпадают.
+    """
+    if len(native) != len(numpy):
+        return f"разное количество массивов: {len(native)} и {len(numpy)}", None
+    largest = 0.
+    for k, (a, b) in enumerate(zip(native, numpy)):
+        if a.dtype.kind in 'USO' or b.dtype.kind in 'USO':
+            if not np.array_equal(a, b):
+                return f"массив {k}: разные заголовки {list(a)} и {list(b)}", None
+            continue
+        if a.shape != b.shape:
+            return f"массив {k}: размер {a.shape} и {b.shape}", None
+        a, b = a.astype(np.float64), b.astype(np.float64)
+        close = np.isclose(a, b, rtol=rtol, atol=atol, equal_nan=True)
+        if not close.all():
+            index = tuple(int(i) for i in np.argwhere(~close)[0])
+            return f"массив {k}, элемент {index}: {a[index]!r} и {b[index]!r}", None
+        if a.size:
+            with np.errstate(invalid='ignore'):
+                largest = max(largest, float(np.nanmax(np.abs(a - b), initial=0.)))
+    return None, largest
+
+
+def compareStats(native, numpy):
+    differences = [f"{name} {getattr(native, name)} и {getattr(numpy, name)}"
+                   for name in RkStats.COUNTERS if getattr(native, name) != getattr(numpy, name)]
+    return ", ".join(differences) or None
+
+
+def runParity(only=None, rtol=PARITY_RTOL, atol=PARITY_ATOL):
+    """
+    Прогоняет PARITY_CASES на обоих ядрах. :return: количество расхождений.
+    """
+    mismatches = 0
+    solvers = {}
+    for library, name, run in PARITY_CASES:
+        if only is not None and library not in only:
+            continue
+        if library not in solvers:
+            solvers[library] = (createSolver(library, 'native'), createSolver(library, 'numpy'))
+        results = []
+        for solver in solvers[library]:
+            stats = RkStats.empty()
+            results.append((resultArrays(run(solver, stats)), stats))
+        (nativeArrays, nativeStats), (numpyArrays, numpyStats) = results
+        difference, largest = compareArrays(nativeArrays, numpyArrays, rtol, atol)
+        difference = difference or compareStats(nativeStats, numpyStats)
+        title = f"{library}.{name}"
+        if difference is None:
+            print(f"{title:45} совпадает (наибольшая разность {largest:.1e})")
+        else:
+            mismatches += 1
+            print(f"{title:45} РАСХОЖДЕНИЕ: {difference}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка результатов ядер native (C++) и numpy (RK_numpy)")
+    parser.add_argument('--only', nargs='*', default=None, help="библиотеки: l1_test l1_1 l1_2")
+    parser.add_argument('--rtol', type=float, default=PARITY_RTOL)
+    parser.add_argument('--atol', type=float, default=PARITY_ATOL)
+    args = parser.parse_args()
+
+    mismatches = runParity(args.only, args.rtol, args.atol)
+    if mismatches:
+        sys.exit(f"Расхождений: {mismatches}")
+    print("Ядра совпадают")
@@ -0,0 +1,195 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import build_libs
+from RK import createSolver, SolverError, RkStats
+
+# Перебор параметров (a, b) и начальных условий основной задачи 2 (l1_2.rk4_adaptive)
+# на пуле процессов. Каждый рабочий процесс загружает библиотеку один раз, а собирается она (build_libs)
+# один раз в родительском процессе до запуска пула.
+# Расходящийся запуск (переполнение, NaN, деление шага до нуля) решатель возвращает
+# кодом ошибки: точка получает статус SWEEP_DIVERGED и последнее посчитанное состояние.
+# Если процесс решателя всё же аварийно завершается, пул пересоздаётся, а подозрительные
+# точки пересчитываются по одной, так что авария не останавливает перебор.
+
+# Состояние запуска
+SWEEP_OK = 0        # Расчёт завершён
+SWEEP_ERROR = 1     # Решатель вернул ошибку (исключение Python)
+SWEEP_CRASHED = 2   # Процесс решателя аварийно завершился
+SWEEP_DIVERGED = 3  # Решатель остановился с кодом ошибки (RK_ERROR_*), сводка - по строкам до ошибки
+
+# Сколько раз задание может попасть под аварию пула до поштучного пересчёта
+MAX_CHUNK_FAILURES = 2
+
+# Сводка по одному запуску
+SWEEP_RESULT_DTYPE = np.dtype([
+    ('a', np.float64), ('b', np.float64), ('u0', np.float64), ('du0', np.float64),
+    ('x', np.float64), ('u', np.float64), ('du', np.float64),
+    ('steps', np.int64), ('c1', np.int64), ('c2', np.int64),
+    ('h_min', np.float64), ('h_max', np.float64),
+    ('status', np.int8),
+])
+
+# Решатель рабочего процесса, создаётся в _initWorker
+_solver = None
+
+
+def _prepareLibrary():
+    """
+    Собирает библиотеку l1_2 (если её сборки ещё нет в кэше) до запуска пула, чтобы рабочие процессы
+    только загружали её, а не собирали каждый сам. :return: initargs для _initWorker.
+    """
+    return (build_libs.libraryPath("l1_2") is not None,)
+
+
+def _initWorker(built: bool):
+    global _solver
+    if not built:
+        # Сборка не удалась или невозможна: рабочий процесс не пробует собрать заново, а берёт библиотеку из libs
+        os.environ[build_libs.BUILD_ENVIRONMENT_VARIABLE] = 'off'
+    _solver = createSolver("l1_2")
+
+
+def _runPoint(point, settings):
+    a, b, u0, du0 = point
+    x0, xmax, h0, maxSteps, tolerance, edge = settings
+    row = np.zeros((), dtype=SWEEP_RESULT_DTYPE)
+    row['a'], row['b'], row['u0'], row['du0'] = a, b, u0, du0
+    status = SWEEP_OK
+    stats = RkStats.empty(x0)
+    try:
+        headers, values = _solver.rk4_adaptive(x0, u0, du0, xmax, h0, a, b, maxSteps, tolerance, edge, stats=stats)
+    except SolverError as e:
+        status = SWEEP_DIVERGED
+        values = e.values
+    except Exception as e:
+        print(f"Ошибка при a={a}, b={b}, u0={u0}, u'0={du0}: {e}", file=sys.stderr)
+        row['status'] = SWEEP_ERROR
+        return row
+
+    row['status'] = status
+    # Число принятых шагов - из статистики решателя: строк таблицы бывает меньше (прореживание вывода)
+    row['steps'] = stats.accepted
+    if len(values) == 0:
+        row['x'], row['u'], row['du'] = x0, u0, du0
+        row['h_min'] = row['h_max'] = h0
+        return row
+
+    last = values[-1]
+    row['x'], row['u'], row['du'] = last[0], last[1], last[3]
+    row['c1'], row['c2'] = last[11], last[12]
+    # Последний шаг, укороченный до xmax, не выбирается регулятором и в диапазон шагов не входит
+    h = values[:-1, 7] if status == SWEEP_OK and len(values) > 1 and last[0] == xmax else values[:, 7]
+    row['h_min'], row['h_max'] = h.min(), h.max()
+    return row
+
+
+def _runChunk(points, settings):
+    rows = np.zeros(len(points), dtype=SWEEP_RESULT_DTYPE)
+    for k, point in enumerate(points):
+        rows[k] = _runPoint(point, settings)
+    return rows
+
+
+def _runIsolated(points, settings, initargs):
+    """
+    Пересчитывает точки по одной в отдельном процессе; точка, на которой процесс
+    аварийно завершился, получает статус SWEEP_CRASHED.
+    """
+    rows = np.zeros(len(points), dtype=SWEEP_RESULT_DTYPE)
+    pool = ProcessPoolExecutor(max_workers=1, initializer=_initWorker, initargs=initargs)
+    try:
+        for k, point in enumerate(points):
+            try:
+                rows[k] = pool.submit(_runPoint, point, settings).result()
+            except BrokenProcessPool:
+                rows[k]['a'], rows[k]['b'], rows[k]['u0'], rows[k]['du0'] = point
+                rows[k]['status'] = SWEEP_CRASHED
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(max_workers=1, initializer=_initWorker, initargs=initargs)
+    finally:
+        pool.shutdown(wait=False)
+    return rows
+
+
+def sweepAB(a_values, b_values, initial_conditions, x0: float, xmax: float, h0: float, maxSteps: int,
+            tolerance: float, edge: float, max_workers=None, chunk_size: int = 16):
+    """
+    Запускает l1_2.rk4_adaptive для каждой комбинации a, b и начальных условий.
+
+    :param initial_conditions: Последовательность пар (u0, u'0).
+    :param max_workers: Количество процессов (по умолчанию - все ядра).
+    :param chunk_size: Количество точек в одном задании рабочего процесса.
+    :return: Структурированный массив SWEEP_RESULT_DTYPE, строка на точку в порядке
+             itertools.product(a_values, b_values, initial_conditions).
+    """
+    points = [(float(a), float(b), float(u0), float(du0))
+              for a, b, (u0, du0) in itertools.product(a_values, b_values, initial_conditions)]
+    settings = (x0, xmax, h0, maxSteps, tolerance, edge)
+    results = np.zeros(len(points), dtype=SWEEP_RESULT_DTYPE)
+    initargs = _prepareLibrary()
+
+    chunks = [range(i, min(i + chunk_size, len(points))) for i in range(0, len(points), chunk_size)]
+    # Аварийное завершение одного процесса ломает весь пул, и незавершённые задания
+    # всех процессов получают BrokenProcessPool. Поэтому задание пересылается в новый пул,
+    # а после MAX_CHUNK_FAILURES неудач его точки пересчитываются по одной.
+    failures = {chunk.start: 0 for chunk in chunks}
+    suspects = []
+    while chunks:
+        failed = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_initWorker, initargs=initargs) as pool:
+            futures = {pool.submit(_runChunk, [points[i] for i in chunk], settings): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results[chunk.start:chunk.stop] = future.result()
+                except BrokenProcessPool:
+                    failures[chunk.start] += 1
+                    if failures[chunk.start] >= MAX_CHUNK_FAILURES:
+                        suspects.append(chunk)
+                    else:
+                        failed.append(chunk)
+        chunks = failed
+    for chunk in suspects:
+        results[chunk.start:chunk.stop] = _runIsolated([points[i] for i in chunk], settings, initargs)
+    return results
+
+
+def parseRange(text):
+    """
+    "1.5" -> [1.5], "0:2:5" -> np.linspace(0, 2, 5)
+    """
+    parts = [float(part) for part in text.split(':')]
+    if len(parts) == 1:
+        return np.array(parts)
+    return np.linspace(parts[0], parts[1], int(parts[2]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перебор параметров a, b и начальных условий основной задачи 2")
+    parser.add_argument('--a', required=True, help="значение или диапазон начало:конец:количество")
+    parser.add_argument('--b', required=True, help="значение или диапазон начало:конец:количество")
+    parser.add_argument('--u0', default='0', help="значение или диапазон u(x0)")
+    parser.add_argument('--du0', default='1', help="значение или диапазон u'(x0)")
+    parser.add_argument('--x0', type=float, default=0.0)
+    parser.add_argument('--xmax', type=float, default=10.0)
+    parser.add_argument('--h0', type=float, default=0.01)
+    parser.add_argument('--max-steps', type=int, default=10000)
+    parser.add_argument('--eps', type=float, default=1e-7)
+    parser.add_argument('--edge', type=float, default=1e-6)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=os.path.join('..', 'output', 'sweep.npy'))
+    args = parser.parse_args()
+
+    initial_conditions = list(itertools.product(parseRange(args.u0), parseRange(args.du0)))
+    results = sweepAB(parseRange(args.a), parseRange(args.b), initial_conditions, args.x0, args.xmax,
+                      args.h0, args.max_steps, args.eps, args.edge, max_workers=args.workers)
+    np.save(args.output, results)
+    print(f"Точек: {len(results)}, из них с ошибкой: {np.count_nonzero(results['status'] != SWEEP_OK)}. "
+          f"Результат сохранён в {args.output}")
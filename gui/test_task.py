@@ -11,8 +11,8 @@ import ctypes
 import platform
 import subprocess
 import pandas as pd
-from RK import l1_test
-from custom_loyauts import LatexRendererLayout, GraphLayout, IntNumberInput, FloatNumberInput, NumericalIntegrationParametersInput, ScalarStartConditions, XlimitsInput, NewWindow, ErrorDialog
+from RK import createSolver, defaultResultCache, RkStream, RkStats, NpyReaderMemmap, saveResultBundle, ResultBundle, BUNDLE_EXTENSION, ADAPTIVE_STEP_DOUBLING, SolverError
+from custom_loyauts import LatexRendererLayout, GraphLayout, IntNumberInput, FloatNumberInput, NumericalIntegrationParametersInput, ScalarStartConditions, XlimitsInput, NewWindow, ErrorDialog, CalculationRunner, CalculationProgressBar, CalculationCheckpoint, ResultTableDialog, PhaseTimings, TimingStatusBar
 
 # ... (остальные классы: CPPDynamicLibrary, CSVReaderPandas, l1_test,
 # GraphLayout, LatexRendererLayout, MatplotlibGraph, MatplolibLatexRenderer,
@@ -30,23 +30,22 @@ class RK4Calculator(Calculator):
     def __init__(self, rk_solver):
         self.rk_solver = rk_solver
 
-    def calculate(self, x0, u_x0, h0, x_end, amountOfSteps):
-        try:
-            self.rk_solver.rk_4(x0, u_x0, h0, x_end, amountOfSteps)
-        except Exception as e:
-            print(f"Ошибка во время вычислений RK4: {e}", file=sys.stderr)
-            ErrorDialog(f"Ошибка во время вычислений RK4: {e}").exec()
+    def calculate(self, x0, u_x0, h0, x_end, amountOfSteps, progress=None, checkpoint=None, stream=None, stats=None):
+        return self.rk_solver.rk_4(x0, u_x0, h0, x_end, amountOfSteps, progress=progress, checkpoint=checkpoint, stream=stream, stats=stats)
 
 class RK4AdaptiveCalculator(Calculator):
     def __init__(self, rk_solver):
         self.rk_solver = rk_solver
 
-    def calculate(self, x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps):
-        try:
-            self.rk_solver.rk4_adaptive(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps)
-        except Exception as e:
-            print(f"Ошибка во время вычислений RK4 Adaptive: {e}", file=sys.stderr)
-            ErrorDialog(f"Ошибка во время вычислений RK4 Adaptive: {e}").exec()
+    def calculate(self, x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps, method=ADAPTIVE_STEP_DOUBLING, progress=None, checkpoint=None, stream=None, stats=None):
+        return self.rk_solver.rk4_adaptive(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps, method=method, progress=progress, checkpoint=checkpoint, stream=stream, stats=stats)
+
+class RK4DenseCalculator(Calculator):
+    def __init__(self, rk_solver):
+        self.rk_solver = rk_solver
+
+    def calculate(self, x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps, x_eval, method=ADAPTIVE_STEP_DOUBLING, progress=None, checkpoint=None, stream=None, stats=None):
+        return self.rk_solver.rk4_adaptive_with_dense(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps, x_eval, method=method, progress=progress, checkpoint=checkpoint, stream=stream, stats=stats)
 
 # Класс для отображения графика
 class TestTaskPlotter:
@@ -75,6 +74,16 @@ class TestTaskPlotter:
             self.graph_layout.legend()
         self.graph_layout.draw()
 
+    # Численное решение во время расчёта: строки RkStream (x, v)
+    def startLive(self, keep=False):
+        self.graph_layout.startLive("Численное решение", keep)
+
+    def appendLive(self, rows):
+        self.graph_layout.appendLive(rows[:, 0], rows[:, 1])
+
+    def stopLive(self):
+        self.graph_layout.stopLive()
+
 # Класс для управления настройками
 class TestTaskSettingsManager:
     def __init__(self, settings_file, ui_elements):
@@ -82,11 +91,7 @@ class TestTaskSettingsManager:
         self.ui_elements = ui_elements
 
     def save_settings(self, df, filename):
-        # Сохранение DataFrame в CSV файл
-        csv_filename = filename + ".csv"
-        df.to_csv(csv_filename, sep=";", index=False, header=False)
-
-        # Сохранение настроек в JSON файл
+        # Настройки и результат сохраняются одним сжатым файлом .npz (см. saveResultBundle)
         settings = {
             "initialConditions": {
                 "X0": self.ui_elements["initialConditions"].X0Input.floatNumberLineEdit.text(),
@@ -100,32 +105,37 @@ class TestTaskSettingsManager:
                 "h0": self.ui_elements["numericalIntegrationParametersInput"].h0Input.floatNumberLineEdit.text(),
                 "controlLocalError": self.ui_elements["numericalIntegrationParametersInput"].controlLocalErrorCheckBox.isChecked(),
                 "epsilon": self.ui_elements["numericalIntegrationParametersInput"].epsilonInput.floatNumberLineEdit.text(),
-                "to_be_control_local_error": self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError()
+                "to_be_control_local_error": self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError(),
+                "adaptiveMethod": self.ui_elements["numericalIntegrationParametersInput"].getAdaptiveMethod(),
+                "densePoints": self.ui_elements["numericalIntegrationParametersInput"].densePointsInput.intNumberLineEdit.text()
             },
             "showNumericSolve": self.ui_elements["showNumericSolveCheckBox"].isChecked(),
             "showRealSolve": self.ui_elements["showRealSolveCheckBox"].isChecked(),
             "amountOfSteps": self.ui_elements["amountOfStepsInput"].intNumberLineEdit.text(),
-            "csv_filename": os.path.relpath(csv_filename, os.path.dirname(filename)),  # Относительный путь
             "task_number": 0
         }
 
-        json_filename = filename + ".json"
+        bundle_filename = filename + BUNDLE_EXTENSION
         try:
-            with open(json_filename, "w") as f:
-                json.dump(settings, f, indent=4)
-            print(f"Настройки сохранены в файлы {json_filename} и {csv_filename}")
+            saveResultBundle(bundle_filename, settings, df)
+            print(f"Настройки сохранены в файл {bundle_filename}")
         except Exception as e:
             print(f"Ошибка при сохранении настроек: {e}", file=sys.stderr)
             ErrorDialog(f"Ошибка при сохранении настроек: {e}").exec()
 
     def load_settings(self):
         filename, _ = QFileDialog.getOpenFileName(
-            None, "Загрузить настройки", "", "JSON files (*.json)"
+            None, "Загрузить настройки", "", "Сохранения (*.npz *.json)"
         )
         if filename:
             try:
-                with open(filename, "r") as f:
-                    settings = json.load(f)
+                if filename.endswith(BUNDLE_EXTENSION):
+                    # Читаются только настройки, столбцы результата распаковываются позже в load_dataframe
+                    with ResultBundle(filename) as bundle:
+                        settings = bundle.settings
+                else:
+                    with open(filename, "r") as f:
+                        settings = json.load(f)
 
                 if "task_number" not in settings or settings["task_number"] != 0:
                     print("Ошибка: Загруженный файл настроек не соответствует тестовой задаче.")
@@ -139,13 +149,21 @@ class TestTaskSettingsManager:
                 self.ui_elements["numericalIntegrationParametersInput"].h0Input.floatNumberLineEdit.setText(settings["numericalIntegrationParameters"]["h0"])
                 self.ui_elements["numericalIntegrationParametersInput"].controlLocalErrorCheckBox.setChecked(settings["numericalIntegrationParameters"]["controlLocalError"])
                 self.ui_elements["numericalIntegrationParametersInput"].epsilonInput.floatNumberLineEdit.setText(settings["numericalIntegrationParameters"]["epsilon"])
+                # В старых сохранениях способа оценки погрешности нет - удвоение шага
+                self.ui_elements["numericalIntegrationParametersInput"].setAdaptiveMethod(settings["numericalIntegrationParameters"].get("adaptiveMethod", ADAPTIVE_STEP_DOUBLING))
+                self.ui_elements["numericalIntegrationParametersInput"].densePointsInput.setIntNumber(settings["numericalIntegrationParameters"].get("densePoints", ""))
                 self.ui_elements["showNumericSolveCheckBox"].setChecked(settings["showNumericSolve"])
                 self.ui_elements["showRealSolveCheckBox"].setChecked(settings["showRealSolve"])
                 self.ui_elements["amountOfStepsInput"].intNumberLineEdit.setText(settings["amountOfSteps"])
                 self.ui_elements["numericalIntegrationParametersInput"].setChecked(settings["numericalIntegrationParameters"]["to_be_control_local_error"])
 
-                csv_filename = os.path.join(os.path.dirname(filename), settings["csv_filename"])
-                self.ui_elements["parent"].load_dataframe(csv_filename, self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError())
+                if filename.endswith(BUNDLE_EXTENSION):
+                    result_filename = filename
+                else:
+                    # Старые сохранения: JSON, а результат рядом в .npy (или в CSV у самых старых)
+                    result_filename = settings["npy_filename"] if "npy_filename" in settings else settings["csv_filename"]
+                    result_filename = os.path.join(os.path.dirname(filename), result_filename)
+                self.ui_elements["parent"].load_dataframe(result_filename, self.ui_elements["numericalIntegrationParametersInput"].isControlLocalError())
                 self.ui_elements["parent"].refreshPlot()  # Обновление графика после загрузки
 
                 print(f"Настройки загружены из файла {filename}")
@@ -155,48 +173,37 @@ class TestTaskSettingsManager:
 
 # Класс для создания отчета
 class ReportGenerator:
-    def __init__(self, df, xlimits_input):
+    def __init__(self, df, xlimits_input, stats=None):
         self.df = df
         self.xlimits_input = xlimits_input
+        # Статистику собирает решатель; по таблице она восстанавливается, только если расчёта не было (загрузка из файла)
+        self.stats = stats if stats is not None else self.statsFromTable()
 
     def generate_report(self):
+        stats = self.stats
         report = ""
-        amountOfIterations = len(self.df['x']) - 1
-        report += f"Количество итераций: {amountOfIterations} \n"
-        x = self.getColumnValues('x')
-        l = len(x)
-        difference_between_the_right_border_and_the_last_calculated_point = abs(
-            x[l - 1] - self.xlimits_input.getEndX())
-        report += f'разница между правой границей и последней вычисленной точки: {difference_between_the_right_border_and_the_last_calculated_point}\n'
+        report += f"Количество итераций: {stats.accepted} \n"
+        report += f'разница между правой границей и последней вычисленной точки: {stats.boundaryDistance}\n'
+        if stats.rhsEvaluations > 0:
+            report += f'Количество вычислений правой части: {stats.rhsEvaluations}\n'
         if 'e' in self.df.columns:  # Проверка наличия столбца 'e'
-            E = self.getColumnValues('e')
-            maxError = max(E)
-            max_error_index = E.index(maxError)
-            report += f'Максимальное значение ОЛП {maxError} при x = {x[max_error_index]}\n'
-            doubling = self.getColumnValues('c2')
-            countOfDoubling = sum(doubling)
-            report += f'Количество удвоений {countOfDoubling}\n'
-            doubling = self.getColumnValues('c1')
-            countOfDoubling = sum(doubling)
-            report += f'Количество делений {countOfDoubling}\n'
-            h = self.getColumnValues('h')
-            maxStep = max(h)
-            minStep = min(h)
-            xMinStep = h.index(minStep)
-            xMinStep = x[xMinStep]
-            xMaxStep = h.index(maxStep)
-            xMaxStep = x[xMaxStep]
-            report += f'максимальный шаг {maxStep} при x={xMaxStep}\n'
-            report += f'Минимальный шаг {minStep} при x={xMinStep}\n'
-            u = np.array(self.getColumnValues('u'), dtype=np.float64)
-            v = np.array(self.getColumnValues('v'), dtype=np.float64)
-            difference = np.abs(u - v)
-            maxDifference = np.max(difference)
-            report += f'Максимальная разница численного и реального решения {maxDifference}'
+            report += f'Максимальное значение ОЛП {stats.maxError} при x = {stats.maxErrorX}\n'
+            report += f'Количество удвоений {stats.doublings}\n'
+            report += f'Количество делений {stats.rejected}\n'
+            report += f'максимальный шаг {stats.maxH} при x={stats.maxHX}\n'
+            report += f'Минимальный шаг {stats.minH} при x={stats.minHX}\n'
+            report += f'Максимальная разница численного и реального решения {stats.maxReferenceError}'
         return report
 
+    def statsFromTable(self):
+        columns = self.df.columns
+        column = lambda name: self.getColumnValues(name) if name in columns else None
+        difference = np.abs(self.getColumnValues('u') - self.getColumnValues('v'))
+        return RkStats.fromTable(self.getColumnValues('x'), self.xlimits_input.getEndX(), column('h'), column('e'),
+                                 column('c1'), column('c2'), difference)
+
     def getColumnValues(self, column):
-        return pd.to_numeric(self.df[column][1:], errors='coerce').dropna().tolist()
+        return self.df[column].to_numpy(dtype=np.float64)
 
 # Класс для создания UI элементов
 class TestTaskUI:
@@ -208,6 +215,8 @@ class TestTaskUI:
         self.show_numeric_solve_checkbox = None
         self.show_real_solve_checkbox = None
         self.amount_of_steps_input = None
+        self.calculate_button = None
+        self.calculation_progress_bar = None
         self.graph_layout = None
 
     def setup_ui(self):
@@ -220,6 +229,7 @@ class TestTaskUI:
         self._add_amount_of_steps_input()
         self._add_graph_layout()
         self._add_buttons()
+        self._add_status_bar()
 
     def _add_task_description(self):
         test_task_layout = LatexRendererLayout()
@@ -240,16 +250,18 @@ class TestTaskUI:
         self.main_layout.addLayout(self.numerical_integration_parameters_input)
 
     def _add_calculate_button(self):
-        calculate_button = QPushButton()
-        calculate_button.setText("Начать вычисления")
-        self.main_layout.addWidget(calculate_button)
-        calculate_button.clicked.connect(self.parent().calculateClick)  # Вызов метода calculateClick родительского класса
+        self.calculate_button = QPushButton()
+        self.calculate_button.setText("Начать вычисления")
+        self.main_layout.addWidget(self.calculate_button)
+        self.calculation_progress_bar = CalculationProgressBar()
+        self.main_layout.addWidget(self.calculation_progress_bar)
+        self.calculate_button.clicked.connect(self.parent().calculateClick)  # Вызов метода calculateClick родительского класса
 
     def _add_checkboxes(self):
         self.show_numeric_solve_checkbox = QCheckBox("Показать численное решение")
         self.show_real_solve_checkbox = QCheckBox("Показать аналитическое решение")
-        self.show_numeric_solve_checkbox.checkStateChanged.connect(self.parent().refreshPlot)
-        self.show_real_solve_checkbox.checkStateChanged.connect(self.parent().refreshPlot)
+        self.show_numeric_solve_checkbox.checkStateChanged.connect(self.parent().replot)
+        self.show_real_solve_checkbox.checkStateChanged.connect(self.parent().replot)
         self.main_layout.addWidget(self.show_numeric_solve_checkbox)
         self.main_layout.addWidget(self.show_real_solve_checkbox)
 
@@ -283,6 +295,10 @@ class TestTaskUI:
 
         self.main_layout.addLayout(about_layout)
 
+    def _add_status_bar(self):
+        self.status_bar = TimingStatusBar()
+        self.main_layout.addWidget(self.status_bar)
+
     def parent(self):
         return self.main_layout.parent()
 
@@ -292,17 +308,25 @@ class TabTestTask(QWidget):
         self.main_layout = QVBoxLayout()
         self.setLayout(self.main_layout)
 
-        self.RK = l1_test()
+        self.RK = createSolver("l1_test", cache=defaultResultCache(), wait_for_build=False)
         self.settings_file = "test_task"  # Базовое имя файла без расширения
         self.df = None  # Переменная для хранения DataFrame
+        self.dfDense = None  # Плотный вывод для графика (None - график по узлам сетки)
+        self.stats = None  # Статистика решателя для справки (RkStats; None - собирается по таблице)
+        self.checkpoint = CalculationCheckpoint()  # Продолжение расчёта при увеличении конечного X
         self.to_be_control_local_error = False
+        self.timings = PhaseTimings(self.settings_file, 'calculation')  # Время этапов последней операции (строка состояния)
 
         self.rk4_calculator = RK4Calculator(self.RK)
         self.rk4_adaptive_calculator = RK4AdaptiveCalculator(self.RK)
+        self.rk4_dense_calculator = RK4DenseCalculator(self.RK)
 
         self.ui = TestTaskUI(self.main_layout)
         self.ui.setup_ui()
+        self.calculation = CalculationRunner(self.ui.calculate_button, self.onCalculationFinished, self.onCalculationFailed,
+                                             self.ui.calculation_progress_bar, self.onCalculationStream)
         self.plotter = TestTaskPlotter(self.ui.graph_layout, self.ui.show_numeric_solve_checkbox, self.ui.show_real_solve_checkbox)
+        self.ui.graph_layout.canvas.onRendered = self.onPlotRendered
         self.settings_manager = TestTaskSettingsManager(self.settings_file, {
             "initialConditions": self.ui.initial_conditions,
             "xlimitsInput": self.ui.xlimits_input,
@@ -315,11 +339,47 @@ class TabTestTask(QWidget):
         #self.loadSettings()  # Загрузка настроек после создания UI
 
     def calculateClick(self):
-        # ... (код для получения параметров из UI)
+        if self.calculation.isRunning():
+            self.calculation.cancel()
+            return
         if self._validate_input():
-            self._perform_calculation()
-            self.tryLoadResult(self.to_be_control_local_error)
-            self.refreshPlot()
+            # Принятые точки основного расчёта по ходу вычислений рисуются на графике
+            stream = RkStream(2)
+            calculate = self._prepare_calculation(stream)
+            self.plotter.startLive(self.checkpoint.resuming)
+            self.calculation.submit(calculate, self.ui.initial_conditions.getX0(), self.ui.xlimits_input.getEndX(), stream)
+
+    def onCalculationStream(self, rows):
+        if rows is None:
+            self.plotter.stopLive()
+        else:
+            self.plotter.appendLive(rows)
+
+    def onCalculationFinished(self, output):
+        result, adaptive, dense, stats = output
+        previous, previousDense, previousStats = self.df, self.dfDense, self.stats
+        self.to_be_control_local_error = adaptive
+        self.stats = stats
+        self.tryLoadResult(result, adaptive)
+        self.dfDense = None if dense is None else pd.DataFrame(dense[1], columns=['x', 'v', 'u'], copy=False)
+        if self.checkpoint.commit():
+            # Продолжение расчёта: новые строки дописываются к прежним
+            with self.timings.phase('dataframe'):
+                self.df = pd.concat([previous, self.df], ignore_index=True)
+                if previousDense is not None and self.dfDense is not None:
+                    self.dfDense = pd.concat([previousDense, self.dfDense], ignore_index=True)
+            self.stats = None if previousStats is None or stats is None else previousStats.merged(stats)
+        self.refreshPlot()
+        self.ui.status_bar.showTimings(self.timings)
+
+    def onCalculationFailed(self, error):
+        if isinstance(error, SolverError) and error.values is not None and len(error.values) > 0:
+            # Строки, посчитанные до ошибки решателя, показываются как результат расчёта
+            adaptive = error.values.shape[1] == len(self.RK.HEADERS_RK4_ADAPTIVE)
+            self.onCalculationFinished(((error.headers, error.values), adaptive, None, None))
+            self.show_error(f"Расчёт остановлен: {error}. Показаны строки, посчитанные до ошибки: {len(error.values)}.")
+            return
+        self.show_error(f"Ошибка во время вычислений: {error}")
 
     def _validate_input(self):
         # ... (код для валидации входных данных)
@@ -347,28 +407,61 @@ class TabTestTask(QWidget):
 
         return True  # Возвращаем True, если все данные валидны
 
-    def _perform_calculation(self):
-        # ... (код для выполнения вычислений)
+    def _prepare_calculation(self, stream=None):
+        """
+        Считывает параметры с формы (в потоке интерфейса) и возвращает функцию расчёта calculate(progress) для CalculationRunner.
+        stream (RkStream) получает точки основного расчёта, плотный вывод в него не пишется.
+        Функция возвращает (результат, адаптивный ли расчёт, плотный вывод для графика или None, статистика расчёта).
+        """
+        parameters = self.ui.numerical_integration_parameters_input
         x_end = self.ui.xlimits_input.getEndX()
         x0 = self.ui.initial_conditions.getX0()
         u_x0 = self.ui.initial_conditions.getUX0()
         epsilon_border = self.ui.xlimits_input.getEndEpsilon()
         amountOfSteps = self.ui.amount_of_steps_input.getIntNumber()
-        h0 = self.ui.numerical_integration_parameters_input.getStartStep()
-        local_error = self.ui.numerical_integration_parameters_input.getEpsilonLocalError()
-        self.to_be_control_local_error = self.ui.numerical_integration_parameters_input.isControlLocalError()
-
-        try:
-            if self.to_be_control_local_error:
-                self.rk4_adaptive_calculator.calculate(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps)
-            else:
-                self.rk4_calculator.calculate(x0, u_x0, h0, x_end, amountOfSteps)
-        except Exception as e:
-            self.show_error(f"Ошибка во время вычислений: {e}")
+        h0 = parameters.getStartStep()
+        local_error = parameters.getEpsilonLocalError()
+        adaptive = parameters.isControlLocalError()
+        method = parameters.getAdaptiveMethod()
+        dense_points = parameters.getDensePoints()
+        # Если изменилось только конечное X, расчёт продолжается с достигнутой точки
+        checkpoint = self.checkpoint.prepare((x0, u_x0, epsilon_border, amountOfSteps, h0, local_error, adaptive, method, dense_points), x_end)
+        timings = self.timings = PhaseTimings(self.settings_file, 'calculation')
+
+        def calculate(progress):
+            stats = RkStats()
+            if not adaptive:
+                with timings.phase('solve'):
+                    result = self.rk4_calculator.calculate(x0, u_x0, h0, x_end, amountOfSteps, progress, checkpoint, stream, stats)
+                return result, adaptive, None, stats
+            with timings.phase('solve'):
+                if dense_points > 0:
+                    # Плотный вывод для графика: решение того же расчёта в равномерно расположенных точках отрезка
+                    result, dense = self.rk4_dense_calculator.calculate(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps,
+                                                                        np.linspace(x0, x_end, dense_points), method, progress, checkpoint, stream, stats)
+                else:
+                    result = self.rk4_adaptive_calculator.calculate(x0, u_x0, h0, x_end, local_error, epsilon_border, amountOfSteps, method, progress, checkpoint, stream, stats)
+                    dense = None
+            return result, adaptive, dense, stats
+        return calculate
 
     def refreshPlot(self):
         if self.df is not None:
-            self.plotter.plot(self.getColumnValues(self.df, 'x'), self.getColumnValues(self.df, 'v'), self.getColumnValues(self.df, 'u'))
+            df = self.dfDense if self.dfDense is not None else self.df
+            x, v, u = self.getColumnValues(df, 'x'), self.getColumnValues(df, 'v'), self.getColumnValues(df, 'u')
+            with self.timings.phase('plot'):
+                self.plotter.plot(x, v, u)
+            self.timings.expectRender()
+
+    def replot(self):
+        # Перерисовка по флажкам - отдельная операция в строке состояния
+        self.timings = PhaseTimings(self.settings_file, 'redraw')
+        self.refreshPlot()
+        self.ui.status_bar.showTimings(self.timings)
+
+    def onPlotRendered(self, seconds):
+        if self.timings.rendered(seconds):
+            self.ui.status_bar.showTimings(self.timings)
 
     def closeEvent(self, event):
         self.saveSettings()
@@ -379,27 +472,7 @@ class TabTestTask(QWidget):
             self.show_error("Ошибка: Сначала необходимо выполнить вычисления.")
             return
 
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Таблица результатов")
-        layout = QVBoxLayout(dialog)
-        table = QTableWidget()
-        layout.addWidget(table)
-
-        if self.ui.numerical_integration_parameters_input.isControlLocalError():
-            self.columns = ['x', 'v', 'v2i', 'v-v2i', 'e', 'h', 'c1', 'c2', 'u', '|ui-vi|']
-        else:
-            self.columns = ['x', 'v', 'u']
-
-        table.setColumnCount(len(self.columns))
-        table.setRowCount(len(self.df))
-        table.setHorizontalHeaderLabels(self.columns)
-        self.data = self.df.values.tolist()[1:]
-        for row, data_row in enumerate(self.data):
-            for col, value in enumerate(data_row):
-                if col < len(self.columns):  # Проверка на выход за пределы списка columns
-                    item = QTableWidgetItem(str(value))
-                    table.setItem(row, col, item)
-
+        dialog = ResultTableDialog(self.df, self)
         dialog.exec()
 
     def referenceButtonClick(self):
@@ -408,7 +481,7 @@ class TabTestTask(QWidget):
             return
 
         try:
-            report_generator = ReportGenerator(self.df, self.ui.xlimits_input)
+            report_generator = ReportGenerator(self.df, self.ui.xlimits_input, self.stats)
             report = report_generator.generate_report()
 
             window = NewWindow('Справка', report)
@@ -417,47 +490,65 @@ class TabTestTask(QWidget):
         except Exception as e:
             self.show_error(f"Ошибка во время анализа: {e}")
 
-    def tryLoadResult(self, to_be_control_local_error):
+    def tryLoadResult(self, result, to_be_control_local_error):
+        if result is None:
+            return
         try:
-            current_file_path = os.path.abspath(__file__)
-            current_dir = os.path.dirname(current_file_path)
-            current_dir = os.path.join(current_dir, "..") 
-            current_dir = os.path.join(current_dir, "output")
-            file_path = os.path.join(current_dir, "output_test.csv")
-            if to_be_control_local_error:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None,
-                                 names=['x', 'v', 'v2i', 'v-v2i', 'e', 'h', 'c1', 'c2', 'u', '|ui-vi|'])
-            else:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None, names=['x', 'v', 'u'])
+            headers, values = result
+            with self.timings.phase('dataframe'):
+                if to_be_control_local_error:
+                    self.df = pd.DataFrame(values, columns=['x', 'v', 'v2i', 'v-v2i', 'e', 'h', 'c1', 'c2', 'u', '|ui-vi|'], copy=False)
+                else:
+                    self.df = pd.DataFrame(values, columns=['x', 'v', 'u'], copy=False)
         except Exception as e:
             self.show_error(f"Ошибка во время загрузки: {e}")
 
     def getColumnValues(self, df, column):
-        return pd.to_numeric(df[column][1:], errors='coerce').dropna().tolist()
+        with self.timings.phase('columns'):
+            return df[column].to_numpy(dtype=np.float64)
 
     def saveSettings(self):
         if self.df is not None:
-            filename, _ = QFileDialog.getSaveFileName(None, "Сохранить настройки", self.settings_file, "JSON files (*.json)")
+            filename, _ = QFileDialog.getSaveFileName(None, "Сохранить настройки", self.settings_file, "Сохранения (*.npz)")
             if filename:
-                self.settings_manager.save_settings(self.df, filename[:-5])  # Сохранение DataFrame и настроек
+                self.timings = PhaseTimings(self.settings_file, 'save')
+                with self.timings.phase('write'):
+                    self.settings_manager.save_settings(self.df, os.path.splitext(filename)[0])  # Сохранение DataFrame и настроек
+                self.ui.status_bar.showTimings(self.timings)
 
     def loadSettings(self):
+        if self.calculation.isRunning():
+            self.calculation.cancel()  # Иначе результат расчёта заменит загруженный
+        self.dfDense = None
+        self.stats = None
+        self.checkpoint.reset()
+        timings = self.timings
         self.settings_manager.load_settings()
+        if self.timings is not timings:
+            self.ui.status_bar.showTimings(self.timings)    # Загрузка результата (load_dataframe) и его график
         self.to_be_control_local_error = self.ui.numerical_integration_parameters_input.isControlLocalError()
 
     def load_dataframe(self, csv_filename, control_local_error):
-        """Загружает DataFrame из CSV файла в зависимости от control_local_error."""
+        """Загружает DataFrame из сохранения .npz или файла .npy (имена столбцов хранятся в файле) или из CSV в зависимости от control_local_error."""
         current_file_path = os.path.abspath(__file__)
         current_dir = os.path.dirname(current_file_path)
         current_dir = os.path.join(current_dir, "..") 
         current_dir = os.path.join(current_dir, "output")
         file_path = os.path.join(current_dir, csv_filename)
+        self.timings = PhaseTimings(self.settings_file, 'load')
         try:
-            if control_local_error:
-                self.df = pd.read_csv(file_path, delimiter=";", header=None, low_memory=False,
-                                       names=['x', 'v', 'v2i', 'v-v2i', 'e', 'h', 'c1', 'c2', 'u', '|ui-vi|'])
-            else:
-                self.df = pd.read_csv(file_path, delimiter=";", low_memory=False, header=None, names=['x', 'v', 'u'])
+            with self.timings.phase('read'):
+                if file_path.endswith(BUNDLE_EXTENSION):
+                    with ResultBundle(file_path) as bundle:
+                        self.df = bundle.readAsDataFrame()
+                elif file_path.endswith(".npy"):
+                    headers, values = NpyReaderMemmap(file_path).readAsNumpy()
+                    self.df = pd.DataFrame(values, columns=headers, copy=False)
+                elif control_local_error:
+                    self.df = pd.read_csv(file_path, delimiter=";", header=0, low_memory=False,
+                                           names=['x', 'v', 'v2i', 'v-v2i', 'e', 'h', 'c1', 'c2', 'u', '|ui-vi|'])
+                else:
+                    self.df = pd.read_csv(file_path, delimiter=";", low_memory=False, header=0, names=['x', 'v', 'u'])
         except Exception as e:
             self.show_error(f"Ошибка при загрузке DataFrame: {e}")
 
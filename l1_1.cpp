@@ -6,6 +6,10 @@
 #include <filesystem>
 
 #include <cfloat> // Для DBL_MAX
+#include <vector>
+
+#include "rk_output.h"
+#include "rk_problems.h"
 
 #ifdef _WIN32
 #include <Windows.h>
@@ -47,134 +51,304 @@ EXPORT std::filesystem::path getThisLibraryPath() {
 
 
 
+// Формат файла результата (OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY) в текущем потоке: как и rkProgress,
+// свой у каждого потока, поэтому параллельные расчёты не подменяют друг другу формат
+static thread_local int outputFormat = OUTPUT_FORMAT_CSV;
+
+extern "C" EXPORT
+void setOutputFormat(int format) {
+    outputFormat = format;
+}
+
+// Прореживание вывода для решателей с записью в файл и в буфер (кроме плотного вывода и ансамблей):
+// каждая every-я строка или первые строки с x >= points[i], не больше maxRows строк (0 - без ограничения).
+// setOutputSampling(1, 0, nullptr, 0) отключает прореживание. Точки копируются. Задаётся для текущего потока.
+static thread_local OutputSampling outputSampling;
+
+extern "C" EXPORT
+void setOutputSampling(int every, int maxRows, const double* points, int pointCount) {
+    outputSampling.set(every, maxRows, points, pointCount);
+}
+
+// Ход расчёта в текущем потоке (RkProgress из rk_core.h): обновляется решателями этой библиотеки,
+// cancel != 0 останавливает расчёт. nullptr - не отслеживать.
+extern "C" EXPORT
+void setProgress(RkProgress* progress) {
+    rkProgress = progress;
+}
+
+// Состояние для продолжения расчёта (RkCheckpoint из rk_core.h) в текущем потоке: его сохраняют и продолжают
+// решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей). nullptr - не сохранять.
+extern "C" EXPORT
+void setCheckpoint(RkCheckpoint* checkpoint) {
+    rkCheckpoint = checkpoint;
+}
+
+// Поток точек для графика (RkStream из rk_core.h) в текущем потоке: в него пишут решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не передавать.
+extern "C" EXPORT
+void setStream(RkStream* stream) {
+    rkStream = stream;
+}
+
+// Статистика расчёта (RkStats из rk_core.h) в текущем потоке: её заполняют решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не собирать.
+extern "C" EXPORT
+void setStats(RkStats* stats) {
+    rkStats = stats;
+}
+
+// Код завершения последнего вызова решателя в текущем потоке: RK_OK или RK_ERROR_* из rk_core.h.
+// Решатели с записью в файл возвращают его же, с выводом в буфер - количество строк, посчитанных до ошибки.
+extern "C" EXPORT
+int rkLastStatus() {
+    return rkStatus;
+}
+
 // Формируем абсолютный путь к output
 EXPORT std::string getOutputPath() {
     std::filesystem::path executablePath = getThisLibraryPath();
-    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / "output_1.csv";
+    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / (std::string("output_1") + outputExtension(outputFormat));
     return outputPath.string();
 }
 
+// Правая часть задачи (main1Rhs из rk_problems.h), вызов встраивается в цикл решателя
+static const StaticRhs<main1Rhs> rhs{};
+
+
+// Метод Рунге-Кутта четвертого порядка (один шаг). При переполнении возвращает неконечное значение,
+// код ошибки - в rkLastStatus.
 extern "C" EXPORT
-    double f(const double &x, const double &y)
+    double RK_4_Step(const double &x, const double &y,const double &h)
     {
-        return pow(y, 2)*x / ( 1+pow(x, 2) ) + y - pow(y, 3)*std::sin(10 * x);
+        RkWorkspace ws(1);
+        double y_next;
+        rk4Step(rhs, nullptr, x, &y, h, &y_next, ws);
+        rkStatus = stateStatus(&y_next, 1);
+        return y_next;
     }
 
 
-// Метод Рунге-Кутта четвертого порядка
-extern "C" EXPORT
-    double RK_4_Step(const double &x, const double &y,const double &h)
+// Метод Рунге-Кутта 4-го порядка с постоянным шагом, строки результата уходят в output
+template <class Writer>
+    int RK_4_run(double x0, double y0, double h, double xmax, int maxSteps, Writer& output)
     {
-        double k1 = h * f(x, y);
-        double k2 = h * f(x + h / 2, y + k1 / 2);
-        double k3 = h * f(x + h / 2, y + k2 / 2);
-        double k4 = h * f(x + h, y + k3);
+        return rkGuard([&] {
+            rk4Run(rhs, nullptr, 1, x0, &y0, h, xmax, maxSteps, [&](double x, const double* y) {
+                output.row({x, y[0]});
+            });
+        });
+    }
 
-        double y_next = y + (k1 + 2 * k2 + 2 * k3 + k4) / 6;
 
-        if (std::isinf(y_next) || std::isnan(y_next) || std::fabs(y_next) > DBL_MAX) { 
-            throw std::overflow_error("Value is NaN. | Value is infinite. | Value exceeds the maximum representable double.");
-        }
+// method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (столбец v2i - контрольное решение).
+// Плотный вывод того же расчёта в точках xEval (evalCount штук, можно 0) пишется в dense, столбцы как у RK_4.
+template <class Writer, class DenseWriter>
+    int RK_4_adaptive_run(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, Writer& output,
+                          const double* xEval, int evalCount, DenseWriter& dense)
+    {
+        return rkGuard([&] {
+            adaptiveDenseRun(method, rhs, nullptr, 1, x0, &y0, h0, xmax, Nmax, eps, eps_out, false, xEval, evalCount, [&](const AdaptivePoint& point) {
+                double v = point.y[0];
+                double v2 = point.yHalf[0];
+                output.row({point.x, v, v2, v-v2, point.E, point.h, double(point.c1), double(point.c2)});
+            }, [&](double x, const double* y) {
+                dense.row({x, y[0]});
+            });
+        });
+    }
 
-        return y_next;
+template <class Writer>
+    int RK_4_adaptive_run(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, Writer& output)
+    {
+        BufferRowWriter noDense(nullptr, 0, 2);
+        return RK_4_adaptive_run(method, x0, y0, h0, xmax, eps, eps_out, Nmax, output, nullptr, 0, noDense);
     }
 
 
 extern "C" EXPORT
     int RK_4(double x0, double y0, double h, double xmax, int maxSteps)
     {
-        int steps = 0;
-        double x = x0;
-        double y = y0;
-        std::ofstream output(getOutputPath().c_str());
+        return writeResultFile(outputFormat, getOutputPath(), "xi;vi", [&](auto& output) {   // Заголовок CSV
+            return writeSampled(output, outputSampling, [&](auto& sampled) {
+                return RK_4_run(x0, y0, h, xmax, maxSteps, sampled);
+            });
+        });
+    }
 
-        output << "xi;vi" << std::endl;   // Заголовок CSV
-        while (x+h <= xmax && steps < maxSteps) {
 
-            y = RK_4_Step(x, y, h);
-            x = x + h;  //Увеличиваем шаг перед выводом, т.к. метод Р.К. считает значение в следующей точке
+extern "C" EXPORT
+    int RK_4_adaptive(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax)
+    {
+        return writeResultFile(outputFormat, getOutputPath(), "xi;vi;v2i;vi-v2i;E;hi;c1;c2", [&](auto& output) { // Заголовок CSV
+            return writeSampled(output, outputSampling, [&](auto& sampled) {
+                return RK_4_adaptive_run(ADAPTIVE_STEP_DOUBLING, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+            });
+        });
+    }
 
-            output << x << ";" << y << std::endl;
 
-            ++steps;
-        }
-        return 0;
+// Контроль погрешности вложенной парой Дормана-Принса 5(4), столбцы как у RK_4_adaptive
+extern "C" EXPORT
+    int DP_45_adaptive(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax)
+    {
+        return writeResultFile(outputFormat, getOutputPath(), "xi;vi;v2i;vi-v2i;E;hi;c1;c2", [&](auto& output) { // Заголовок CSV
+            return writeSampled(output, outputSampling, [&](auto& sampled) {
+                return RK_4_adaptive_run(ADAPTIVE_DORMAND_PRINCE, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+            });
+        });
     }
 
 
+// Те же решатели, но без записи на диск: строки (2 столбца для RK_4,
+// 8 для RK_4_adaptive и DP_45_adaptive) пишутся в массив out вызывающей стороны.
+// Для RK_4 достаточно capacity = maxSteps, для RK_4_adaptive и DP_45_adaptive - Nmax + 1.
+// Возвращают количество записанных строк; при ошибке решателя - посчитанных до неё (код в rkLastStatus).
 extern "C" EXPORT
-    int RK_4_adaptive(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax)
+    int RK_4_buffer(double x0, double y0, double h, double xmax, int maxSteps, double* out, int capacity)
+    {
+        BufferRowWriter output(out, capacity, 2);
+        writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_run(x0, y0, h, xmax, maxSteps, sampled);
+        });
+        return output.rows();
+    }
+
+
+extern "C" EXPORT
+    int RK_4_adaptive_buffer(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity)
     {
+        BufferRowWriter output(out, capacity, 8);
+        writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_adaptive_run(ADAPTIVE_STEP_DOUBLING, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+        });
+        return output.rows();
+    }
+
+
+extern "C" EXPORT
+    int DP_45_adaptive_buffer(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity)
+    {
+        BufferRowWriter output(out, capacity, 8);
+        writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_adaptive_run(ADAPTIVE_DORMAND_PRINCE, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+        });
+        return output.rows();
+    }
+
+
+// Плотный вывод адаптивного метода (method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE):
+// решение в точках xEval (по возрастанию), столбцы как у RK_4: xi, vi. Достаточно capacity = evalCount.
+extern "C" EXPORT
+    int RK_4_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax,
+                          const double* xEval, int evalCount, double* out, int capacity)
+    {
+        BufferRowWriter output(out, capacity, 2);
+        rkGuard([&] {
+            denseAdaptiveRun(method, rhs, nullptr, 1, x0, &y0, h0, xmax, Nmax, eps, eps_out, false, xEval, evalCount, [&](double x, const double* y) {
+                output.row({x, y[0]});
+            });
+        });
+        return output.rows();
+    }
+
+
+// Адаптивный метод и его плотный вывод за один расчёт: строки таблицы (как у RK_4_adaptive_buffer) - в out,
+// решение в точках xEval (как у RK_4_dense_buffer) - в dense, их количество - в *denseRows.
+// Достаточно capacity = Nmax + 1, denseCapacity = evalCount. Возвращает количество строк таблицы.
+extern "C" EXPORT
+    int RK_4_adaptive_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity,
+                                   const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows)
+    {
+        BufferRowWriter output(out, capacity, 8);
+        BufferRowWriter denseOutput(dense, denseCapacity, 2);
+        writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_adaptive_run(method, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled, xEval, evalCount, denseOutput);
+        });
+        *denseRows = denseOutput.rows();
+        return output.rows();
+    }
+
+
+// Ансамбль траекторий: n начальных условий y[0..n-1] в одной точке x0.
+// Состояния хранятся структурой массивов, а множители при y в f зависят только от x
+// и на постоянном шаге общие для всех траекторий, поэтому внутренний цикл по
+// траекториям - чистая арифметика и векторизуется компилятором.
+// Переполнение одной траектории не прерывает расчёт: в ней просто появятся inf/nan.
+
+// f(x, y) = A(x)*y^2 + y - S(x)*y^3
+static inline double fBatch(double A, double S, double y)
+{
+    return y * y * A + y - y * y * y * S;
+}
+
+// Метод Рунге-Кутта 4-го порядка с постоянным шагом для n траекторий.
+// y - начальные значения, на выходе - значения в последней точке.
+// out (может быть NULL) - строки по n + 1 значению: x, затем y всех траекторий;
+// достаточно capacity = maxSteps. Возвращает количество сделанных шагов.
+extern "C" EXPORT
+    int RK_4_batch(double x0, double* y, int n, double h, double xmax, int maxSteps, double* out, int capacity)
+    {
+        int steps = 0;
         double x = x0;
-        double y = y0;
-        double h = h0;
-        double y1;
-        double y2;
-        int c1 = 0;
-        int c2 = 0;
-        int step = 0;
-        double error = 0.;
-        int p = 4;
-
-        std::ofstream output(getOutputPath().c_str());
-
-        output << "xi;vi;v2i;vi-v2i;E;hi;c1;c2" << std::endl; // Заголовок CSV
-        
-        while ((x + h) <= xmax && std::abs(x + h - xmax)>eps_out && step < Nmax)
-        {
-            
-            // Делаем шаг методом Рунге-Кутта с h и два шага с h/2
-            y1 = RK_4_Step(x, y, h);
-            y2 = RK_4_Step(x, y, h / 2.);
-            y2 = RK_4_Step(x + h / 2., y2, h / 2.);
-
-            // Вычисляем оценку локальной погрешности
-            error = (std::abs(y1 - y2))/(pow(2., p) - 1.);     //2^p-1 - знаменатель в формуле вычисления О.Л.П
-            // Проверяем, соответствует ли оценка погрешности заданной точности
-            if (error > eps)
-            {
-                h=h/2.;
-                ++step;
-                c1 += 1;        
-            }
-            else if(error < eps / pow(2, p + 1))     //2^(p+1)
-            {
-                y = y1;
-                x += h;     //Увеличиваем шаг перед выводом, т.к. метод Р.К. считает значение в следующей точке
-                c2++;
-
-                //2^p
-                output << x << ";" << y << ";" << y2 << ";" << y-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << std::endl;
-                h*=2;
-                ++step;
+
+        while (x+h <= xmax && steps < maxSteps) {
+            double A1 = x / (1 + x * x);
+            double S1 = std::sin(10 * x);
+            double xm = x + h / 2;
+            double Am = xm / (1 + xm * xm);
+            double Sm = std::sin(10 * xm);
+            double xe = x + h;
+            double A4 = xe / (1 + xe * xe);
+            double S4 = std::sin(10 * xe);
+
+            for (int i = 0; i < n; ++i) {
+                double yi = y[i];
+                double k1 = h * fBatch(A1, S1, yi);
+                double k2 = h * fBatch(Am, Sm, yi + k1 / 2);
+                double k3 = h * fBatch(Am, Sm, yi + k2 / 2);
+                double k4 = h * fBatch(A4, S4, yi + k3);
+                y[i] = yi + (k1 + 2 * k2 + 2 * k3 + k4) / 6;
             }
-            else
-            {
-                y = y1;
-                x += h;
-
-                //2^p
-                output << x << ";" << y << ";" << y2 << ";" << y-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << std::endl;
-                ++step;
+            x = xe;
+
+            if (out != nullptr && steps < capacity) {
+                double* row = out + static_cast<long long>(steps) * (n + 1);
+                row[0] = x;
+                for (int i = 0; i < n; ++i) {
+                    row[i + 1] = y[i];
+                }
             }
+            ++steps;
         }
+        return steps;
+    }
 
-        if (x + h > xmax)
-        {
-            h = xmax - x;
-            //++c1;
-            // Делаем шаг методом Рунге-Кутта с h и два шага с h/2
-            y1 = RK_4_Step(x, y, h); //
-            y2 = RK_4_Step(x, y, h / 2);
-            y2 = RK_4_Step(x + h / 2, y2, h / 2);
-
-            output << x+h << ";" << y1 << ";" << y2 << ";" << y1-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << std::endl;
 
+// Метод Рунге-Кутта 4-го порядка с контролем локальной погрешности для n траекторий (rk4AdaptiveBatchRun из rk_core.h).
+// У каждой траектории свои x, h и счётчики, логика шага как в RK_4_adaptive; траектории
+// продвигаются одновременно, пока не закончатся все.
+// y - начальные значения; out - n строк по 7 значений (конечное состояние):
+// x, v, h, c1, c2, количество шагов, код завершения (RK_OK или RK_ERROR_*: траектория с ошибкой
+// остановлена в последней принятой точке). Возвращает количество итераций общего цикла.
+extern "C" EXPORT
+    int RK_4_adaptive_batch(double x0, double* y, int n, double h0, double xmax, double eps, double eps_out, int Nmax, double* out)
+    {
+        AdaptiveLanes lanes(n, x0, h0);
+        double* const components[] = {y};
+        int iterations = rk4AdaptiveBatchRun(rhs, nullptr, 1, n, components, xmax, Nmax, eps, eps_out, false, lanes);
+
+        for (int i = 0; i < n; ++i) {
+            double* row = out + static_cast<long long>(i) * 7;
+            row[0] = lanes.x[i];
+            row[1] = y[i];
+            row[2] = lanes.h[i];
+            row[3] = lanes.c1[i];
+            row[4] = lanes.c2[i];
+            row[5] = lanes.steps[i];
+            row[6] = lanes.status[i];
         }
-
-
-        output.close();
-    return 0;
+        return iterations;
     }
 
 
@@ -189,7 +363,7 @@ int main()
     double edge = 1e-6;
     int maxSteps = 10000;         // Максимальное количество шагов
 
-    //RK_4_adaptive(x0, y0, h0, xmax, tolerance, edge,maxSteps);
+    RK_4_adaptive(x0, y0, h0, xmax, tolerance, edge, maxSteps);
     //RK_4(x0, y0, h0, xmax, maxSteps);
 
     return 0;
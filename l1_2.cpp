@@ -6,6 +6,10 @@
 #include <filesystem>
 
 #include <cfloat> // Для DBL_MAX
+#include <vector>
+
+#include "rk_output.h"
+#include "rk_problems.h"
 
 #ifdef _WIN32
 #include <Windows.h>
@@ -47,192 +51,302 @@ EXPORT std::filesystem::path getThisLibraryPath() {
 
 
 
-// Формируем абсолютный путь к output
-EXPORT std::string getOutputPath() {
-    std::filesystem::path executablePath = getThisLibraryPath();
-    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / "output_2.csv";
-    return outputPath.string();
+// Формат файла результата (OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY) в текущем потоке: как и rkProgress,
+// свой у каждого потока, поэтому параллельные расчёты не подменяют друг другу формат
+static thread_local int outputFormat = OUTPUT_FORMAT_CSV;
+
+extern "C" EXPORT
+void setOutputFormat(int format) {
+    outputFormat = format;
 }
 
-#define OUT_PATH getOutputPath().c_str()
+// Прореживание вывода для решателей с записью в файл и в буфер (кроме плотного вывода и ансамблей):
+// каждая every-я строка или первые строки с x >= points[i], не больше maxRows строк (0 - без ограничения).
+// setOutputSampling(1, 0, nullptr, 0) отключает прореживание. Точки копируются. Задаётся для текущего потока.
+static thread_local OutputSampling outputSampling;
 
-// Определение функций правой части системы
 extern "C" EXPORT
-double f1(double x, double y1, double y2, double a, double b) {
-    return y2;
+void setOutputSampling(int every, int maxRows, const double* points, int pointCount) {
+    outputSampling.set(every, maxRows, points, pointCount);
 }
 
+// Ход расчёта в текущем потоке (RkProgress из rk_core.h): обновляется решателями этой библиотеки,
+// cancel != 0 останавливает расчёт. nullptr - не отслеживать.
 extern "C" EXPORT
-double f2(double x, double y1, double y2, double a, double b) {
-    return -a*y2 + b*sin(y1);
+void setProgress(RkProgress* progress) {
+    rkProgress = progress;
 }
 
+// Состояние для продолжения расчёта (RkCheckpoint из rk_core.h) в текущем потоке: его сохраняют и продолжают
+// решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей). nullptr - не сохранять.
+extern "C" EXPORT
+void setCheckpoint(RkCheckpoint* checkpoint) {
+    rkCheckpoint = checkpoint;
+}
 
-// Метод Рунге-Кутты 4-го порядка (один шаг)
+// Поток точек для графика (RkStream из rk_core.h) в текущем потоке: в него пишут решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не передавать.
 extern "C" EXPORT
-void rungeKuttaStep(double& x, double& y1, double& y2, double h, double a, double b) {
-    double ky11 = f1(x, y1, y2, a, b);
-    double ky21 = f2(x, y1, y2, a, b);
+void setStream(RkStream* stream) {
+    rkStream = stream;
+}
 
-    double ky12 = f1(x + h / 2, y1 + h / 2 * ky11, y2 + h / 2 * ky21, a, b);
-    double ky22 = f2(x + h / 2, y1 + h / 2 * ky11, y2 + h / 2 * ky21, a, b);
+// Статистика расчёта (RkStats из rk_core.h) в текущем потоке: её заполняют решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не собирать.
+extern "C" EXPORT
+void setStats(RkStats* stats) {
+    rkStats = stats;
+}
 
-    double ky13 = f1(x + h / 2, y1 + h / 2 * ky12, y2 + h / 2 * ky22, a, b);
-    double ky23 = f2(x + h / 2, y1 + h / 2 * ky12, y2 + h / 2 * ky22, a, b);
+// Код завершения последнего вызова решателя в текущем потоке: RK_OK или RK_ERROR_* из rk_core.h.
+// Решатели с записью в файл возвращают его же, с выводом в буфер - количество строк, посчитанных до ошибки.
+extern "C" EXPORT
+int rkLastStatus() {
+    return rkStatus;
+}
 
-    double ky14 = f1(x + h, y1 + h * ky13, y2 + h * ky23, a, b);
-    double ky24 = f2(x + h, y1 + h * ky13, y2 + h * ky23, a, b);
+// Формируем абсолютный путь к output
+EXPORT std::string getOutputPath() {
+    std::filesystem::path executablePath = getThisLibraryPath();
+    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / (std::string("output_2") + outputExtension(outputFormat));
+    return outputPath.string();
+}
 
-    y1 = y1 + h * (ky11 + 2 * ky12 + 2 * ky13 + ky14) / 6;
-    y2 = y2 + h * (ky21 + 2 * ky22 + 2 * ky23 + ky24) / 6;
+// Правая часть системы (main2Rhs из rk_problems.h), вызов встраивается в цикл решателя
+static const StaticRhs<main2Rhs> rhs{};
 
-    if (std::isinf(y1) || std::isnan(y1) || std::fabs(y1) > DBL_MAX ||
-        std::isinf(y2) || std::isnan(y2) || std::fabs(y2) > DBL_MAX) {
-        throw std::overflow_error("Value is NaN. | Value is infinite. | Value exceeds the maximum representable double.");
-    }
 
-    x = x + h;
+// Метод Рунге-Кутты 4-го порядка (один шаг). Возвращает код завершения;
+// при ошибке x, y1, y2 не изменяются.
+extern "C" EXPORT
+int rungeKuttaStep(double& x, double& y1, double& y2, double h, double a, double b) {
+    return rkGuard([&] {
+        const double params[] = {a, b};
+        RkWorkspace ws(2);
+        double y[] = {y1, y2};
+        rk4Step(rhs, params, x, y, h, y, ws);
+        checkState(y, 2);
+
+        y1 = y[0];
+        y2 = y[1];
+        x = x + h;
+    });
 }
 
 
 // Метод Рунге-Кутты 4-го порядка без контроля локальной погрешности
-extern "C" EXPORT
-int rungeKutta(double x0, double y10, double y20, double h, double xmax, double a, double b, int maxSteps) {
-    double x = x0;
-    double y1 = y10;
-    double y2 = y20;
-
-    std::ofstream output(OUT_PATH);
-    output << "xi;vi1;vi2" << std::endl;  // Заголовок CSV
+template <class Writer>
+int rungeKuttaRun(double x0, double y10, double y20, double h, double xmax, double a, double b, int maxSteps, Writer& output) {
+    const double params[] = {a, b};
+    const double y0[] = {y10, y20};
+    return rkGuard([&] {
+        rk4Run(rhs, params, 2, x0, y0, h, xmax, maxSteps, [&](double x, const double* y) {
+            output.row({x, y[0], y[1]});
+        });
+    });
+}
 
-    int step = 0;
-    while (x+h <= xmax && step < maxSteps) {
-        rungeKuttaStep(x, y1, y2, h, a, b);
 
-        output << x << ";" << y1 << ";" << y2 << std::endl; // Вывод с разделителем ;
-        step++;
-    }
-
-    output.close();
-    return 0;
+// method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (столбцы vi2, v'i2 - контрольное решение).
+// Плотный вывод того же расчёта в точках xEval (evalCount штук, можно 0) пишется в dense, столбцы как у rungeKutta.
+template <class Writer, class DenseWriter>
+int rungeKuttaAdaptiveRun(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, Writer& output,
+                          const double* xEval, int evalCount, DenseWriter& dense) {
+    const double params[] = {a, b};
+    const double y0[] = {y10, y20};
+    return rkGuard([&] {
+        adaptiveDenseRun(method, rhs, params, 2, x0, y0, h0, xmax, maxSteps, tolerance, edge, true, xEval, evalCount, [&](const AdaptivePoint& point) {
+            double y1 = point.y[0], y1_half = point.yHalf[0];
+            double y2 = point.y[1], y2_half = point.yHalf[1];
+            output.row({point.x, y1, y1_half, y2, y2_half, y1 - y1_half, y2-y2_half, point.h, point.E, point.e[0], point.e[1], double(point.c1), double(point.c2)});
+        }, [&](double x, const double* y) {
+            dense.row({x, y[0], y[1]});
+        });
+    });
 }
 
+template <class Writer>
+int rungeKuttaAdaptiveRun(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, Writer& output) {
+    BufferRowWriter noDense(nullptr, 0, 3);
+    return rungeKuttaAdaptiveRun(method, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, output, nullptr, 0, noDense);
+}
 
 
 extern "C" EXPORT
-int rungeKuttaAdaptive(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge) {
-
-    double x = x0;
-    double y1 = y10;
-    double y2 = y20;
-    double h = h0;
-
-    double xtmp, y1tmp, y2tmp;  // Для временного хранения значений
-    double x_half, y1_half, y2_half;
-
-
-    int c1 = 0;
-    int c2 = 0;
-    int step = 0;
-    double error = 0.0;
-    double s1, s2;
-    int p = 4;
-
+int rungeKutta(double x0, double y10, double y20, double h, double xmax, double a, double b, int maxSteps) {
+    return writeResultFile(outputFormat, getOutputPath(), "xi;vi1;vi2", [&](auto& output) {  // Заголовок CSV
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return rungeKuttaRun(x0, y10, y20, h, xmax, a, b, maxSteps, sampled);
+        });
+    });
+}
 
-    std::ofstream output(OUT_PATH);
-    output << "xi;vi;vi2;v'i;v'i2;vi-vi2;v'i-v'i2;hi;E;E_v;E_v';c1;c2" << std::endl;
 
+extern "C" EXPORT
+int rungeKuttaAdaptive(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge) {
+    return writeResultFile(outputFormat, getOutputPath(), "xi;vi;vi2;v'i;v'i2;vi-vi2;v'i-v'i2;hi;E;E_v;E_v';c1;c2", [&](auto& output) {
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return rungeKuttaAdaptiveRun(ADAPTIVE_STEP_DOUBLING, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, sampled);
+        });
+    });
+}
 
-    while (x + h <= xmax && std::abs(x + h - xmax) > edge && step < maxSteps) {
 
-        xtmp = x;
-        y1tmp = y1;
-        y2tmp = y2;
+// Контроль погрешности вложенной парой Дормана-Принса 5(4), столбцы как у rungeKuttaAdaptive
+extern "C" EXPORT
+int dormandPrinceAdaptive(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge) {
+    return writeResultFile(outputFormat, getOutputPath(), "xi;vi;vi2;v'i;v'i2;vi-vi2;v'i-v'i2;hi;E;E_v;E_v';c1;c2", [&](auto& output) {
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return rungeKuttaAdaptiveRun(ADAPTIVE_DORMAND_PRINCE, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, sampled);
+        });
+    });
+}
 
-        rungeKuttaStep(x, y1, y2, h, a, b);
 
-        x_half = xtmp;
-        y1_half = y1tmp;
-        y2_half = y2tmp;
-        double h_half = h/2;
+// Те же решатели, но без записи на диск: строки (3 столбца для rungeKutta,
+// 13 для rungeKuttaAdaptive и dormandPrinceAdaptive) пишутся в массив out вызывающей стороны.
+// Для rungeKutta достаточно capacity = maxSteps, для rungeKuttaAdaptive и dormandPrinceAdaptive - maxSteps + 1.
+// Возвращают количество записанных строк; при ошибке решателя - посчитанных до неё (код в rkLastStatus).
+extern "C" EXPORT
+int rungeKuttaBuffer(double x0, double y10, double y20, double h, double xmax, double a, double b, int maxSteps, double* out, int capacity) {
+    BufferRowWriter output(out, capacity, 3);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rungeKuttaRun(x0, y10, y20, h, xmax, a, b, maxSteps, sampled);
+    });
+    return output.rows();
+}
 
 
-        rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
-        rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
+extern "C" EXPORT
+int rungeKuttaAdaptiveBuffer(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, double* out, int capacity) {
+    BufferRowWriter output(out, capacity, 13);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rungeKuttaAdaptiveRun(ADAPTIVE_STEP_DOUBLING, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, sampled);
+    });
+    return output.rows();
+}
 
 
-        s1 = std::abs(y1 - y1_half) / (pow(2, p) - 1);
-        s2 = std::abs(y2 - y2_half) / (pow(2, p) - 1);
+extern "C" EXPORT
+int dormandPrinceAdaptiveBuffer(double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, double* out, int capacity) {
+    BufferRowWriter output(out, capacity, 13);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rungeKuttaAdaptiveRun(ADAPTIVE_DORMAND_PRINCE, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, sampled);
+    });
+    return output.rows();
+}
 
-        error = sqrt(s1 * s1 + s2 * s2);
 
+// Плотный вывод адаптивного метода (method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE):
+// решение в точках xEval (по возрастанию), столбцы как у rungeKutta: xi, vi1, vi2. Достаточно capacity = evalCount.
+extern "C" EXPORT
+int rungeKuttaDenseBuffer(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps,
+                          double tolerance, double edge, const double* xEval, int evalCount, double* out, int capacity) {
+    const double params[] = {a, b};
+    const double y0[] = {y10, y20};
+    BufferRowWriter output(out, capacity, 3);
+    rkGuard([&] {
+        denseAdaptiveRun(method, rhs, params, 2, x0, y0, h0, xmax, maxSteps, tolerance, edge, true, xEval, evalCount, [&](double x, const double* y) {
+            output.row({x, y[0], y[1]});
+        });
+    });
+    return output.rows();
+}
 
-        if (error < tolerance / pow(2, p + 1)) {
-            c2++;
-            output << x << ";" << y1 << ";" << y1_half << ";" << y2 << ";" << y2_half << ";" << y1 - y1_half << ";" << y2-y2_half << ";" << h << ";" << error * pow(2, p) << ";" << s1 * pow(2, p) << ";" << s2 * pow(2, p) << ";" << c1 << ";" << c2 << std::endl;
-            h *= 2;
-        } else  {
-            while (error > tolerance) {
 
-                c1++;
+// Адаптивный метод и его плотный вывод за один расчёт: строки таблицы (как у rungeKuttaAdaptiveBuffer) - в out,
+// решение в точках xEval (как у rungeKuttaDenseBuffer) - в dense, их количество - в *denseRows.
+// Достаточно capacity = maxSteps + 1, denseCapacity = evalCount. Возвращает количество строк таблицы.
+extern "C" EXPORT
+int rungeKuttaAdaptiveDenseBuffer(int method, double x0, double y10, double y20, double h0, double xmax, double a, double b, int maxSteps,
+                                  double tolerance, double edge, double* out, int capacity,
+                                  const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows) {
+    BufferRowWriter output(out, capacity, 13);
+    BufferRowWriter denseOutput(dense, denseCapacity, 3);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rungeKuttaAdaptiveRun(method, x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge, sampled, xEval, evalCount, denseOutput);
+    });
+    *denseRows = denseOutput.rows();
+    return output.rows();
+}
 
-                x = xtmp;
-                y1 = y1tmp;
-                y2 = y2tmp;
-                h /= 2;
 
-                x_half = xtmp;
-                y1_half = y1tmp;
-                y2_half = y2tmp;
-                h_half = h/2;
+// Ансамбль траекторий: n пар начальных условий (y1[i], y2[i]) в одной точке x0,
+// состояния хранятся структурой массивов. Правая часть не зависит от x, поэтому на
+// постоянном шаге все стадии метода считаются во внутреннем цикле по траекториям
+// без рабочих массивов. Переполнение одной траектории не прерывает расчёт: в ней
+// просто появятся inf/nan.
 
-                rungeKuttaStep(x, y1, y2, h, a, b);
-                rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
-                rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
-            
-                s1 = std::abs(y1 - y1_half) / (pow(2, p) - 1);
-                s2 = std::abs(y2 - y2_half) / (pow(2, p) - 1);
+// f(y) = (y2, -a*y2 + b*sin(y1)), как main2Rhs
+static inline void fBatch(double a, double b, double y1, double y2, double& f1, double& f2) {
+    f1 = y2;
+    f2 = -a * y2 + b * std::sin(y1);
+}
 
-                error = sqrt(s1 * s1 + s2 * s2);
+// Метод Рунге-Кутты 4-го порядка с постоянным шагом для n траекторий.
+// y1, y2 - начальные значения, на выходе - значения в последней точке.
+// out (может быть NULL) - строки по 2n + 1 значению: x, затем y1 всех траекторий,
+// затем y2 всех траекторий; достаточно capacity = maxSteps.
+// Возвращает количество сделанных шагов.
+extern "C" EXPORT
+int rungeKuttaBatch(double x0, double* y1, double* y2, int n, double h, double xmax, double a, double b, int maxSteps, double* out, int capacity) {
+    double x = x0;
 
+    int step = 0;
+    while (x+h <= xmax && step < maxSteps) {
+        for (int i = 0; i < n; ++i) {
+            const double u = y1[i];
+            const double v = y2[i];
+            double k1u, k1v, k2u, k2v, k3u, k3v, k4u, k4v;
+            fBatch(a, b, u, v, k1u, k1v);
+            fBatch(a, b, u + h / 2 * k1u, v + h / 2 * k1v, k2u, k2v);
+            fBatch(a, b, u + h / 2 * k2u, v + h / 2 * k2v, k3u, k3v);
+            fBatch(a, b, u + h * k3u, v + h * k3v, k4u, k4v);
+            y1[i] = u + h * (k1u + 2 * k2u + 2 * k3u + k4u) / 6;
+            y2[i] = v + h * (k1v + 2 * k2v + 2 * k3v + k4v) / 6;
+        }
+        x = x + h;
+
+        if (out != nullptr && step < capacity) {
+            double* row = out + static_cast<long long>(step) * (2 * n + 1);
+            row[0] = x;
+            for (int i = 0; i < n; ++i) {
+                row[1 + i] = y1[i];
+                row[1 + n + i] = y2[i];
             }
-
-            output << x << ";" << y1 << ";" << y1_half << ";" << y2 << ";" << y2_half << ";" << y1 - y1_half << ";" << y2-y2_half << ";" << h << ";" << error * pow(2, p) << ";" << s1 * pow(2, p) << ";" << s2 * pow(2, p) << ";" << c1 << ";" << c2 << std::endl;
         }
-        
-
-		
-
         step++;
-
     }
 
-    if (x + h > xmax)
-    {
-        h = xmax - x;
-        //++c1;
-        // Делаем шаг методом Рунге-Кутта с h и два шага с h/2
-        xtmp = x;
-        y1tmp = y1;
-        y2tmp = y2;
-
-        rungeKuttaStep(x, y1, y2, h, a, b);
-
-        x_half = xtmp;
-        y1_half = y1tmp;
-        y2_half = y2tmp;
-        double h_half = h/2;
-
-
-        rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
-        rungeKuttaStep(x_half, y1_half, y2_half, h_half, a, b);
-
-        output << x << ";" << y1 << ";" << y1_half << ";" << y2 << ";" << y2_half << ";" << y1 - y1_half << ";" << y2-y2_half << ";" << h << ";" << error * pow(2, p) << ";" << s1 * pow(2, p) << ";" << s2 * pow(2, p) << ";" << c1 << ";" << c2 << std::endl;
+    return step;
+}
 
-    } 
 
-    output.close();
-    return 0;
+// Метод Рунге-Кутты 4-го порядка с контролем локальной погрешности для n траекторий (rk4AdaptiveBatchRun из rk_core.h).
+// У каждой траектории свои x, h и счётчики, логика шага как в rungeKuttaAdaptive;
+// траектории продвигаются одновременно, пока не закончатся все.
+// out - n строк по 8 значений (конечное состояние): x, v, v', h, c1, c2, количество шагов,
+// код завершения (RK_OK или RK_ERROR_*: траектория с ошибкой остановлена в последней принятой точке).
+// Возвращает количество итераций общего цикла.
+extern "C" EXPORT
+int rungeKuttaAdaptiveBatch(double x0, double* y1, double* y2, int n, double h0, double xmax, double a, double b, int maxSteps, double tolerance, double edge, double* out) {
+    const double params[] = {a, b};
+    AdaptiveLanes lanes(n, x0, h0);
+    double* const components[] = {y1, y2};
+    int iterations = rk4AdaptiveBatchRun(rhs, params, 2, n, components, xmax, maxSteps, tolerance, edge, true, lanes);
+
+    for (int i = 0; i < n; ++i) {
+        double* row = out + static_cast<long long>(i) * 8;
+        row[0] = lanes.x[i];
+        row[1] = y1[i];
+        row[2] = y2[i];
+        row[3] = lanes.h[i];
+        row[4] = lanes.c1[i];
+        row[5] = lanes.c2[i];
+        row[6] = lanes.steps[i];
+        row[7] = lanes.status[i];
+    }
+    return iterations;
 }
 
 
@@ -247,13 +361,13 @@ int main() {
     double xmax = 10.435634972918;
     double a = 1.0;
     double b = 1.0;
-    int maxSteps = 1000.;
+    int maxSteps = 1000;
     double tolerance = 1e-7;
     double edge = 1e-7;
 
 
     //Вызов rungeKuttaAdaptive с данными переменными
-    //rungeKuttaAdaptive(x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge);
+    rungeKuttaAdaptive(x0, y10, y20, h0, xmax, a, b, maxSteps, tolerance, edge);
 
     return 0;
 }
\ No newline at end of file
@@ -7,6 +7,9 @@
 
 #include <cfloat> // Для DBL_MAX
 
+#include "rk_output.h"
+#include "rk_problems.h"
+
 #ifdef _WIN32
 #include <Windows.h>
 #else
@@ -47,20 +50,66 @@ EXPORT std::filesystem::path getThisLibraryPath() {
 
 
 
-// Формируем абсолютный путь к output
-EXPORT std::string getOutputPath() {
-    std::filesystem::path executablePath = getThisLibraryPath();
-    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / "output_test.csv";
-    return outputPath.string();
+// Формат файла результата (OUTPUT_FORMAT_CSV или OUTPUT_FORMAT_NPY) в текущем потоке: как и rkProgress,
+// свой у каждого потока, поэтому параллельные расчёты не подменяют друг другу формат
+static thread_local int outputFormat = OUTPUT_FORMAT_CSV;
+
+extern "C" EXPORT
+void setOutputFormat(int format) {
+    outputFormat = format;
 }
 
-#define OUT_PATH getOutputPath().c_str()
+// Прореживание вывода для решателей с записью в файл и в буфер (кроме плотного вывода и ансамблей):
+// каждая every-я строка или первые строки с x >= points[i], не больше maxRows строк (0 - без ограничения).
+// setOutputSampling(1, 0, nullptr, 0) отключает прореживание. Точки копируются. Задаётся для текущего потока.
+static thread_local OutputSampling outputSampling;
 
 extern "C" EXPORT
-    double f(const double &x, const double &y) {
-        return y;                                           //Ввод функции
-    }
+void setOutputSampling(int every, int maxRows, const double* points, int pointCount) {
+    outputSampling.set(every, maxRows, points, pointCount);
+}
 
+// Ход расчёта в текущем потоке (RkProgress из rk_core.h): обновляется решателями этой библиотеки,
+// cancel != 0 останавливает расчёт. nullptr - не отслеживать.
+extern "C" EXPORT
+void setProgress(RkProgress* progress) {
+    rkProgress = progress;
+}
+
+// Состояние для продолжения расчёта (RkCheckpoint из rk_core.h) в текущем потоке: его сохраняют и продолжают
+// решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей). nullptr - не сохранять.
+extern "C" EXPORT
+void setCheckpoint(RkCheckpoint* checkpoint) {
+    rkCheckpoint = checkpoint;
+}
+
+// Поток точек для графика (RkStream из rk_core.h) в текущем потоке: в него пишут решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не передавать.
+extern "C" EXPORT
+void setStream(RkStream* stream) {
+    rkStream = stream;
+}
+
+// Статистика расчёта (RkStats из rk_core.h) в текущем потоке: её заполняют решатели с постоянным шагом, адаптивные и плотный вывод этой библиотеки (кроме ансамблей).
+// nullptr - не собирать.
+extern "C" EXPORT
+void setStats(RkStats* stats) {
+    rkStats = stats;
+}
+
+// Код завершения последнего вызова решателя в текущем потоке: RK_OK или RK_ERROR_* из rk_core.h.
+// Решатели с записью в файл возвращают его же, с выводом в буфер - количество строк, посчитанных до ошибки.
+extern "C" EXPORT
+int rkLastStatus() {
+    return rkStatus;
+}
+
+// Формируем абсолютный путь к output
+EXPORT std::string getOutputPath() {
+    std::filesystem::path executablePath = getThisLibraryPath();
+    std::filesystem::path outputPath = executablePath.parent_path() / ".." / ".." / "output" / (std::string("output_test") + outputExtension(outputFormat));
+    return outputPath.string();
+}
 
 extern "C" EXPORT
     double u(const double &x, const double &C)
@@ -69,121 +118,168 @@ extern "C" EXPORT
     }
 
 
-// Метод Рунге-Кутта четвертого порядка
+// Правая часть задачи (testRhs из rk_problems.h), вызов встраивается в цикл решателя
+static const StaticRhs<testRhs> rhs{};
+
+
+// Метод Рунге-Кутта четвертого порядка (один шаг). При переполнении возвращает неконечное значение,
+// код ошибки - в rkLastStatus.
 extern "C" EXPORT
 double RK_4_Step(const double &x, const double &y,const double &h)
 {
-    double k1 = h * f(x, y);
-    double k2 = h * f(x + h / 2., y + k1 / 2.);
-    double k3 = h * f(x + h / 2., y + k2 / 2.);
-    double k4 = h * f(x + h, y + k3);
+    RkWorkspace ws(1);
+    double y_next;
+    rk4Step(rhs, nullptr, x, &y, h, &y_next, ws);
+    rkStatus = stateStatus(&y_next, 1);
+    return y_next;
+}
 
-    double y_next = y + (k1 + 2. * k2 + 2. * k3 + k4) / 6.;
 
-    if (std::isinf(y_next) || std::isnan(y_next) || std::fabs(y_next) > DBL_MAX) { 
-        throw std::overflow_error("Value is NaN. | Value is infinite. | Value exceeds the maximum representable double.");
-    }
+// Метод Рунге-Кутта 4-го порядка с постоянным шагом, строки результата уходят в output
+template <class Writer>
+int RK_4_run(double x0, double y0, double h, double xmax, int Nmax, Writer& output)
+{
+    RkStats* const stats = rkStats;
+    return rkGuard([&] {
+        rk4Run(rhs, nullptr, 1, x0, &y0, h, xmax, Nmax, [&](double x, const double* y) {
+            const double exact = u(x, y0);
+            output.row({x, y[0], exact});
+            statsReference(stats, x, std::fabs(exact - y[0]));
+        });
+    });
+}
 
-    return y_next;
+
+// method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE (столбец v2i - контрольное решение).
+// Плотный вывод того же расчёта в точках xEval (evalCount штук, можно 0) пишется в dense, столбцы как у RK_4.
+template <class Writer, class DenseWriter>
+int RK_4_adaptive_run(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, Writer& output,
+                      const double* xEval, int evalCount, DenseWriter& dense)
+{
+    RkStats* const stats = rkStats;
+    return rkGuard([&] {
+        adaptiveDenseRun(method, rhs, nullptr, 1, x0, &y0, h0, xmax, Nmax, eps, eps_out, false, xEval, evalCount, [&](const AdaptivePoint& point) {
+            double v = point.y[0];
+            double v2 = point.yHalf[0];
+            const double exact = u(point.x, y0);
+            output.row({point.x, v, v2, v-v2, point.E, point.h, double(point.c1), double(point.c2), exact, std::fabs(exact - v)});
+            statsReference(stats, point.x, std::fabs(exact - v));
+        }, [&](double x, const double* y) {
+            dense.row({x, y[0], u(x, y0)});
+        });
+    });
+}
+
+template <class Writer>
+int RK_4_adaptive_run(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, Writer& output)
+{
+    BufferRowWriter noDense(nullptr, 0, 3);
+    return RK_4_adaptive_run(method, x0, y0, h0, xmax, eps, eps_out, Nmax, output, nullptr, 0, noDense);
 }
 
 
 extern "C" EXPORT
 int RK_4(double x0, double y0, double h, double xmax, int Nmax)
 {
-    int step = 0;
-    double x = x0;
-    double y = y0;
-
-    std::ofstream output(OUT_PATH);
-    output << "x;v;u" << std::endl;     // Заголовок CSV с разделителем ;
-    while (x+h <= xmax && step < Nmax) {
-        y = RK_4_Step(x, y, h);
-        x = x + h;
-
-        output << x << ";" << y << ";" << u(x, y0) << std::endl;
-        ++step;
-    }
-
-    return 0;
+    // Заголовок CSV с разделителем ;
+    return writeResultFile(outputFormat, getOutputPath(), "x;v;u", [&](auto& output) {
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_run(x0, y0, h, xmax, Nmax, sampled);
+        });
+    });
 }
 
 
 extern "C" EXPORT
 int RK_4_adaptive(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax)
 {
-    double x = x0;
-    double y = y0;
-    double h = h0;
-    double y1;
-    double y2;
-    int c1 = 0;
-    int c2 = 0;
-    int step = 0;
-    double error = 0.;
-    int p = 4;
-
-    std::ofstream output(OUT_PATH);
- 
-    // Заголовок CSV с разделителем ;
-    output << "x;v;v2i;v-v2i;E;h;c1;c2;u;|ui-vi|" << std::endl;
-
-    while (x + h <= xmax && std::abs(x + h - xmax) > eps_out && step < Nmax) {
-
-        // Делаем шаг методом Рунге-Кутта с h и два шага с h/2
-        y1 = RK_4_Step(x, y, h);
-        y2 = RK_4_Step(x, y, h / 2);
-        y2 = RK_4_Step(x + h / 2, y2, h / 2);
-
-        // Вычисляем оценку локальной погрешности
-        error = (std::abs(y1 - y2)) / (pow(2, p) - 1);     //2^p-1 - знаменатель в формуле вычисления О.Л.П
-
-        // Проверяем, соответствует ли оценка погрешности заданной точности
-        if (error > eps) {
-            h=h/2;
-            ++step;
-            c1++;
-        }
-        else if( error < eps / pow(2, p + 1) ) {  //2^(p+1)
-            y = y1;
-            x += h;  //Увеличиваем шаг перед выводом, т.к. метод Р.К. считает значение в следующей точке
-            c2++;
-
-            //2^p
-            output << x << ";" << y << ";" << y2 << ";" << y-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << ";" << u(x, y0) << ";" << std::fabs(u(x, y0) - y) << std::endl;
-            
-            h *= 2;
-            ++step;
-  
-        }
-        else {
-            y = y1;
-            x += h;  //Увеличиваем шаг перед выводом, т.к. метод Р.К. считает значение в следующей точке
-            //2^p
-            output << x << ";" << y << ";" << y2 << ";" << y-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << ";" << u(x, y0) << ";" << std::fabs(u(x, y0) - y) << std::endl;
-            
-            
-            ++step;
-        }
-    }
+    return writeResultFile(outputFormat, getOutputPath(), "x;v;v2i;v-v2i;E;h;c1;c2;u;|ui-vi|", [&](auto& output) {
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_adaptive_run(ADAPTIVE_STEP_DOUBLING, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+        });
+    });
+}
 
-    if (x + h > xmax)
-    {
-        h = xmax - x;
-        //++c1;
-        // Делаем шаг методом Рунге-Кутта с h и два шага с h/2
-        y1 = RK_4_Step(x, y, h);
-        y2 = RK_4_Step(x, y, h / 2);
-        y2 = RK_4_Step(x + h / 2, y2, h / 2);
 
-        output << x+h << ";" << y1 << ";" << y2 << ";" << y1-y2 << ";" << error * pow(2, p) << ";" << h << ";" << c1 << ";" << c2 << ";" << u(x, y0) << ";" << std::fabs(u(x, y0) - y) << std::endl;
+// Контроль погрешности вложенной парой Дормана-Принса 5(4), столбцы как у RK_4_adaptive
+extern "C" EXPORT
+int DP_45_adaptive(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax)
+{
+    return writeResultFile(outputFormat, getOutputPath(), "x;v;v2i;v-v2i;E;h;c1;c2;u;|ui-vi|", [&](auto& output) {
+        return writeSampled(output, outputSampling, [&](auto& sampled) {
+            return RK_4_adaptive_run(ADAPTIVE_DORMAND_PRINCE, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+        });
+    });
+}
 
-    }
 
+// Те же решатели, но без записи на диск: строки (3 столбца для RK_4,
+// 10 для RK_4_adaptive и DP_45_adaptive) пишутся в массив out вызывающей стороны.
+// Для RK_4 достаточно capacity = Nmax, для RK_4_adaptive и DP_45_adaptive - Nmax + 1.
+// Возвращают количество записанных строк; при ошибке решателя - посчитанных до неё (код в rkLastStatus).
+extern "C" EXPORT
+int RK_4_buffer(double x0, double y0, double h, double xmax, int Nmax, double* out, int capacity)
+{
+    BufferRowWriter output(out, capacity, 3);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return RK_4_run(x0, y0, h, xmax, Nmax, sampled);
+    });
+    return output.rows();
+}
+
+
+extern "C" EXPORT
+int RK_4_adaptive_buffer(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity)
+{
+    BufferRowWriter output(out, capacity, 10);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return RK_4_adaptive_run(ADAPTIVE_STEP_DOUBLING, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+    });
+    return output.rows();
+}
+
+
+extern "C" EXPORT
+int DP_45_adaptive_buffer(double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity)
+{
+    BufferRowWriter output(out, capacity, 10);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return RK_4_adaptive_run(ADAPTIVE_DORMAND_PRINCE, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled);
+    });
+    return output.rows();
+}
 
-    output.close();
 
-return 0;
+// Плотный вывод адаптивного метода (method - ADAPTIVE_STEP_DOUBLING или ADAPTIVE_DORMAND_PRINCE):
+// решение в точках xEval (по возрастанию), столбцы как у RK_4: x, v, u. Достаточно capacity = evalCount.
+extern "C" EXPORT
+int RK_4_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax,
+                      const double* xEval, int evalCount, double* out, int capacity)
+{
+    BufferRowWriter output(out, capacity, 3);
+    rkGuard([&] {
+        denseAdaptiveRun(method, rhs, nullptr, 1, x0, &y0, h0, xmax, Nmax, eps, eps_out, false, xEval, evalCount, [&](double x, const double* y) {
+            output.row({x, y[0], u(x, y0)});
+        });
+    });
+    return output.rows();
+}
+
+
+// Адаптивный метод и его плотный вывод за один расчёт: строки таблицы (как у RK_4_adaptive_buffer) - в out,
+// решение в точках xEval (как у RK_4_dense_buffer) - в dense, их количество - в *denseRows.
+// Достаточно capacity = Nmax + 1, denseCapacity = evalCount. Возвращает количество строк таблицы.
+extern "C" EXPORT
+int RK_4_adaptive_dense_buffer(int method, double x0, double y0, double h0, double xmax, double eps, double eps_out, int Nmax, double* out, int capacity,
+                               const double* xEval, int evalCount, double* dense, int denseCapacity, int* denseRows)
+{
+    BufferRowWriter output(out, capacity, 10);
+    BufferRowWriter denseOutput(dense, denseCapacity, 3);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return RK_4_adaptive_run(method, x0, y0, h0, xmax, eps, eps_out, Nmax, sampled, xEval, evalCount, denseOutput);
+    });
+    *denseRows = denseOutput.rows();
+    return output.rows();
 }
 
 
@@ -198,7 +294,7 @@ int main()
     double edge = 1e-6;
     int maxSteps = 1000;
 
-    //RK_4_adaptive(x0, y0, h0, xmax, tolerance, edge, maxSteps);
+    RK_4_adaptive(x0, y0, h0, xmax, tolerance, edge, maxSteps);
     // RK_4(x0, y0, h0, xmax, maxSteps);
 
     return 0;
@@ -0,0 +1,194 @@
+#include <cmath>
+#include <vector>
+
+#include "rk_core.h"
+#include "rk_output.h"
+#include "rk_problems.h"
+
+#ifdef _WIN64  // Проверка на 64-битную версию Windows
+#define EXPORT __declspec(dllexport)
+#elif defined(_WIN32)  // Проверка на 32-битную версию Windows
+#define EXPORT __declspec(dllexport)
+#else
+#define EXPORT __attribute__((visibility("default")))
+#endif
+
+// Универсальный решатель: любая задача из реестра rk_problems.h с правой частью,
+// выбранной во время выполнения. Задача задаётся индексом (rkProblemFind), параметры -
+// массивом params длины rkProblemParamCount, начальное состояние - массивом y0
+// длины rkProblemDimension.
+
+// Прореживание вывода rkSolve и rkSolveAdaptive (см. OutputSampling в rk_output.h) в текущем потоке
+static thread_local OutputSampling outputSampling;
+
+
+static const OdeProblem* getProblem(int problem) {
+    if (problem < 0 || problem >= RK_PROBLEM_COUNT) {
+        return nullptr;
+    }
+    return &RK_PROBLEMS[problem];
+}
+
+
+extern "C" EXPORT
+int rkProblemCount() {
+    return RK_PROBLEM_COUNT;
+}
+
+extern "C" EXPORT
+int rkProblemFind(const char* name) {
+    return findProblem(name);
+}
+
+extern "C" EXPORT
+const char* rkProblemName(int problem) {
+    const OdeProblem* p = getProblem(problem);
+    return p ? p->name : nullptr;
+}
+
+extern "C" EXPORT
+int rkProblemDimension(int problem) {
+    const OdeProblem* p = getProblem(problem);
+    return p ? p->dimension : RK_ERROR_UNKNOWN_PROBLEM;
+}
+
+extern "C" EXPORT
+int rkProblemParamCount(int problem) {
+    const OdeProblem* p = getProblem(problem);
+    return p ? p->paramCount : RK_ERROR_UNKNOWN_PROBLEM;
+}
+
+// Каждая every-я строка или первые строки с x >= points[i], не больше maxRows строк (0 - без ограничения).
+// setOutputSampling(1, 0, nullptr, 0) отключает прореживание. Точки копируются.
+extern "C" EXPORT
+void setOutputSampling(int every, int maxRows, const double* points, int pointCount) {
+    outputSampling.set(every, maxRows, points, pointCount);
+}
+
+// Код завершения последнего вызова rkSolve, rkSolveAdaptive или rkSolveDense в текущем потоке:
+// RK_OK или RK_ERROR_* из rk_core.h. Решатели возвращают количество строк, посчитанных до ошибки.
+extern "C" EXPORT
+int rkLastStatus() {
+    return rkStatus;
+}
+
+// Ход расчёта в текущем потоке (RkProgress из rk_core.h): обновляется rkSolve, rkSolveAdaptive и rkSolveDense,
+// cancel != 0 останавливает расчёт. nullptr - не отслеживать.
+extern "C" EXPORT
+void setProgress(RkProgress* progress) {
+    rkProgress = progress;
+}
+
+// Состояние для продолжения расчёта (RkCheckpoint из rk_core.h) в текущем потоке: его сохраняют и продолжают
+// rkSolve, rkSolveAdaptive и rkSolveDense. nullptr - не сохранять.
+extern "C" EXPORT
+void setCheckpoint(RkCheckpoint* checkpoint) {
+    rkCheckpoint = checkpoint;
+}
+
+// Поток точек для графика (RkStream из rk_core.h) в текущем потоке: в него пишут rkSolve, rkSolveAdaptive и rkSolveDense.
+// nullptr - не передавать.
+extern "C" EXPORT
+void setStream(RkStream* stream) {
+    rkStream = stream;
+}
+
+// Статистика расчёта (RkStats из rk_core.h) в текущем потоке: её заполняют rkSolve, rkSolveAdaptive и rkSolveDense.
+// nullptr - не собирать.
+extern "C" EXPORT
+void setStats(RkStats* stats) {
+    rkStats = stats;
+}
+
+
+// Метод Рунге-Кутты 4-го порядка с постоянным шагом.
+// out - строки по n + 1 значению: x, y[0..n-1]; достаточно capacity = maxSteps.
+// Возвращает количество записанных строк (при ошибке решателя - до неё, код в rkLastStatus) или RK_ERROR_UNKNOWN_PROBLEM.
+extern "C" EXPORT
+int rkSolve(int problem, const double* params, double x0, const double* y0, double h, double xmax, int maxSteps, double* out, int capacity) {
+    const OdeProblem* p = getProblem(problem);
+    if (p == nullptr) {
+        rkStatus = RK_ERROR_UNKNOWN_PROBLEM;
+        return RK_ERROR_UNKNOWN_PROBLEM;
+    }
+    const int n = p->dimension;
+    BufferRowWriter output(out, capacity, n + 1);
+    std::vector<double> row(n + 1);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rkGuard([&] {
+            rk4Run(p->rhs, params, n, x0, y0, h, xmax, maxSteps, [&](double x, const double* y) {
+                row[0] = x;
+                for (int i = 0; i < n; ++i) {
+                    row[1 + i] = y[i];
+                }
+                sampled.row(row.data(), row.size());
+            });
+        });
+    });
+    return output.rows();
+}
+
+
+// Адаптивный метод (как rungeKuttaAdaptive в l1_2): method - ADAPTIVE_STEP_DOUBLING (удвоение шага)
+// или ADAPTIVE_DORMAND_PRINCE (пара Дормана-Принса 5(4), y2 - решение вложенного метода 4-го порядка).
+// out - строки по 2n + 5 значений: x, y[0..n-1], y2[0..n-1] (контрольное решение), h, E, c1, c2;
+// достаточно capacity = maxSteps + 1. Возвращает количество записанных строк, как rkSolve.
+extern "C" EXPORT
+int rkSolveAdaptive(int problem, const double* params, double x0, const double* y0, double h0, double xmax, int maxSteps,
+                    double tolerance, double edge, int method, double* out, int capacity) {
+    const OdeProblem* p = getProblem(problem);
+    if (p == nullptr) {
+        rkStatus = RK_ERROR_UNKNOWN_PROBLEM;
+        return RK_ERROR_UNKNOWN_PROBLEM;
+    }
+    const int n = p->dimension;
+    BufferRowWriter output(out, capacity, 2 * n + 5);
+    std::vector<double> row(2 * n + 5);
+    writeSampled(output, outputSampling, [&](auto& sampled) {
+        return rkGuard([&] {
+            adaptiveRun(method, p->rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, true, [&](const AdaptivePoint& point) {
+                row[0] = point.x;
+                for (int i = 0; i < n; ++i) {
+                    row[1 + i] = point.y[i];
+                    row[1 + n + i] = point.yHalf[i];
+                }
+                row[2 * n + 1] = point.h;
+                row[2 * n + 2] = point.E;
+                row[2 * n + 3] = point.c1;
+                row[2 * n + 4] = point.c2;
+                sampled.row(row.data(), row.size());
+            });
+        });
+    });
+    return output.rows();
+}
+
+
+// Плотный вывод адаптивного метода: решение в точках xEval (по возрастанию, evalCount штук),
+// между узлами - кубический эрмитов интерполянт. out - строки по n + 1 значению: x, y[0..n-1];
+// достаточно capacity = evalCount. Возвращает количество записанных строк, как rkSolve.
+extern "C" EXPORT
+int rkSolveDense(int problem, const double* params, double x0, const double* y0, double h0, double xmax, int maxSteps,
+                 double tolerance, double edge, int method, const double* xEval, int evalCount, double* out, int capacity) {
+    const OdeProblem* p = getProblem(problem);
+    if (p == nullptr) {
+        rkStatus = RK_ERROR_UNKNOWN_PROBLEM;
+        return RK_ERROR_UNKNOWN_PROBLEM;
+    }
+    const int n = p->dimension;
+    int rows = 0;
+    rkGuard([&] {
+        denseAdaptiveRun(method, p->rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, true, xEval, evalCount, [&](double x, const double* y) {
+            if (rows >= capacity) {
+                return;
+            }
+            double* row = out + static_cast<long long>(rows) * (n + 1);
+            row[0] = x;
+            for (int i = 0; i < n; ++i) {
+                row[1 + i] = y[i];
+            }
+            ++rows;
+        });
+    });
+    return rows;
+}
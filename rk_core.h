@@ -0,0 +1,1170 @@
+#pragma once
+
+#include <algorithm>
+#include <atomic>
+#include <cmath>
+#include <limits>
+#include <vector>
+#include <stdexcept>
+
+// Общее ядро решателей: метод Рунге-Кутты 4-го порядка для системы y' = f(x, y)
+// произвольной размерности, контроль локальной погрешности удвоением шага
+// и вложенная пара Дормана-Принса 5(4).
+// Правая часть передаётся функцией RhsFunction с блоком параметров, сами задачи
+// описаны в rk_problems.h.
+
+
+// Правая часть: dydx[i] = f_i(x, y[0..n-1]), params - параметры задачи (a, b, K, L, ...)
+typedef void (*RhsFunction)(double x, const double* y, double* dydx, const double* params);
+
+// Описание задачи в реестре
+struct OdeProblem {
+    const char* name;
+    int dimension;      // Размерность системы
+    int paramCount;     // Количество параметров в блоке params
+    RhsFunction rhs;
+};
+
+// Правая часть, известная на этапе компиляции: вызов встраивается в цикл решателя.
+// Для задач из реестра, выбранных во время выполнения, используется сам указатель RhsFunction.
+template <RhsFunction F>
+struct StaticRhs {
+    void operator()(double x, const double* y, double* dydx, const double* params) const {
+        F(x, y, dydx, params);
+    }
+};
+
+
+// Порядок метода и производные от него константы правила Рунге
+const int RK_ORDER = 4;
+const double RK_ERROR_DENOMINATOR = 15.;    // 2^p - 1 - знаменатель в формуле вычисления О.Л.П
+const double RK_ERROR_SCALE = 16.;          // 2^p
+const double RK_DOUBLING_DIVISOR = 32.;     // 2^(p+1)
+
+
+// Коды завершения решателей. Исключения не пересекают границу extern "C" (иначе аварийно завершается
+// весь процесс Python): ошибки внутри ядра бросаются как RkError и перехватываются rkGuard.
+const int RK_OK = 0;
+const int RK_ERROR_UNKNOWN_PROBLEM = -1;    // Нет задачи с таким индексом (rk_core)
+const int RK_ERROR_OVERFLOW = -2;           // Решение вышло за пределы double (бесконечность)
+const int RK_ERROR_NOT_FINITE = -3;         // В решении появился NaN
+const int RK_ERROR_STEP_UNDERFLOW = -4;     // Шаг уменьшился до x + h == x, расчёт не продвигается
+const int RK_ERROR_INTERNAL = -5;           // Прочие исключения (нехватка памяти и т.п.)
+const int RK_ERROR_BAD_CHECKPOINT = -6;     // Продолжение расчёта без сохранённого состояния или другой размерности
+
+class RkError : public std::runtime_error {
+public:
+    RkError(int code, const char* message) : std::runtime_error(message), code_(code) {}
+    int code() const { return code_; }
+private:
+    int code_;
+};
+
+// Код завершения последнего вызова решателя в текущем потоке (экспортируется библиотеками как rkLastStatus)
+inline thread_local int rkStatus = RK_OK;
+
+// Выполняет body(), перехватывая исключения: строки, выведенные до ошибки, остаются у приёмника.
+// Возвращает код завершения и сохраняет его в rkStatus.
+template <class Body>
+int rkGuard(Body body) {
+    int status = RK_OK;
+    try {
+        body();
+    } catch (const RkError& e) {
+        status = e.code();
+    } catch (const std::exception&) {
+        status = RK_ERROR_INTERNAL;
+    }
+    rkStatus = status;
+    return status;
+}
+
+
+// Ход расчёта: структура вызывающей стороны, которую решатель обновляет каждые RK_PROGRESS_INTERVAL шагов.
+// Её можно читать из другого потока, а записью cancel != 0 - остановить расчёт: цикл завершается
+// так же, как по maxSteps, уже выведенные строки остаются.
+struct RkProgress {
+    double x;               // Текущая абсцисса (в ksr11 - пройденная длина)
+    long long steps;        // Количество шагов (итераций цикла)
+    long long rejected;     // Количество отвергнутых шагов (делений шага)
+    volatile int cancel;    // != 0 - остановить расчёт
+};
+
+const int RK_PROGRESS_INTERVAL = 256;
+
+// Ход расчёта, отслеживаемый в текущем потоке (nullptr - не отслеживается), задаётся через setProgress библиотек.
+// Своя переменная у каждого потока, поэтому параллельные расчёты в одной библиотеке не мешают друг другу.
+inline thread_local RkProgress* rkProgress = nullptr;
+
+// Вызывается в начале каждого шага: раз в RK_PROGRESS_INTERVAL шагов обновляет ход расчёта.
+// Возвращает false, если расчёт отменён.
+inline bool progressContinue(double x, long long step, long long rejected) {
+    RkProgress* progress = rkProgress;
+    if (progress == nullptr || step % RK_PROGRESS_INTERVAL != 0) {
+        return true;
+    }
+    progress->x = x;
+    progress->steps = step;
+    progress->rejected = rejected;
+    return progress->cancel == 0;
+}
+
+// Итоговое состояние хода расчёта
+inline void progressFinish(double x, long long step, long long rejected) {
+    RkProgress* progress = rkProgress;
+    if (progress != nullptr) {
+        progress->x = x;
+        progress->steps = step;
+        progress->rejected = rejected;
+    }
+}
+
+inline bool progressCancelled() {
+    return rkProgress != nullptr && rkProgress->cancel != 0;
+}
+
+
+// Состояние решателя для продолжения расчёта до большего xmax: структура вызывающей стороны.
+// В конце расчёта (в том числе отменённого, но не завершённого ошибкой) решатель записывает в неё
+// последнюю точку, следующий шаг и счётчики c1, c2. При resume != 0 расчёт начинается с записанного
+// состояния, а x0, y0 и h0 вызова не используются (метод с постоянным шагом берёт шаг из вызова);
+// maxSteps отсчитывается заново для каждого продолжения.
+const int RK_CHECKPOINT_MAX_DIMENSION = 8;
+
+struct RkCheckpoint {
+    int resume;             // != 0 - начать с сохранённого состояния
+    int saved;              // Состояние записано последним расчётом
+    int dimension;          // Размерность системы
+    int c1;                 // Количество делений (уменьшений) шага
+    int c2;                 // Количество удвоений (увеличений) шага
+    double x;
+    double h;               // Следующий шаг (до укорачивания последнего шага до xmax)
+    double y[RK_CHECKPOINT_MAX_DIMENSION];
+};
+
+// Состояние, используемое в текущем потоке (nullptr - не сохраняется), задаётся через setCheckpoint библиотек
+inline thread_local RkCheckpoint* rkCheckpoint = nullptr;
+
+// Начальная точка продолжения расчёта: false, если расчёт идёт с начала
+inline bool checkpointStart(int n, double& x, std::vector<double>& y) {
+    RkCheckpoint* checkpoint = rkCheckpoint;
+    if (checkpoint == nullptr || checkpoint->resume == 0) {
+        return false;
+    }
+    if (checkpoint->saved == 0 || checkpoint->dimension != n) {
+        throw RkError(RK_ERROR_BAD_CHECKPOINT, "No saved state to resume from.");
+    }
+    x = checkpoint->x;
+    y.assign(checkpoint->y, checkpoint->y + n);
+    return true;
+}
+
+// Начальное состояние решателя: из rkCheckpoint при продолжении, иначе переданное значение не меняется
+inline void checkpointResume(int n, double& x, std::vector<double>& y, double& h, int& c1, int& c2) {
+    if (checkpointStart(n, x, y)) {
+        h = rkCheckpoint->h;
+        c1 = rkCheckpoint->c1;
+        c2 = rkCheckpoint->c2;
+    }
+    if (rkCheckpoint != nullptr) {
+        rkCheckpoint->saved = 0;
+    }
+}
+
+inline void checkpointSave(int n, double x, const double* y, double h, int c1, int c2) {
+    RkCheckpoint* checkpoint = rkCheckpoint;
+    if (checkpoint == nullptr || n > RK_CHECKPOINT_MAX_DIMENSION) {
+        return;
+    }
+    checkpoint->dimension = n;
+    checkpoint->x = x;
+    checkpoint->h = h;
+    checkpoint->c1 = c1;
+    checkpoint->c2 = c2;
+    for (int i = 0; i < n; ++i) {
+        checkpoint->y[i] = y[i];
+    }
+    checkpoint->saved = 1;
+}
+
+
+// Поток точек для графика во время расчёта: кольцевой буфер вызывающей стороны с одним писателем (решатель)
+// и одним читателем в другом потоке. Решатель дописывает каждую stride-ю принятую точку: x и первые
+// width - 1 компонент y. Непрочитанные строки не перезаписываются: если буфер полон, точка пропускается,
+// а stride удваивается (не чаще одного раза между чтениями), так что медленный читатель получает
+// равномерно прореженную траекторию.
+// Читатель копирует строки [read, written) (номера по модулю capacity) и затем увеличивает read.
+struct RkStream {
+    double* data;                   // capacity строк по width значений
+    int capacity;
+    int width;                      // 1 + количество выводимых компонент y
+    volatile long long written;     // Количество записанных строк (пишет решатель)
+    volatile long long read;        // Количество прочитанных строк (пишет читатель)
+    long long stride;               // Записывается каждая stride-я точка (не меньше 1)
+    long long skipped;              // Точек, пропущенных после последней записанной
+    long long strideRead;           // read при последнем удвоении stride (-1 - ещё не удваивался)
+};
+
+// Поток текущего потока (nullptr - точки не передаются), задаётся через setStream библиотек
+inline thread_local RkStream* rkStream = nullptr;
+
+// Вызывается для начальной и каждой принятой точки; stream - rkStream, прочитанный в начале расчёта
+// (обращение к thread_local в разделяемой библиотеке не бесплатно, поэтому не на каждом шаге)
+inline void streamPoint(RkStream* stream, double x, const double* y, int n) {
+    if (stream == nullptr || ++stream->skipped < stream->stride) {
+        return;
+    }
+    stream->skipped = 0;
+    const long long written = stream->written;
+    if (written - stream->read >= stream->capacity) {
+        const long long read = stream->read;
+        if (read != stream->strideRead) {
+            stream->stride *= 2;
+            stream->strideRead = read;
+        }
+        return;
+    }
+    double* row = stream->data + (written % stream->capacity) * stream->width;
+    row[0] = x;
+    const int count = std::min(n, stream->width - 1);
+    for (int i = 0; i < count; ++i) {
+        row[1 + i] = y[i];
+    }
+    std::atomic_thread_fence(std::memory_order_release);     // Строка записана раньше, чем её увидит читатель
+    stream->written = written + 1;
+}
+
+
+// Статистика расчёта: структура вызывающей стороны, которую решатель заполняет по ходу цикла, поэтому итоги
+// (справка вкладок) не требуют просмотра таблицы результата. Счётчики относятся к одному вызову, в том числе
+// при продолжении расчёта (c1 и c2 в строках результата - накопленные). Величины, которых нет, - NaN.
+struct RkStats {
+    long long accepted;         // Принятые шаги
+    long long rejected;         // Отвергнутые шаги (деления шага)
+    long long doublings;        // Увеличения шага
+    long long rhsEvaluations;   // Вычисления правой части
+    double maxError;            // Наибольшая оценка локальной погрешности принятого шага и её x
+    double maxErrorX;
+    double minH;                // Наименьший и наибольший принятый шаг и x в конце шага
+    double minHX;
+    double maxH;
+    double maxHX;
+    double x;                   // Последняя точка
+    double boundaryDistance;    // |xmax - x|
+    double maxReferenceError;   // Наибольшее отклонение от точного решения (если библиотека его знает) и его x
+    double maxReferenceErrorX;
+};
+
+// Статистика текущего потока (nullptr - не собирается), задаётся через setStats библиотек
+inline thread_local RkStats* rkStats = nullptr;
+
+// stats - rkStats, прочитанный в начале расчёта (как у streamPoint)
+inline void statsStart(RkStats* stats, double x) {
+    if (stats == nullptr) {
+        return;
+    }
+    const double nan = std::numeric_limits<double>::quiet_NaN();
+    *stats = RkStats{0, 0, 0, 0, nan, nan, nan, nan, nan, nan, x, nan, nan, nan};
+}
+
+// Принятый шаг h, закончившийся в точке x; error - оценка локальной погрешности (NaN - не оценивается)
+inline void statsStep(RkStats* stats, double x, double h, double error) {
+    if (stats == nullptr) {
+        return;
+    }
+    ++stats->accepted;
+    if (!std::isnan(error) && !(error <= stats->maxError)) {
+        stats->maxError = error;
+        stats->maxErrorX = x;
+    }
+    if (!(h >= stats->minH)) {
+        stats->minH = h;
+        stats->minHX = x;
+    }
+    if (!(h <= stats->maxH)) {
+        stats->maxH = h;
+        stats->maxHX = x;
+    }
+}
+
+// Отклонение от точного решения в точке x (вызывают библиотеки, где оно известно)
+inline void statsReference(RkStats* stats, double x, double error) {
+    if (stats != nullptr && !(error <= stats->maxReferenceError)) {
+        stats->maxReferenceError = error;
+        stats->maxReferenceErrorX = x;
+    }
+}
+
+inline void statsFinish(RkStats* stats, double x, double xmax, long long rejected, long long doublings, long long rhsEvaluations) {
+    if (stats == nullptr) {
+        return;
+    }
+    stats->x = x;
+    stats->boundaryDistance = std::fabs(xmax - x);
+    stats->rejected = rejected;
+    stats->doublings = doublings;
+    stats->rhsEvaluations = rhsEvaluations;
+}
+
+// Правая часть со счётчиком вычислений (для RkStats::rhsEvaluations)
+template <class Rhs>
+struct CountingRhs {
+    const Rhs& rhs;
+    long long& count;
+
+    void operator()(double x, const double* y, double* dydx, const double* params) const {
+        ++count;
+        rhs(x, y, dydx, params);
+    }
+};
+
+
+// Рабочие массивы шага; выделяются один раз на расчёт, а не на каждом шаге
+class RkWorkspace {
+public:
+    explicit RkWorkspace(int n) : n(n), storage(7 * static_cast<size_t>(n)) {}
+
+    int dimension() const { return n; }
+    double* k(int i) { return storage.data() + i * n; }    // k1..k4 - i = 0..3
+    double* stage() { return storage.data() + 4 * n; }     // Промежуточная точка
+    double* full() { return storage.data() + 5 * n; }      // Результат шага h
+    double* half() { return storage.data() + 6 * n; }      // Результат двух шагов h/2
+
+private:
+    int n;
+    std::vector<double> storage;
+};
+
+
+// Один шаг метода Рунге-Кутты 4-го порядка: yNext = y + h(k1 + 2k2 + 2k3 + k4)/6.
+// yNext может совпадать с y.
+template <class Rhs>
+inline void rk4Step(const Rhs& rhs, const double* params, double x, const double* y, double h, double* yNext, RkWorkspace& ws) {
+    const int n = ws.dimension();
+    double* k1 = ws.k(0);
+    double* k2 = ws.k(1);
+    double* k3 = ws.k(2);
+    double* k4 = ws.k(3);
+    double* stage = ws.stage();
+
+    rhs(x, y, k1, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h / 2 * k1[i];
+    }
+    rhs(x + h / 2, stage, k2, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h / 2 * k2[i];
+    }
+    rhs(x + h / 2, stage, k3, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * k3[i];
+    }
+    rhs(x + h, stage, k4, params);
+    for (int i = 0; i < n; ++i) {
+        yNext[i] = y[i] + h * (k1[i] + 2 * k2[i] + 2 * k3[i] + k4[i]) / 6;
+    }
+}
+
+
+// Все компоненты конечны (нет NaN и бесконечностей)
+inline bool stateIsFinite(const double* y, int n) {
+    for (int i = 0; i < n; ++i) {
+        if (!std::isfinite(y[i])) {
+            return false;
+        }
+    }
+    return true;
+}
+
+// RK_OK, либо код ошибки по первой неконечной компоненте: RK_ERROR_NOT_FINITE для NaN, RK_ERROR_OVERFLOW для бесконечности
+inline int stateStatus(const double* y, int n) {
+    for (int i = 0; i < n; ++i) {
+        if (!std::isfinite(y[i])) {
+            return std::isnan(y[i]) ? RK_ERROR_NOT_FINITE : RK_ERROR_OVERFLOW;
+        }
+    }
+    return RK_OK;
+}
+
+inline void checkState(const double* y, int n) {
+    int status = stateStatus(y, n);
+    if (status == RK_ERROR_NOT_FINITE) {
+        throw RkError(status, "Value is NaN.");
+    }
+    if (status != RK_OK) {
+        throw RkError(status, "Value is infinite. | Value exceeds the maximum representable double.");
+    }
+}
+
+// RK_OK, если уменьшенный шаг ещё продвигает x, иначе RK_ERROR_STEP_UNDERFLOW
+inline int stepStatus(double x, double h) {
+    return x + h == x ? RK_ERROR_STEP_UNDERFLOW : RK_OK;
+}
+
+inline void checkStep(double x, double h) {
+    if (stepStatus(x, h) != RK_OK) {
+        throw RkError(RK_ERROR_STEP_UNDERFLOW, "Step size underflow.");
+    }
+}
+
+
+// Оценка локальной погрешности удвоением шага: шаг h в ws.full(), два шага h/2 в ws.half().
+// s[i] = |full_i - half_i| / (2^p - 1), возвращает sqrt(sum s_i^2)
+// (для скалярной задачи - просто |full - half| / (2^p - 1)). При переполнении бросает RkError.
+template <class Rhs>
+inline double stepDoublingError(const Rhs& rhs, const double* params, double x, const double* y, double h, double* s, RkWorkspace& ws) {
+    const int n = ws.dimension();
+    double* full = ws.full();
+    double* half = ws.half();
+
+    rk4Step(rhs, params, x, y, h, full, ws);
+    rk4Step(rhs, params, x, y, h / 2, half, ws);
+    rk4Step(rhs, params, x + h / 2, half, h / 2, half, ws);
+
+    double sum = 0.;
+    for (int i = 0; i < n; ++i) {
+        s[i] = std::abs(full[i] - half[i]) / RK_ERROR_DENOMINATOR;
+        sum += s[i] * s[i];
+    }
+    checkState(full, n);
+    checkState(half, n);
+    return std::sqrt(sum);
+}
+
+
+// Метод Рунге-Кутты 4-го порядка с постоянным шагом.
+// emit(x, y) вызывается после каждого шага. Возвращает количество шагов.
+template <class Rhs, class Emit>
+int rk4Run(const Rhs& rhsFunction, const double* params, int n, double x0, const double* y0, double h, double xmax, int maxSteps, Emit emit) {
+    long long evaluations = 0;
+    const CountingRhs<Rhs> rhs{rhsFunction, evaluations};
+    RkStream* const stream = rkStream;
+    RkStats* const stats = rkStats;
+    RkWorkspace ws(n);
+    std::vector<double> y(y0, y0 + n);
+    double x = x0;
+    double hCheckpoint = h;     // Шаг сохранённого состояния не используется: шаг всегда берётся из вызова
+    int c1 = 0;
+    int c2 = 0;
+    checkpointResume(n, x, y, hCheckpoint, c1, c2);
+    streamPoint(stream, x, y.data(), n);
+    statsStart(stats, x);
+
+    int step = 0;
+    while (x + h <= xmax && step < maxSteps && progressContinue(x, step, 0)) {
+        rk4Step(rhs, params, x, y.data(), h, y.data(), ws);
+        checkState(y.data(), n);
+        x = x + h;
+
+        emit(x, y.data());
+        streamPoint(stream, x, y.data(), n);
+        statsStep(stats, x, h, std::numeric_limits<double>::quiet_NaN());
+        ++step;
+    }
+    progressFinish(x, step, 0);
+    checkpointSave(n, x, y.data(), h, c1, c2);
+    statsFinish(stats, x, xmax, 0, 0, evaluations);
+    return step;
+}
+
+
+// Способ оценки локальной погрешности в адаптивном методе
+enum AdaptiveMethod {
+    ADAPTIVE_STEP_DOUBLING = 0,     // Правило Рунге: шаг h и два шага h/2 (11 вычислений правой части)
+    ADAPTIVE_DORMAND_PRINCE = 1     // Вложенная пара Дормана-Принса 5(4) с FSAL (6 вычислений)
+};
+
+
+// Принятая точка адаптивного метода
+struct AdaptivePoint {
+    double x;
+    const double* y;        // Решение шагом h
+    const double* yHalf;    // Контрольное решение: два шага h/2 или вложенный метод 4-го порядка
+    const double* e;        // Оценки локальной погрешности по компонентам
+    double E;               // Оценка локальной погрешности sqrt(sum e_i^2)
+    double h;
+    int c1;                 // Количество делений (уменьшений) шага
+    int c2;                 // Количество удвоений (увеличений) шага
+    const double* f = nullptr;  // f(x, y), если метод его уже вычислил (FSAL Дормана-Принса), иначе nullptr
+};
+
+
+// Оценки погрешности для вывода: по правилу Рунге погрешность двух шагов h/2 равна 2^p * s
+inline void scaleErrors(const double* s, double* e, int n) {
+    for (int i = 0; i < n; ++i) {
+        e[i] = s[i] * RK_ERROR_SCALE;
+    }
+}
+
+// Метод Рунге-Кутты 4-го порядка с контролем локальной погрешности удвоением шага.
+// Шаг делится пополам, пока оценка погрешности больше tolerance, и удваивается после точки,
+// где она меньше tolerance / 2^(p+1). При retryInPlace отвергнутый шаг сразу пересчитывается
+// с h/2, иначе деление шага считается отдельной итерацией (входит в maxSteps), а затем
+// проверяются условия цикла. Последний шаг укорачивается до xmax.
+// emit(const AdaptivePoint&) вызывается для каждой принятой точки. Возвращает количество итераций.
+template <class Rhs, class Emit>
+int rk4AdaptiveRun(const Rhs& rhsFunction, const double* params, int n, double x0, const double* y0, double h0, double xmax,
+                   int maxSteps, double tolerance, double edge, bool retryInPlace, Emit emit) {
+    long long evaluations = 0;
+    const CountingRhs<Rhs> rhs{rhsFunction, evaluations};
+    RkStream* const stream = rkStream;
+    RkStats* const stats = rkStats;
+    RkWorkspace ws(n);
+    std::vector<double> y(y0, y0 + n);
+    std::vector<double> s(n, 0.), e(n, 0.);
+    double x = x0;
+    double h = h0;
+    int c1 = 0;
+    int c2 = 0;
+    int step = 0;
+    double error = 0.;
+    checkpointResume(n, x, y, h, c1, c2);
+    streamPoint(stream, x, y.data(), n);
+    statsStart(stats, x);
+    const int c1Start = c1;
+    const int c2Start = c2;
+
+    while (x + h <= xmax && std::abs(x + h - xmax) > edge && step < maxSteps && progressContinue(x, step, c1)) {
+        error = stepDoublingError(rhs, params, x, y.data(), h, s.data(), ws);
+
+        bool halved = false;
+        while (error > tolerance) {
+            c1++;
+            h /= 2;
+            halved = true;
+            checkStep(x, h);
+            if (!retryInPlace) {
+                break;
+            }
+            error = stepDoublingError(rhs, params, x, y.data(), h, s.data(), ws);
+        }
+        if (error > tolerance) {
+            ++step;
+            continue;
+        }
+
+        x += h;     //Увеличиваем шаг перед выводом, т.к. метод Р.К. считает значение в следующей точке
+        y.assign(ws.full(), ws.full() + n);
+        bool doubling = !halved && error < tolerance / RK_DOUBLING_DIVISOR;
+        if (doubling) {
+            c2++;
+        }
+        scaleErrors(s.data(), e.data(), n);
+        emit(AdaptivePoint{x, y.data(), ws.half(), e.data(), error * RK_ERROR_SCALE, h, c1, c2});
+        streamPoint(stream, x, y.data(), n);
+        statsStep(stats, x, h, error * RK_ERROR_SCALE);
+        if (doubling) {
+            h *= 2;
+        }
+        ++step;
+    }
+
+    const double hNext = h;
+    if (x + h > xmax && !progressCancelled()) {
+        h = xmax - x;
+        error = stepDoublingError(rhs, params, x, y.data(), h, s.data(), ws);
+        x += h;
+        y.assign(ws.full(), ws.full() + n);
+        scaleErrors(s.data(), e.data(), n);
+        emit(AdaptivePoint{x, y.data(), ws.half(), e.data(), error * RK_ERROR_SCALE, h, c1, c2});
+        streamPoint(stream, x, y.data(), n);
+        statsStep(stats, x, h, error * RK_ERROR_SCALE);
+    }
+    progressFinish(x, step, c1);
+    checkpointSave(n, x, y.data(), hNext, c1, c2);
+    statsFinish(stats, x, xmax, c1 - c1Start, c2 - c2Start, evaluations);
+    return step;
+}
+
+
+// Ансамбль траекторий адаптивного метода. Состояния хранятся структурой массивов: y[c][j] - компонента c
+// траектории j. На каждой итерации шаг делают сразу все траектории, которым он нужен, и каждая стадия
+// метода - один цикл по ним. Правая часть вычисляется по траекториям по одной: у каждой свои x и h,
+// поэтому множители, зависящие от x (как в RK_4_batch), не общие и цикл со стадией правой части
+// компилятор не векторизует; векторизуются только линейные комбинации стадий.
+
+// Рабочие массивы шага для ансамбля до capacity траекторий: компонента c траектории j (в порядке
+// вызова, а не номера в ансамбле) - [c * capacity + j]
+class RkLanesWorkspace {
+public:
+    RkLanesWorkspace(int n, int capacity)
+        : n(n), capacity(capacity), storage(9 * static_cast<size_t>(n) * capacity), lanes(4 * static_cast<size_t>(capacity)),
+          point(n), slope(n) {}
+
+    int dimension() const { return n; }
+    int stride() const { return capacity; }
+    double* k(int i) { return storage.data() + block(i); }      // k1..k4 - i = 0..3
+    double* stage() { return storage.data() + block(4); }       // Промежуточные точки
+    double* y() { return storage.data() + block(5); }           // Начальные точки шага
+    double* full() { return storage.data() + block(6); }        // Результаты шага h
+    double* half() { return storage.data() + block(7); }        // Результаты двух шагов h/2
+    double* error() { return storage.data() + block(8); }       // Оценки погрешности (первые capacity значений)
+    double* x() { return lanes.data(); }
+    double* h() { return lanes.data() + capacity; }
+    double* xMid() { return lanes.data() + 2 * static_cast<size_t>(capacity); }
+    double* hHalf() { return lanes.data() + 3 * static_cast<size_t>(capacity); }
+    double* rhsPoint() { return point.data(); }                 // Точка одной траектории для вызова правой части
+    double* rhsSlope() { return slope.data(); }
+
+private:
+    size_t block(int i) const { return static_cast<size_t>(i) * n * capacity; }
+
+    int n;
+    int capacity;
+    std::vector<double> storage, lanes, point, slope;
+};
+
+// dydx = f(x + c*h, y) для count траекторий (c = 0, 1/2 или 1: x + h/2 и x + h вычисляются точно так же, как в rk4Step)
+template <class Rhs>
+inline void rhsLanes(const Rhs& rhs, const double* params, int count, const double* x, const double* h, double c,
+                     const double* y, double* dydx, RkLanesWorkspace& ws) {
+    const int n = ws.dimension();
+    const int stride = ws.stride();
+    double* point = ws.rhsPoint();
+    double* slope = ws.rhsSlope();
+    for (int j = 0; j < count; ++j) {
+        for (int i = 0; i < n; ++i) {
+            point[i] = y[i * stride + j];
+        }
+        rhs(x[j] + c * h[j], point, slope, params);
+        for (int i = 0; i < n; ++i) {
+            dydx[i * stride + j] = slope[i];
+        }
+    }
+}
+
+// Шаг метода Рунге-Кутты 4-го порядка для count траекторий, как rk4Step; yNext может совпадать с y
+template <class Rhs>
+inline void rk4StepLanes(const Rhs& rhs, const double* params, int count, const double* x, const double* y, const double* h,
+                         double* yNext, RkLanesWorkspace& ws) {
+    const int n = ws.dimension();
+    const int stride = ws.stride();
+    double* k1 = ws.k(0);
+    double* k2 = ws.k(1);
+    double* k3 = ws.k(2);
+    double* k4 = ws.k(3);
+    double* stage = ws.stage();
+
+    rhsLanes(rhs, params, count, x, h, 0., y, k1, ws);
+    for (int i = 0; i < n; ++i) {
+        for (int j = 0, k = i * stride; j < count; ++j, ++k) {
+            stage[k] = y[k] + h[j] / 2 * k1[k];
+        }
+    }
+    rhsLanes(rhs, params, count, x, h, 0.5, stage, k2, ws);
+    for (int i = 0; i < n; ++i) {
+        for (int j = 0, k = i * stride; j < count; ++j, ++k) {
+            stage[k] = y[k] + h[j] / 2 * k2[k];
+        }
+    }
+    rhsLanes(rhs, params, count, x, h, 0.5, stage, k3, ws);
+    for (int i = 0; i < n; ++i) {
+        for (int j = 0, k = i * stride; j < count; ++j, ++k) {
+            stage[k] = y[k] + h[j] * k3[k];
+        }
+    }
+    rhsLanes(rhs, params, count, x, h, 1., stage, k4, ws);
+    for (int i = 0; i < n; ++i) {
+        for (int j = 0, k = i * stride; j < count; ++j, ++k) {
+            yNext[k] = y[k] + h[j] * (k1[k] + 2 * k2[k] + 2 * k3[k] + k4[k]) / 6;
+        }
+    }
+}
+
+// Оценка погрешности удвоением шага для count траекторий из ws.x(), ws.y() с шагами ws.h(), как stepDoublingError,
+// но без проверки переполнения: шаг h - в ws.full(), два шага h/2 - в ws.half(), оценки - в ws.error()
+template <class Rhs>
+inline void stepDoublingErrorLanes(const Rhs& rhs, const double* params, int count, RkLanesWorkspace& ws) {
+    const int n = ws.dimension();
+    const int stride = ws.stride();
+    const double* x = ws.x();
+    const double* h = ws.h();
+    double* xMid = ws.xMid();
+    double* hHalf = ws.hHalf();
+    double* full = ws.full();
+    double* half = ws.half();
+    double* error = ws.error();
+    for (int j = 0; j < count; ++j) {
+        xMid[j] = x[j] + h[j] / 2;
+        hHalf[j] = h[j] / 2;
+    }
+
+    rk4StepLanes(rhs, params, count, x, ws.y(), h, full, ws);
+    rk4StepLanes(rhs, params, count, x, ws.y(), hHalf, half, ws);
+    rk4StepLanes(rhs, params, count, xMid, half, hHalf, half, ws);
+    for (int j = 0; j < count; ++j) {
+        error[j] = 0.;
+    }
+    for (int i = 0; i < n; ++i) {
+        for (int j = 0; j < count; ++j) {
+            double s = std::abs(full[i * stride + j] - half[i * stride + j]) / RK_ERROR_DENOMINATOR;
+            error[j] += s * s;
+        }
+    }
+    for (int j = 0; j < count; ++j) {
+        error[j] = std::sqrt(error[j]);
+    }
+}
+
+// Конечное состояние траекторий ансамбля, кроме y: x, следующий шаг h, счётчики c1, c2, количество шагов (итераций)
+// и код завершения (RK_OK или RK_ERROR_*)
+struct AdaptiveLanes {
+    std::vector<double> x, h;
+    std::vector<int> c1, c2, steps, status;
+
+    AdaptiveLanes(int m, double x0, double h0) : x(m, x0), h(m, h0), c1(m, 0), c2(m, 0), steps(m, 0), status(m, RK_OK) {}
+};
+
+// Код завершения траектории j по результатам шага в ws (full, затем half - как проверяет stepDoublingError)
+inline int laneStatus(RkLanesWorkspace& ws, int j, bool withHalf) {
+    const int n = ws.dimension();
+    const int stride = ws.stride();
+    for (int i = 0; i < n; ++i) {
+        int status = stateStatus(ws.full() + i * stride + j, 1);
+        if (status != RK_OK) {
+            return status;
+        }
+    }
+    for (int i = 0; withHalf && i < n; ++i) {
+        int status = stateStatus(ws.half() + i * stride + j, 1);
+        if (status != RK_OK) {
+            return status;
+        }
+    }
+    return RK_OK;
+}
+
+// Метод Рунге-Кутты 4-го порядка с контролем локальной погрешности для m траекторий размерности n:
+// у каждой траектории свои x, h и счётчики (lanes, заполняются x0 и h0 до вызова), логика шага та же,
+// что в rk4AdaptiveRun (при retryInPlace отвергнутые траектории пересчитываются в той же итерации).
+// y[c] - массивы m значений компоненты c, на выходе - конечные состояния. Ошибки проверяются так же, как
+// в rk4AdaptiveRun (переполнение, NaN, шаг, уменьшившийся до x + h == x), но не прерывают расчёт: траектория
+// с ошибкой останавливается в последней принятой точке, код ошибки - в lanes.status. Возвращает количество
+// итераций общего цикла.
+template <class Rhs>
+int rk4AdaptiveBatchRun(const Rhs& rhs, const double* params, int n, int m, double* const* y, double xmax, int maxSteps,
+                        double tolerance, double edge, bool retryInPlace, AdaptiveLanes& lanes) {
+    const double doublingBound = tolerance / RK_DOUBLING_DIVISOR;
+    RkLanesWorkspace ws(n, m);
+    std::vector<char> active(m, 1), halved(m, 0);
+    std::vector<int> index, retry, last;
+    index.reserve(m);
+    retry.reserve(m);
+    last.reserve(m);
+
+    // Копирует x, h и y траекторий selected в начало массивов ws
+    auto gather = [&](const std::vector<int>& selected) {
+        const int count = static_cast<int>(selected.size());
+        for (int j = 0; j < count; ++j) {
+            ws.x()[j] = lanes.x[selected[j]];
+            ws.h()[j] = lanes.h[selected[j]];
+            for (int i = 0; i < n; ++i) {
+                ws.y()[i * m + j] = y[i][selected[j]];
+            }
+        }
+        return count;
+    };
+
+    int iterations = 0;
+    int activeCount = m;
+    while (activeCount > 0) {
+        index.clear();
+        last.clear();
+        for (int j = 0; j < m; ++j) {
+            if (!active[j]) {
+                continue;
+            }
+            const double x = lanes.x[j];
+            const double h = lanes.h[j];
+            if (x + h <= xmax && std::abs(x + h - xmax) > edge && lanes.steps[j] < maxSteps) {
+                index.push_back(j);
+            } else {
+                if (x + h > xmax) {
+                    last.push_back(j);
+                }
+                active[j] = 0;
+                --activeCount;
+            }
+        }
+
+        // Последний шаг укорачивается до xmax
+        if (!last.empty()) {
+            for (int j : last) {
+                lanes.h[j] = xmax - lanes.x[j];
+            }
+            const int count = gather(last);
+            rk4StepLanes(rhs, params, count, ws.x(), ws.y(), ws.h(), ws.full(), ws);
+            for (int j = 0; j < count; ++j) {
+                lanes.status[last[j]] = laneStatus(ws, j, false);
+                if (lanes.status[last[j]] != RK_OK) {
+                    continue;
+                }
+                lanes.x[last[j]] = xmax;
+                for (int i = 0; i < n; ++i) {
+                    y[i][last[j]] = ws.full()[i * m + j];
+                }
+            }
+        }
+
+        while (!index.empty()) {
+            const int count = gather(index);
+            stepDoublingErrorLanes(rhs, params, count, ws);
+            retry.clear();
+            for (int j = 0; j < count; ++j) {
+                const int lane = index[j];
+                const double error = ws.error()[j];
+                lanes.status[lane] = laneStatus(ws, j, true);
+                if (lanes.status[lane] != RK_OK) {
+                    active[lane] = 0;
+                    --activeCount;
+                    continue;
+                }
+                if (error > tolerance) {
+                    lanes.c1[lane]++;
+                    lanes.h[lane] /= 2;
+                    lanes.status[lane] = stepStatus(lanes.x[lane], lanes.h[lane]);
+                    if (lanes.status[lane] != RK_OK) {
+                        active[lane] = 0;
+                        --activeCount;
+                    } else if (retryInPlace) {
+                        halved[lane] = 1;
+                        retry.push_back(lane);
+                    } else {
+                        lanes.steps[lane]++;
+                    }
+                    continue;
+                }
+
+                lanes.x[lane] += lanes.h[lane];
+                for (int i = 0; i < n; ++i) {
+                    y[i][lane] = ws.full()[i * m + j];
+                }
+                if (!halved[lane] && error < doublingBound) {
+                    lanes.c2[lane]++;
+                    lanes.h[lane] *= 2;
+                }
+                halved[lane] = 0;
+                lanes.steps[lane]++;
+            }
+            index.swap(retry);
+        }
+        ++iterations;
+    }
+    return iterations;
+}
+
+// Коэффициенты вложенной пары Дормана-Принса 5(4)
+namespace dopri5 {
+    const double c2 = 1. / 5, c3 = 3. / 10, c4 = 4. / 5, c5 = 8. / 9;
+
+    const double a21 = 1. / 5;
+    const double a31 = 3. / 40, a32 = 9. / 40;
+    const double a41 = 44. / 45, a42 = -56. / 15, a43 = 32. / 9;
+    const double a51 = 19372. / 6561, a52 = -25360. / 2187, a53 = 64448. / 6561, a54 = -212. / 729;
+    const double a61 = 9017. / 3168, a62 = -355. / 33, a63 = 46732. / 5247, a64 = 49. / 176, a65 = -5103. / 18656;
+    // Веса решения 5-го порядка (они же седьмая строка таблицы: FSAL)
+    const double b1 = 35. / 384, b3 = 500. / 1113, b4 = 125. / 192, b5 = -2187. / 6784, b6 = 11. / 84;
+    // Разность весов 5-го и 4-го порядков
+    const double e1 = 71. / 57600, e3 = -71. / 16695, e4 = 71. / 1920, e5 = -17253. / 339200, e6 = 22. / 525, e7 = -1. / 40;
+
+    // Ограничения множителя шага и коэффициент запаса
+    const double SAFETY = 0.9;
+    const double MIN_FACTOR = 0.2;
+    const double MAX_FACTOR = 5.;
+}
+
+
+// Рабочие массивы шага Дормана-Принса: k1..k7, промежуточная точка, решения 5-го и 4-го порядков
+class DormandPrinceWorkspace {
+public:
+    explicit DormandPrinceWorkspace(int n) : n(n), storage(10 * static_cast<size_t>(n)) {}
+
+    int dimension() const { return n; }
+    double* k(int i) { return storage.data() + i * n; }    // k1..k7 - i = 0..6
+    double* stage() { return storage.data() + 7 * n; }
+    double* y5() { return storage.data() + 8 * n; }
+    double* y4() { return storage.data() + 9 * n; }
+
+    // Последнее вычисление принятого шага становится первым для следующего (FSAL)
+    void acceptFsal() {
+        for (int i = 0; i < n; ++i) {
+            k(0)[i] = k(6)[i];
+        }
+    }
+
+private:
+    int n;
+    std::vector<double> storage;
+};
+
+
+// Шаг пары Дормана-Принса 5(4) из точки (x, y); ws.k(0) должен содержать f(x, y).
+// Решение 5-го порядка - в ws.y5(), 4-го - в ws.y4(), e[i] = |y5_i - y4_i|.
+// Возвращает sqrt(sum e_i^2).
+template <class Rhs>
+inline double dormandPrinceStep(const Rhs& rhs, const double* params, double x, const double* y, double h, double* e, DormandPrinceWorkspace& ws) {
+    using namespace dopri5;
+    const int n = ws.dimension();
+    double* k1 = ws.k(0);
+    double* k2 = ws.k(1);
+    double* k3 = ws.k(2);
+    double* k4 = ws.k(3);
+    double* k5 = ws.k(4);
+    double* k6 = ws.k(5);
+    double* k7 = ws.k(6);
+    double* stage = ws.stage();
+    double* y5 = ws.y5();
+    double* y4 = ws.y4();
+
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * (a21 * k1[i]);
+    }
+    rhs(x + c2 * h, stage, k2, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * (a31 * k1[i] + a32 * k2[i]);
+    }
+    rhs(x + c3 * h, stage, k3, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * (a41 * k1[i] + a42 * k2[i] + a43 * k3[i]);
+    }
+    rhs(x + c4 * h, stage, k4, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * (a51 * k1[i] + a52 * k2[i] + a53 * k3[i] + a54 * k4[i]);
+    }
+    rhs(x + c5 * h, stage, k5, params);
+    for (int i = 0; i < n; ++i) {
+        stage[i] = y[i] + h * (a61 * k1[i] + a62 * k2[i] + a63 * k3[i] + a64 * k4[i] + a65 * k5[i]);
+    }
+    rhs(x + h, stage, k6, params);
+    for (int i = 0; i < n; ++i) {
+        y5[i] = y[i] + h * (b1 * k1[i] + b3 * k3[i] + b4 * k4[i] + b5 * k5[i] + b6 * k6[i]);
+    }
+    rhs(x + h, y5, k7, params);
+
+    double sum = 0.;
+    for (int i = 0; i < n; ++i) {
+        double difference = h * (e1 * k1[i] + e3 * k3[i] + e4 * k4[i] + e5 * k5[i] + e6 * k6[i] + e7 * k7[i]);
+        y4[i] = y5[i] - difference;
+        e[i] = std::abs(difference);
+        sum += e[i] * e[i];
+    }
+    return std::sqrt(sum);
+}
+
+// Множитель следующего шага по оценке погрешности error метода 4-го порядка
+inline double dormandPrinceFactor(double error, double tolerance) {
+    using namespace dopri5;
+    if (error == 0.) {
+        return MAX_FACTOR;
+    }
+    double factor = SAFETY * std::pow(tolerance / error, 1. / 5);
+    return std::fmin(MAX_FACTOR, std::fmax(MIN_FACTOR, factor));
+}
+
+
+// Метод Дормана-Принса 5(4) с контролем локальной погрешности (вложенная оценка, FSAL).
+// Отвергнутый шаг сразу пересчитывается с уменьшенным шагом (c1), после принятой точки
+// шаг меняется по оценке погрешности, увеличения считаются в c2; сразу после отказа шаг
+// не увеличивается. Условия цикла и укорачивание последнего шага - как в rk4AdaptiveRun.
+// emit(const AdaptivePoint&) вызывается для каждой принятой точки. Возвращает количество шагов.
+template <class Rhs, class Emit>
+int dormandPrinceAdaptiveRun(const Rhs& rhsFunction, const double* params, int n, double x0, const double* y0, double h0, double xmax,
+                             int maxSteps, double tolerance, double edge, Emit emit) {
+    long long evaluations = 0;
+    const CountingRhs<Rhs> rhs{rhsFunction, evaluations};
+    RkStream* const stream = rkStream;
+    RkStats* const stats = rkStats;
+    DormandPrinceWorkspace ws(n);
+    std::vector<double> y(y0, y0 + n);
+    std::vector<double> e(n, 0.);
+    double x = x0;
+    double h = h0;
+    int c1 = 0;
+    int c2 = 0;
+    int step = 0;
+    checkpointResume(n, x, y, h, c1, c2);
+    streamPoint(stream, x, y.data(), n);
+    statsStart(stats, x);
+    const int c1Start = c1;
+    const int c2Start = c2;
+
+    rhs(x, y.data(), ws.k(0), params);
+    while (x + h <= xmax && std::abs(x + h - xmax) > edge && step < maxSteps && progressContinue(x, step, c1)) {
+        double error = dormandPrinceStep(rhs, params, x, y.data(), h, e.data(), ws);
+        checkState(ws.y5(), n);
+
+        bool rejected = false;
+        while (error > tolerance) {
+            c1++;
+            h *= dormandPrinceFactor(error, tolerance);
+            rejected = true;
+            checkStep(x, h);
+            error = dormandPrinceStep(rhs, params, x, y.data(), h, e.data(), ws);
+            checkState(ws.y5(), n);
+        }
+
+        x += h;
+        y.assign(ws.y5(), ws.y5() + n);
+        ws.acceptFsal();
+        double factor = dormandPrinceFactor(error, tolerance);
+        if (rejected && factor > 1.) {
+            factor = 1.;
+        }
+        if (factor > 1.) {
+            c2++;
+        }
+        emit(AdaptivePoint{x, y.data(), ws.y4(), e.data(), error, h, c1, c2, ws.k(6)});
+        streamPoint(stream, x, y.data(), n);
+        statsStep(stats, x, h, error);
+        h *= factor;
+        ++step;
+    }
+
+    const double hNext = h;
+    if (x + h > xmax && !progressCancelled()) {
+        h = xmax - x;
+        double error = dormandPrinceStep(rhs, params, x, y.data(), h, e.data(), ws);
+        checkState(ws.y5(), n);
+        x += h;
+        y.assign(ws.y5(), ws.y5() + n);
+        emit(AdaptivePoint{x, y.data(), ws.y4(), e.data(), error, h, c1, c2, ws.k(6)});
+        streamPoint(stream, x, y.data(), n);
+        statsStep(stats, x, h, error);
+    }
+    progressFinish(x, step, c1);
+    checkpointSave(n, x, y.data(), hNext, c1, c2);
+    statsFinish(stats, x, xmax, c1 - c1Start, c2 - c2Start, evaluations);
+    return step;
+}
+
+
+// Адаптивный метод по коду AdaptiveMethod; retryInPlace относится только к удвоению шага
+template <class Rhs, class Emit>
+int adaptiveRun(int method, const Rhs& rhs, const double* params, int n, double x0, const double* y0, double h0, double xmax,
+                int maxSteps, double tolerance, double edge, bool retryInPlace, Emit emit) {
+    if (method == ADAPTIVE_DORMAND_PRINCE) {
+        return dormandPrinceAdaptiveRun(rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, emit);
+    }
+    return rk4AdaptiveRun(rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, emit);
+}
+
+
+// Кубический эрмитов интерполянт на шаге [x0, x1] по значениям y и производным f на концах шага.
+// Погрешность O(h^4) - того же порядка, что и у метода, поэтому шаг не нужно уменьшать ради вывода.
+inline void hermiteInterpolate(int n, double x0, const double* y0, const double* f0, double x1, const double* y1, const double* f1,
+                               double x, double* y) {
+    const double h = x1 - x0;
+    const double t = (x - x0) / h;
+    const double h00 = (1. + 2. * t) * (1. - t) * (1. - t);
+    const double h10 = t * (1. - t) * (1. - t);
+    const double h01 = t * t * (3. - 2. * t);
+    const double h11 = t * t * (t - 1.);
+    for (int i = 0; i < n; ++i) {
+        y[i] = h00 * y0[i] + h10 * h * f0[i] + h01 * y1[i] + h11 * h * f1[i];
+    }
+}
+
+
+// Плотный вывод по ходу адаптивного расчёта: решение в точках xEval (по возрастанию), а не в узлах сетки.
+// На каждом принятом шаге (operator()) значения в попавших в него точках xEval берутся из hermiteInterpolate
+// (одно дополнительное вычисление правой части в начальной точке и, если метод не передал f в AdaptivePoint
+// (удвоение шага), по одному на шаг, пока не выведены все точки; без точек правая часть не вычисляется).
+// У Дормана-Принса производная в конце шага - его k7 (FSAL). Точки вне пройденного
+// отрезка [x0, x] пропускаются. При продолжении расчёта (rkCheckpoint) отрезок начинается с сохранённой точки,
+// сама она не выводится, поэтому объект создаётся до запуска решателя. emit(x, y) вызывается для каждой
+// выведенной точки. Вычисления правой части считаются (evaluations) и добавляются к RkStats в finish.
+template <class Rhs, class Emit>
+class DenseOutput {
+public:
+    DenseOutput(const Rhs& rhsFunction, const double* params, int n, double x0, const double* y0,
+                const double* xEval, int evalCount, Emit emit)
+        : rhs{rhsFunction, evaluationCount}, params(params), n(n), xEval(xEval), evalCount(evalCount), emit(emit),
+          yPrev(y0, y0 + n), fPrev(n), fNext(n), y(n), xPrev(x0) {
+        const bool resumed = checkpointStart(n, xPrev, yPrev);
+        while (next < evalCount && (xEval[next] < xPrev || (resumed && xEval[next] == xPrev))) {
+            ++next;
+        }
+        while (next < evalCount && xEval[next] == x0) {
+            emit(x0, y0);
+            ++next;
+            ++emitted;
+        }
+        if (next < evalCount) {
+            rhs(xPrev, yPrev.data(), fPrev.data(), params);
+        }
+    }
+
+    void operator()(const AdaptivePoint& point) {
+        if (next >= evalCount) {
+            return;
+        }
+        if (point.f != nullptr) {
+            fNext.assign(point.f, point.f + n);
+        } else {
+            rhs(point.x, point.y, fNext.data(), params);
+        }
+        while (next < evalCount && xEval[next] <= point.x) {
+            hermiteInterpolate(n, xPrev, yPrev.data(), fPrev.data(), point.x, point.y, fNext.data(), xEval[next], y.data());
+            emit(xEval[next], y.data());
+            ++next;
+            ++emitted;
+        }
+        xPrev = point.x;
+        yPrev.assign(point.y, point.y + n);
+        fPrev.swap(fNext);
+    }
+
+    // Вызывается после решателя: его statsFinish записывает только собственные вычисления правой части
+    void finish(RkStats* stats) const {
+        if (stats != nullptr) {
+            stats->rhsEvaluations += evaluationCount;
+        }
+    }
+
+    int count() const { return emitted; }
+    long long evaluations() const { return evaluationCount; }
+
+private:
+    long long evaluationCount = 0;
+    const CountingRhs<Rhs> rhs;
+    const double* params;
+    int n;
+    const double* xEval;
+    int evalCount;
+    Emit emit;
+    std::vector<double> yPrev, fPrev, fNext, y;
+    double xPrev;
+    int next = 0;
+    int emitted = 0;
+};
+
+
+// Адаптивный метод вместе с плотным выводом за один проход: emit(const AdaptivePoint&) - для каждой принятой
+// точки, как в adaptiveRun, denseEmit(x, y) - для точек xEval (DenseOutput). Возвращает количество шагов.
+template <class Rhs, class Emit, class DenseEmit>
+int adaptiveDenseRun(int method, const Rhs& rhs, const double* params, int n, double x0, const double* y0, double h0, double xmax,
+                     int maxSteps, double tolerance, double edge, bool retryInPlace, const double* xEval, int evalCount,
+                     Emit emit, DenseEmit denseEmit) {
+    RkStats* const stats = rkStats;
+    DenseOutput<Rhs, DenseEmit> dense(rhs, params, n, x0, y0, xEval, evalCount, denseEmit);
+    const int steps = adaptiveRun(method, rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, [&](const AdaptivePoint& point) {
+        emit(point);
+        dense(point);
+    });
+    dense.finish(stats);
+    return steps;
+}
+
+
+// Только плотный вывод адаптивного метода, без таблицы узлов. Возвращает количество точек.
+template <class Rhs, class Emit>
+int denseAdaptiveRun(int method, const Rhs& rhs, const double* params, int n, double x0, const double* y0, double h0, double xmax,
+                     int maxSteps, double tolerance, double edge, bool retryInPlace, const double* xEval, int evalCount, Emit emit) {
+    int count = 0;
+    adaptiveDenseRun(method, rhs, params, n, x0, y0, h0, xmax, maxSteps, tolerance, edge, retryInPlace, xEval, evalCount,
+                     [](const AdaptivePoint&) {}, [&](double x, const double* y) {
+        emit(x, y);
+        ++count;
+    });
+    return count;
+}
@@ -0,0 +1,317 @@
+#pragma once
+
+#include <fstream>
+#include <string>
+#include <vector>
+#include <limits>
+#include <iomanip>
+#include <initializer_list>
+#include <algorithm>
+
+// Приёмники строк результата для решателей.
+// Решатель пишет каждую вычисленную точку вызовом row({...}),
+// а куда она попадёт (файл или память) определяет приёмник.
+// Строку можно передать и массивом: row(values, count).
+
+
+// Формат файла результата
+enum OutputFormat {
+    OUTPUT_FORMAT_CSV = 0,     // Текст, разделитель ;
+    OUTPUT_FORMAT_NPY = 1      // Двоичный .npy, читается через np.load(mmap_mode='r')
+};
+
+inline const char* outputExtension(int format) {
+    return format == OUTPUT_FORMAT_NPY ? ".npy" : ".csv";
+}
+
+
+// Запись в CSV-файл с разделителем ;
+class CsvRowWriter {
+public:
+    CsvRowWriter(const std::string& path, const char* header) : output(path) {
+        // Без этого ofstream выводит только 6 значащих цифр
+        output << std::setprecision(std::numeric_limits<double>::max_digits10);
+        output << header << "\n";
+    }
+
+    void row(std::initializer_list<double> values) {
+        row(values.begin(), values.size());
+    }
+
+    void row(const double* values, size_t n) {
+        for (size_t i = 0; i < n; ++i) {
+            if (i > 0) {
+                output << ";";
+            }
+            output << values[i];
+        }
+        output << "\n";
+        ++count;
+    }
+
+    int rows() const { return count; }
+
+private:
+    std::ofstream output;
+    int count = 0;
+};
+
+
+// Запись в массив float64, выделенный вызывающей стороной (строки подряд, C-порядок).
+// Строки сверх capacity отбрасываются, rows() возвращает количество записанных строк.
+class BufferRowWriter {
+public:
+    BufferRowWriter(double* data, int capacity, int columns) : data(data), capacity(capacity), columns(columns) {}
+
+    void row(std::initializer_list<double> values) {
+        row(values.begin(), values.size());
+    }
+
+    void row(const double* values, size_t n) {
+        if (count >= capacity) {
+            return;
+        }
+        double* target = data + static_cast<long long>(count) * columns;
+        for (size_t col = 0; col < n && col < static_cast<size_t>(columns); ++col) {
+            target[col] = values[col];
+        }
+        ++count;
+    }
+
+    int rows() const { return count; }
+
+private:
+    double* data;
+    int capacity;
+    int columns;
+    int count = 0;
+};
+
+
+// Запись в файл .npy (версия 1.0) со структурным типом: одно поле '<f8' на столбец,
+// имена полей берутся из заголовка вида "x;v;u". Количество строк заранее неизвестно,
+// поэтому в заголовке резервируется место под shape, а при закрытии он перезаписывается.
+// Данные пишутся как есть, т.е. предполагается little-endian платформа (x86, ARM).
+class NpyRowWriter {
+public:
+    NpyRowWriter(const std::string& path, const char* header) : output(path, std::ios::binary) {
+        std::string name;
+        for (const char* c = header; ; ++c) {
+            if (*c == ';' || *c == '\0') {
+                names.push_back(name);
+                name.clear();
+                if (*c == '\0') {
+                    break;
+                }
+            } else {
+                name += *c;
+            }
+        }
+        headerLength = npyHeader(0).size();
+        output << npyHeader(0);
+        values.resize(names.size());
+    }
+
+    ~NpyRowWriter() {
+        output.seekp(0);
+        output << npyHeader(count);
+    }
+
+    void row(std::initializer_list<double> row) {
+        this->row(row.begin(), row.size());
+    }
+
+    void row(const double* row, size_t n) {
+        for (size_t col = 0; col < n && col < values.size(); ++col) {
+            values[col] = row[col];
+        }
+        output.write(reinterpret_cast<const char*>(values.data()), values.size() * sizeof(double));
+        ++count;
+    }
+
+    int rows() const { return count; }
+
+private:
+    std::string npyHeader(long long rows) const {
+        std::string dict = "{'descr': [";
+        for (const std::string& n : names) {
+            // Имена с апострофом (v'i) записываем в двойных кавычках
+            char quote = n.find('\'') == std::string::npos ? '\'' : '"';
+            dict += "(";
+            dict += quote;
+            dict += n;
+            dict += quote;
+            dict += ", '<f8'), ";
+        }
+        dict += "], 'fortran_order': False, 'shape': (" + std::to_string(rows) + ",), }";
+
+        // Запас под любое количество строк, итоговая длина кратна 64 байтам
+        size_t length = headerLength;
+        if (length == 0) {
+            length = 10 + dict.size() + 20 + 1;
+            length = (length + 63) / 64 * 64;
+        }
+        dict.append(length - 10 - dict.size() - 1, ' ');
+        dict += '\n';
+
+        std::string result = "\x93NUMPY";
+        result += '\x01';
+        result += '\x00';
+        unsigned short dictLength = static_cast<unsigned short>(dict.size());
+        result += static_cast<char>(dictLength & 0xFF);
+        result += static_cast<char>(dictLength >> 8);
+        return result + dict;
+    }
+
+    std::ofstream output;
+    std::vector<std::string> names;
+    std::vector<double> values;
+    size_t headerLength = 0;
+    int count = 0;
+};
+
+
+// Прореживание вывода, задаётся вызывающей стороной до расчёта (setOutputSampling в библиотеках).
+// Условия применяются по очереди: сначала выбор строк (каждая every-я или первая строка с x >= очередной
+// точки points), затем ограничение maxRows. Последняя строка расчёта пишется всегда.
+struct OutputSampling {
+    int every = 1;                  // Писать каждую every-ю строку (every, 2*every, ...)
+    int maxRows = 0;                // Не больше maxRows строк (0 - без ограничения)
+    std::vector<double> points;     // Абсциссы вывода по возрастанию (пусто - не используются, тогда every)
+
+    bool active() const {
+        return every > 1 || maxRows > 0 || !points.empty();
+    }
+
+    void set(int every, int maxRows, const double* points, int pointCount) {
+        this->every = every > 1 ? every : 1;
+        this->maxRows = maxRows > 0 ? maxRows : 0;
+        this->points.assign(points, points + (points != nullptr && pointCount > 0 ? pointCount : 0));
+    }
+};
+
+
+// Приёмник с прореживанием поверх другого приёмника. Первый столбец строки - x.
+// При ограничении maxRows отобранные строки копятся в памяти (не больше maxRows): когда место кончается,
+// остаётся каждая вторая, а шаг отбора удваивается, т.е. в итоге строки идут с шагом 2^k по отобранным.
+// Накопленные строки и последняя строка расчёта передаются дальше в finish().
+template <class Writer>
+class SampledRowWriter {
+public:
+    SampledRowWriter(Writer& output, const OutputSampling& sampling) : output(output), sampling(sampling) {
+        if (sampling.maxRows > 0) {
+            // Одно место оставляем под последнюю строку расчёта
+            limited = true;
+            reservoirCapacity = sampling.maxRows - 1;
+        }
+    }
+
+    void row(std::initializer_list<double> values) {
+        row(values.begin(), values.size());
+    }
+
+    void row(const double* values, size_t n) {
+        columns = n;
+        last.assign(values, values + n);
+        lastWritten = false;
+
+        bool selected;
+        if (sampling.points.empty()) {
+            selected = (index + 1) % sampling.every == 0;
+        } else {
+            selected = nextPoint < sampling.points.size() && values[0] >= sampling.points[nextPoint];
+            while (nextPoint < sampling.points.size() && sampling.points[nextPoint] <= values[0]) {
+                ++nextPoint;
+            }
+        }
+        ++index;
+        if (!selected) {
+            return;
+        }
+
+        if (!limited) {
+            output.row(values, n);
+            lastWritten = true;
+            return;
+        }
+        if (reservoirCapacity > 0 && candidate % stride == 0) {
+            if (reservoirRows() == reservoirCapacity) {
+                compact();
+            }
+            if (candidate % stride == 0) {
+                reservoir.insert(reservoir.end(), values, values + n);
+                lastWritten = true;
+            }
+        }
+        ++candidate;
+    }
+
+    // Передаёт накопленные строки и последнюю строку расчёта, если она не попала в выборку
+    void finish() {
+        for (size_t r = 0; r < reservoirRows(); ++r) {
+            output.row(reservoir.data() + r * columns, columns);
+        }
+        reservoir.clear();
+        if (!lastWritten && !last.empty()) {
+            output.row(last.data(), last.size());
+            lastWritten = true;
+        }
+    }
+
+    int rows() const { return output.rows() + static_cast<int>(reservoirRows()); }
+
+private:
+    size_t reservoirRows() const {
+        return columns == 0 ? 0 : reservoir.size() / columns;
+    }
+
+    // Оставляет строки с чётными номерами, шаг отбора удваивается
+    void compact() {
+        size_t kept = 0;
+        for (size_t r = 0; r < reservoirRows(); r += 2, ++kept) {
+            std::copy(reservoir.begin() + r * columns, reservoir.begin() + (r + 1) * columns, reservoir.begin() + kept * columns);
+        }
+        reservoir.resize(kept * columns);
+        stride *= 2;
+    }
+
+    Writer& output;
+    const OutputSampling& sampling;
+    std::vector<double> last;
+    std::vector<double> reservoir;
+    size_t columns = 0;
+    size_t reservoirCapacity = 0;
+    size_t nextPoint = 0;
+    long long index = 0;
+    long long candidate = 0;
+    long long stride = 1;
+    bool limited = false;
+    bool lastWritten = false;
+};
+
+
+// Решатель пишет строки в output через прореживание sampling, если оно задано:
+// writeSampled(output, sampling, [&](auto& sampled) { return solver(..., sampled); })
+template <class Writer, class Solver>
+int writeSampled(Writer& output, const OutputSampling& sampling, Solver solve) {
+    if (!sampling.active()) {
+        return solve(output);
+    }
+    SampledRowWriter<Writer> sampled(output, sampling);
+    int result = solve(sampled);
+    sampled.finish();
+    return result;
+}
+
+
+// Открывает файл результата в заданном формате и передаёт приёмник решателю:
+// writeResultFile(format, path, "x;v", [&](auto& output) { return solver(..., output); })
+template <class Solver>
+int writeResultFile(int format, const std::string& path, const char* header, Solver solve) {
+    if (format == OUTPUT_FORMAT_NPY) {
+        NpyRowWriter output(path, header);
+        return solve(output);
+    }
+    CsvRowWriter output(path, header);
+    return solve(output);
+}
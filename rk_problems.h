@@ -0,0 +1,59 @@
+#pragma once
+
+#include <cmath>
+#include <cstring>
+
+#include "rk_core.h"
+
+// Правые части задач лабораторной работы и их реестр.
+// Чтобы добавить задачу, достаточно описать её правую часть и добавить строку в RK_PROBLEMS:
+// она сразу станет доступна через rk_core (rkProblemFind, rkSolve, rkSolveAdaptive).
+
+
+// Тестовая задача: v' = v, точное решение u = C*e^x
+inline void testRhs(double /*x*/, const double* y, double* dydx, const double* /*params*/) {
+    dydx[0] = y[0];
+}
+
+// Основная задача 1: v' = v^2 * x / (1 + x^2) + v - v^3 * sin(10x)
+inline void main1Rhs(double x, const double* y, double* dydx, const double* /*params*/) {
+    double v = y[0];
+    dydx[0] = v * v * x / (1 + x * x) + v - v * v * v * std::sin(10 * x);
+}
+
+// Основная задача 2: u'' + a*u' - b*sin(u) = 0, y = (u, u'), params = (a, b)
+inline void main2Rhs(double /*x*/, const double* y, double* dydx, const double* params) {
+    double a = params[0];
+    double b = params[1];
+    dydx[0] = y[1];
+    dydx[1] = -a * y[1] + b * std::sin(y[0]);
+}
+
+// Изгиб стержня (ksr11): y'' = K*(L - x)*(1 + y'^2)^(3/2), y = (y, y'), params = (K, L)
+inline void ksr11Rhs(double x, const double* y, double* dydx, const double* params) {
+    double K = params[0];
+    double L = params[1];
+    dydx[0] = y[1];
+    dydx[1] = K * (L - x) * std::pow(1 + y[1] * y[1], 1.5);
+}
+
+
+// Реестр задач, индекс в нём - идентификатор задачи для rk_core
+static const OdeProblem RK_PROBLEMS[] = {
+    {"test", 1, 0, testRhs},
+    {"main1", 1, 0, main1Rhs},
+    {"main2", 2, 2, main2Rhs},
+    {"ksr11", 2, 2, ksr11Rhs},
+};
+
+const int RK_PROBLEM_COUNT = sizeof(RK_PROBLEMS) / sizeof(RK_PROBLEMS[0]);
+
+// Индекс задачи по имени или -1
+inline int findProblem(const char* name) {
+    for (int i = 0; i < RK_PROBLEM_COUNT; ++i) {
+        if (std::strcmp(RK_PROBLEMS[i].name, name) == 0) {
+            return i;
+        }
+    }
+    return -1;
+}